@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+""" Module implements the SW engine benchmark suite
+
+    Times board construction, token churn, scoring, map conversion and
+    full games, and saves the results as json so runs on different
+    commits can be compared.
+
+    Usage: python benchmarks.py --out results.json [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import site
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import board
+import boardspace
+import features
+import game
+import gameboard_csv_to_json
+import gamerecord
+import mapfile
+import scoring
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAP_NAME = 'map_2_player.json'
+MAP_SPACES = 23 # spaces of the bundled map, and of the stand-in for it
+
+
+def _find_map():
+    """helper function returning the path of the bundled map: next to this
+    module in a checkout, under share/sw of the install prefix once
+    installed (see pyproject.toml); None without it"""
+    for directory in [HERE] + [os.path.join(prefix, 'share', 'sw')
+                               for prefix in (sys.prefix, site.USER_BASE) if prefix]:
+        path = os.path.join(directory, MAP_NAME)
+        if os.path.exists(path):
+            return path
+    return None
+
+MAP_JSON = _find_map()
+
+
+def measure(function, number=1, repeat=5):
+    """Times function.
+
+    Args:
+        function: callable without arguments
+        number: calls per timed run
+        repeat: timed runs
+
+    Returns:
+        dictionary of seconds per call (median and min) and calls per
+        second"""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    median = statistics.median(times)
+    return {'seconds_per_op': median,
+            'min_seconds_per_op': min(times),
+            'ops_per_second': 1 / median if median else None,
+            'number': number,
+            'repeat': repeat}
+
+
+def _spaces_from_json(map_json):
+    """helper function building one BoardSpace per space of a map json,
+    in either the indented or the compact format"""
+    with open(map_json) as infile:
+        spaces = json.load(infile)
+    spaces = spaces['spaces'] if 'spaces' in spaces else spaces.values()
+    objects = []
+    for space in spaces:
+        objects.append(boardspace.BoardSpace(int(space['id']), space['terrain'],
+                                             space['is_edge'] in (True, 'True'),
+                                             space['lost_tribes'] in (True, 'True'),
+                                             (space.get('symbols') or [None])[0]))
+        objects[-1].neighbors = [int(neighbor) for neighbor in space['neighbors']]
+    return objects
+
+
+def _board_churn(template):
+    """helper function returning a token churn run on a board clone"""
+    def churn():
+        played = template.clone()
+        for index in range(len(played)):
+            played.add_tokens(index, 'ratmen', 3)
+            played.change_owner(index, 'ratmen')
+            played.remove_tokens(index, 'ratmen', 2)
+            played.remove_tokens(index, 'ratmen')
+            played.change_owner(index, None)
+    return churn
+
+
+def _boardspace_churn(spaces):
+    """helper function returning the same churn on BoardSpace objects"""
+    def churn():
+        for space in spaces:
+            space.add_tokens('ratmen', 3)
+            space.change_owner('ratmen')
+            space.remove_tokens('ratmen', 2)
+            space.remove_tokens('ratmen')
+            space.change_owner(None)
+    return churn
+
+
+def _board_conquests(template):
+    """helper function returning a conquest of every space in turn on a
+    board clone, each followed by the frontier of the conqueror"""
+    def conquests():
+        played = template.clone()
+        for index in range(len(played)):
+            played.add_tokens(index, 'ratmen', 3)
+            played.change_owner(index, 'ratmen')
+            played.frontier_mask('ratmen')
+    return conquests
+
+
+def _boardspace_conquests(spaces):
+    """helper function returning the same conquests on BoardSpace objects,
+    whose frontier is a scan of the owned spaces and their neighbors"""
+    by_id = {space.space_id: space for space in spaces}
+
+    def conquests():
+        for space in spaces:
+            space.add_tokens('ratmen', 3)
+            space.change_owner('ratmen')
+            {neighbor for held in spaces if held.owner == 'ratmen'
+             for neighbor in held.neighbors
+             if by_id[neighbor].owner != 'ratmen'}
+        for space in spaces:
+            space.remove_tokens('ratmen')
+            space.change_owner(None)
+    return conquests
+
+
+def _play_games(template, games):
+    """helper function returning a run of complete greedy/random games"""
+    def play():
+        for seed in range(games):
+            game.Game(template, ['player_1', 'player_2'], seed=seed).play(
+                [game.greedy_policy, game.random_policy])
+    return play
+
+
+def _replay(record):
+    """helper function stepping through every turn of a game record"""
+    with gamerecord.RecordReader(record) as reader:
+        for _ in reader.states():
+            pass
+
+
+def run(cases=None, quick=False, workdir=None):
+    """Runs the benchmark cases.
+
+    Args:
+        cases: names of the cases to run, every case by default
+        quick: fewer repeats and smaller generated maps, for smoke tests
+        workdir: directory for generated files, a temporary one by default
+
+    Returns:
+        {case: measure() result} dictionary"""
+
+    repeat = 2 if quick else 5
+    big = 1000 if quick else 10000
+    own_dir = None
+    if workdir is None:
+        own_dir = tempfile.TemporaryDirectory()
+        workdir = own_dir.name
+    path = lambda name: os.path.join(workdir, name)
+
+    map_json = MAP_JSON
+    if map_json is None:
+        # e.g. an install without the map: time a generated map of its size
+        map_json = path(MAP_NAME)
+        gameboard_csv_to_json.write_map_arrays(
+            map_json, gameboard_csv_to_json.generate_map(MAP_SPACES))
+    template = board.Board.from_json(map_json)
+
+    synthetic = gameboard_csv_to_json.generate_map(big)
+    featurizer = features.Featurizer(template)
+    positions = [template.clone() for _ in range(1000)]
+    buffer = featurizer.buffer(len(positions))
+
+    def setup_files():
+        bundled = mapfile.MapArrays(*(getattr(template, name)
+                                      for name in mapfile.MapArrays._fields))
+        gameboard_csv_to_json.write_map_arrays(path('map.swm'), bundled)
+        gameboard_csv_to_json.write_map_arrays(path('map.csv'), bundled)
+        gameboard_csv_to_json.write_map_arrays(path('big.csv'), synthetic)
+        gamerecord.record_game(game.Game(template, ['player_1', 'player_2']),
+                               [game.greedy_policy, game.random_policy],
+                               path('game.swr'))
+
+    benchmarks = {
+        'board_from_json': (lambda: board.Board.from_json(map_json), 20),
+        'board_from_compiled': (lambda: board.Board.from_compiled(
+            path('map.swm')), 20),
+        'boardspace_objects_from_json': (lambda: _spaces_from_json(map_json), 20),
+        'board_clone': (template.clone, 1000),
+        'board_token_churn': (_board_churn(template), 20),
+        'boardspace_token_churn': (_boardspace_churn(
+            _spaces_from_json(map_json)), 20),
+        'board_conquests': (_board_conquests(template), 20),
+        'boardspace_conquests': (_boardspace_conquests(
+            _spaces_from_json(map_json)), 20),
+        'score_batch_1000': (lambda: scoring.score_batch(
+            [template] * 1000, ['lost_tribes']), 5),
+        'features_batch_1000': (lambda: featurizer.batch(positions, buffer), 5),
+        'compile_map_bundled': (lambda: gameboard_csv_to_json.compile_map(
+            path('map.csv'), path('map.json')), 20),
+        'compile_map_synthetic': (lambda: gameboard_csv_to_json.compile_map(
+            path('big.csv'), path('big.json')), 1),
+        'compile_binary_map_synthetic': (
+            lambda: gameboard_csv_to_json.compile_binary_map(
+                path('big.csv'), path('big.swm')), 1),
+        'generate_map_synthetic': (lambda: gameboard_csv_to_json.generate_map(
+            big), 1),
+        'validate_map_synthetic': (lambda: gameboard_csv_to_json.validate_map(
+            synthetic), 1),
+        'legacy_csv_to_json_bundled': (
+            lambda: gameboard_csv_to_json.gameboard_csv_to_json(
+                path('map.csv'), path('legacy.json')), 5),
+        'game_simulation_10_games': (_play_games(template, 10), 1),
+        'game_record_replay': (lambda: _replay(path('game.swr')), 20),
+    }
+
+    results = {}
+    try:
+        setup_files()
+        for name, (function, number) in benchmarks.items():
+            if cases and name not in cases:
+                continue
+            try:
+                results[name] = measure(function, number, repeat)
+            except ImportError as error: # e.g. pandas for the legacy path
+                results[name] = {'skipped': str(error)}
+        if 'game_simulation_10_games' in results:
+            timing = results['game_simulation_10_games']
+            if 'seconds_per_op' in timing:
+                timing['games_per_second'] = 10 / timing['seconds_per_op']
+    finally:
+        if own_dir is not None:
+            own_dir.cleanup()
+    return results
+
+
+def metadata():
+    """Returns the commit, interpreter and host of this run"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                capture_output=True, text=True,
+                                cwd=HERE).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit or None,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(results, baseline, threshold=1.1):
+    """Compares results to a baseline run.
+
+    Args:
+        results, baseline: {case: measure() result} dictionaries
+        threshold: slowdown ratio counted as a regression
+
+    Returns:
+        (rows, regressions): (case, baseline seconds, seconds, ratio)
+        rows and the names of regressed cases"""
+
+    rows, regressions = [], []
+    for name, timing in results.items():
+        old = baseline.get(name, {})
+        if 'seconds_per_op' not in timing or 'seconds_per_op' not in old:
+            continue
+        ratio = timing['seconds_per_op'] / old['seconds_per_op']
+        rows.append((name, old['seconds_per_op'], timing['seconds_per_op'], ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the SW engine.')
+    parser.add_argument('--out', help='json file receiving the results')
+    parser.add_argument('--compare', help='json results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='slowdown ratio reported as a regression')
+    parser.add_argument('--cases', nargs='+', help='cases to run')
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = run(args.cases, args.quick)
+    report = {'meta': metadata(), 'results': results}
+    if args.out:
+        with open(args.out, 'w') as outfile:
+            json.dump(report, outfile, indent=4, sort_keys=True)
+
+    for name, timing in results.items():
+        if 'seconds_per_op' in timing:
+            print('{:32s} {:12.6f} s/op'.format(name, timing['seconds_per_op']))
+        else:
+            print('{:32s} skipped: {}'.format(name, timing['skipped']))
+
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)['results']
+        rows, regressions = compare(results, baseline, args.threshold)
+        for name, old, new, ratio in rows:
+            print('{:32s} {:10.6f} -> {:10.6f} ({:.2f}x)'.format(name, old,
+                                                                 new, ratio))
+        if regressions:
+            print('Regressions: {}'.format(', '.join(regressions)))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+import benchmarks
+import unittest
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests running and comparing benchmark cases"""
+
+    def test_run_and_compare(self):
+        '''Check quick runs of a few cases and regression detection'''
+        results = benchmarks.run(['board_clone', 'board_token_churn',
+                                  'validate_map_synthetic'], quick=True)
+        self.assertEqual(set(results), {'board_clone', 'board_token_churn',
+                                        'validate_map_synthetic'})
+        self.assertGreater(results['board_clone']['seconds_per_op'], 0)
+
+        slower = {name: dict(timing, seconds_per_op=timing['seconds_per_op'] * 2)
+                  for name, timing in results.items()}
+        rows, regressions = benchmarks.compare(slower, results)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(sorted(regressions), sorted(results))
+        self.assertEqual(benchmarks.compare(results, slower)[1], [])
+
+    def test_run_without_map(self):
+        '''Check that an install without the bundled map times a stand-in'''
+        bundled, benchmarks.MAP_JSON = benchmarks.MAP_JSON, None
+        try:
+            results = benchmarks.run(['board_from_json', 'boardspace_conquests'],
+                                     quick=True)
+        finally:
+            benchmarks.MAP_JSON = bundled
+        self.assertGreater(results['board_from_json']['seconds_per_op'], 0)
+        self.assertGreater(results['boardspace_conquests']['seconds_per_op'], 0)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
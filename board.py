@@ -0,0 +1,854 @@
+#!/usr/bin/env python
+""" Module implements the array-backed Board holding every space of a SW map """
+import collections
+import contextlib
+import copy
+import functools
+import json
+
+import numpy as np
+
+import boardspace
+import mapfile
+import sw_exceptions
+
+# integer codes for the vocabularies validated by boardspace.BoardSpace
+TERRAIN_CODES = {name: code for code, name in enumerate(boardspace.TERRAIN_TYPES)}
+SYMBOL_BITS = {name: 1 << code for code, name in enumerate(boardspace.MAP_SYMBOLS)}
+
+NO_OWNER = -1 # owner code of a space nobody owns
+TOKEN_CAPACITY = 8 # initial number of token columns, doubled when full
+OWNER_COLUMN = -1 # journal column of owner changes
+MAX_COUNT = int(np.iinfo(np.int16).max) # most tokens of one type on a space
+
+_MASK64 = (1 << 64) - 1
+
+
+# the mutable state of a Board, see Board.snapshot
+BoardSnapshot = collections.namedtuple('BoardSnapshot',
+                                       ['owner', 'tokens', 'zobrist',
+                                        'owner_index'])
+
+
+def mask_from_bools(bools):
+    """Returns the integer bitset with bit i set where bools[i] is True"""
+    packed = np.packbits(np.asarray(bools, dtype=bool), bitorder='little')
+    return int.from_bytes(packed.tobytes(), 'little')
+
+
+def mask_from_indices(indices):
+    """Returns the integer bitset with the bits of indices set"""
+    mask = 0
+    for index in indices:
+        mask |= 1 << int(index)
+    return mask
+
+
+def mask_to_indices(mask):
+    """Returns the sorted indices of the bits set in an integer bitset"""
+    if not mask:
+        return np.empty(0, dtype=np.intp)
+    packed = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, 'little'),
+                           dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder='little'))
+
+
+def _mix64(value):
+    """helper function scrambling an integer into 64 bits (splitmix64)"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def zobrist_key(index, column, value):
+    """Returns the Zobrist key of one board feature.
+
+    Args:
+        index: index of the space
+        column: token code, or OWNER_COLUMN for the owner
+        value: token count, or owner code
+
+    Returns:
+        64 bit integer; the same on every run and in every process"""
+
+    mixed = _mix64(int(index))
+    mixed = _mix64(mixed ^ (int(column) & _MASK64))
+    return _mix64(mixed ^ (int(value) & _MASK64))
+
+
+def _as_bool(value, name):
+    """helper function reading the 'True'/'False' strings of the map json"""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if value in ('True', 'true', '1'):
+        return True
+    if value in ('False', 'false', '0'):
+        return False
+    raise TypeError('{}: {} invalid! Must be a bool!'.format(name, value))
+
+
+def _check_integer(value, cutoff):
+    """helper function to check that value is an integer of at least cutoff"""
+    if not isinstance(value, (int, np.integer)):
+        raise TypeError('Invalid value: {}! Must be an integer!'.format(value))
+
+    if value < cutoff:
+        raise sw_exceptions.InputError('Illegal value: {}! '
+                                       'Must be at least: {} !'.format(value, cutoff))
+
+
+class Board:
+    """ Small World board stored as a structure of arrays
+    ...
+
+    Every space of the map is a row in a set of integer coded arrays. Spaces
+    are addressed by their index (0 .. len(board) - 1), the position of the
+    space in space_ids. BoardSpaceView wraps a single row for callers
+    written against boardspace.BoardSpace.
+
+    Attributes:
+    -----------
+
+    space_ids: int32 array
+        The map id of each space
+
+    terrain: int8 array
+        Terrain code of each space, index into boardspace.TERRAIN_TYPES
+
+    symbols: uint8 array
+        Bit mask of the symbols on each space, see SYMBOL_BITS
+
+    is_edge: bool array
+        True for spaces on the edge of the map
+
+    lost_tribes: bool array
+        True for spaces that start with lost tribes
+
+    neighbor_offsets, neighbor_indices: int32 arrays
+        CSR adjacency; the neighbors of space i are
+        neighbor_indices[neighbor_offsets[i]:neighbor_offsets[i + 1]]
+
+    owner: int16 array
+        Owner code of each space (NO_OWNER if unowned), index into owners
+
+    tokens: int16 array, shape (spaces, token columns)
+        Number of tokens of each type on each space, index into token_types
+
+    owners, token_types: lists
+        The names behind the owner and token codes
+
+    Only owner and tokens change during a game. clone() and snapshot()
+    hand out these arrays without copying them; the first change made
+    afterwards copies them (copy on write), so always change the board
+    through its methods and never by writing into the arrays.
+
+    After mark() every change is also recorded in a journal of
+    (index, column, delta) triplets: column is a token code and delta the
+    change of its count, or column is OWNER_COLUMN and delta the change
+    of the owner code. undo(mark) rolls the board back in reverse order.
+
+    zobrist is the XOR of zobrist_key over every owned space (index,
+    OWNER_COLUMN, owner code) and every token count on the board
+    (index, token code, count). It is updated with each change, so equal
+    positions of boards sharing token and owner codes (clones) have equal
+    zobrist values.
+
+    Sets of spaces are integer bitsets (bit i is space index i) so move
+    generation is plain &, | and ~ on Python ints. The map sets (edge_mask,
+    water_mask, terrain_masks, symbol_masks, neighbor_mask) are built once;
+    owned_mask and frontier_mask are kept current with each owner change.
+
+    """
+
+    def __init__(self, space_ids, terrain, symbols, is_edge, lost_tribes,
+                 neighbor_offsets, neighbor_indices):
+        """Initializes the Board from already coded arrays
+        Args: space_ids - map id of each space
+
+              terrain - terrain code of each space
+
+              symbols - symbol bit mask of each space
+
+              is_edge - bool, True for edge spaces
+
+              lost_tribes - bool, True for spaces starting with lost tribes
+
+              neighbor_offsets, neighbor_indices - CSR adjacency by index
+
+        Output: object of type Board with the starting tokens placed """
+
+        self.space_ids = np.asarray(space_ids, dtype=np.int32)
+        self.terrain = np.asarray(terrain, dtype=np.int8)
+        self.symbols = np.asarray(symbols, dtype=np.uint8)
+        self.is_edge = np.asarray(is_edge, dtype=bool)
+        self.lost_tribes = np.asarray(lost_tribes, dtype=bool)
+        self.neighbor_offsets = np.asarray(neighbor_offsets, dtype=np.int32)
+        self.neighbor_indices = np.asarray(neighbor_indices, dtype=np.int32)
+
+        mountains = self.terrain == TERRAIN_CODES['mountain']
+        if (mountains & self.lost_tribes).any():
+            raise sw_exceptions.InputError('\'lost_tribes\' not permitted '
+                                           'on \'mountain\' terrain')
+
+        self._index = {int(space_id): index
+                       for index, space_id in enumerate(self.space_ids)}
+        self._build_masks()
+
+        # names behind the integer codes, shared by everything built from
+        # this board; codes are only ever appended
+        self.owners = []
+        self._owner_codes = {}
+        self.token_types = []
+        self._token_codes = {}
+
+        self.owner = np.full(len(self.space_ids), NO_OWNER, dtype=np.int16)
+        self.tokens = np.zeros((len(self.space_ids), TOKEN_CAPACITY),
+                               dtype=np.int16)
+        self._shared = False # True while owner/tokens are shared
+        self._journal = None # list of changes once mark() is called
+
+        # same starting tokens as boardspace.BoardSpace.__init__
+        if self.lost_tribes.any():
+            self.owner[self.lost_tribes] = self.owner_code('lost_tribes')
+            self.tokens[self.lost_tribes, self.token_code('lost_tribes')] = 2
+        if mountains.any():
+            self.tokens[mountains, self.token_code('mountain')] = 1
+
+        self.zobrist = self._full_zobrist()
+        self._build_owner_index()
+
+    def _build_masks(self):
+        """helper function building the bitsets of the map"""
+        self.edge_mask = mask_from_bools(self.is_edge)
+        self.terrain_masks = {name: mask_from_bools(self.terrain == code)
+                              for name, code in TERRAIN_CODES.items()}
+        self.symbol_masks = {name: mask_from_bools(self.symbols & bit)
+                             for name, bit in SYMBOL_BITS.items()}
+        self.water_mask = self.terrain_masks['water']
+        self._neighbor_masks = [None] * len(self.space_ids)
+        # plain lists for the scalar owner index updates
+        self._neighbor_lists = [self.neighbors(index).tolist()
+                                for index in range(len(self.space_ids))]
+
+        # the space each CSR entry belongs to
+        self._neighbor_rows = np.repeat(np.arange(len(self.space_ids)),
+                                        np.diff(self.neighbor_offsets))
+
+    def _build_owner_index(self):
+        """helper function building the owner bitsets from the owner array
+
+        For every owner code: _owned is its bitset of spaces, _adjacent
+        counts for each space the owned spaces listing it as neighbor (a
+        plain list, cheap to update one element at a time) and _reach is
+        the bitset of spaces with a nonzero count."""
+
+        self._owned, self._reach, self._adjacent = {}, {}, {}
+        for code in np.unique(self.owner[self.owner != NO_OWNER]):
+            owned = self.owner == code
+            counts = np.bincount(self.neighbor_indices[owned[self._neighbor_rows]],
+                                 minlength=len(self))
+            self._owned[int(code)] = mask_from_bools(owned)
+            self._reach[int(code)] = mask_from_bools(counts)
+            self._adjacent[int(code)] = counts.tolist()
+
+    def _full_zobrist(self):
+        """helper function hashing the whole owner and tokens arrays"""
+        zobrist = 0
+        for index in np.flatnonzero(self.owner != NO_OWNER):
+            zobrist ^= zobrist_key(int(index), OWNER_COLUMN,
+                                   int(self.owner[index]))
+        for index, code in zip(*np.nonzero(self.tokens)):
+            zobrist ^= zobrist_key(int(index), int(code),
+                                   int(self.tokens[index, code]))
+        return zobrist
+
+    @classmethod
+    def from_spaces(cls, spaces):
+        """Builds a Board from the space dictionaries of a map json.
+
+        Args:
+            spaces: iterable of dicts with the keys written by
+                    gameboard_csv_to_json (id, terrain, is_edge,
+                    lost_tribes, neighbors and optionally symbols)
+
+        Returns:
+            Board with the spaces ordered by id"""
+
+        records = sorted(spaces, key=lambda space: int(space['id']))
+
+        index = {}
+        terrain, symbols, is_edge, lost_tribes = [], [], [], []
+        for record in records:
+            space_id = int(record['id'])
+            if space_id < 1:
+                raise sw_exceptions.InputError("Space ID must be positive")
+            if space_id in index:
+                raise sw_exceptions.InputError('Duplicate space ID: '
+                                               '{}'.format(space_id))
+            index[space_id] = len(index)
+
+            if record['terrain'] not in TERRAIN_CODES:
+                raise sw_exceptions.InputError('Invalid terrain type: '
+                                               '{}'.format(record['terrain']))
+            terrain.append(TERRAIN_CODES[record['terrain']])
+
+            mask = 0
+            for symbol in record.get('symbols') or ():
+                if symbol not in SYMBOL_BITS:
+                    raise sw_exceptions.InputError('Invalid map symbol: '
+                                                   '{}'.format(symbol))
+                mask |= SYMBOL_BITS[symbol]
+            symbols.append(mask)
+
+            is_edge.append(_as_bool(record.get('is_edge', True), 'is_edge'))
+            lost_tribes.append(_as_bool(record.get('lost_tribes', False),
+                                        'lost_tribes'))
+
+        # neighbor ids are only resolvable once every space has an index
+        offsets, indices = [0], []
+        for record in records:
+            for neighbor in record.get('neighbors') or ():
+                if int(neighbor) not in index:
+                    raise sw_exceptions.InputError(
+                        'Space {} has unknown neighbor {}'.format(record['id'],
+                                                                  neighbor))
+                indices.append(index[int(neighbor)])
+            offsets.append(len(indices))
+
+        return cls(sorted(index), terrain, symbols, is_edge, lost_tribes,
+                   offsets, indices)
+
+    @classmethod
+    def from_json(cls, map_json):
+        """Reads a map json written by gameboard_csv_to_json, in either the
+        indented or the compact format, into a Board"""
+        with open(map_json) as infile:
+            spaces = json.load(infile)
+
+        if 'spaces' in spaces: # compact format of compile_map
+            return cls.from_spaces(spaces['spaces'])
+        return cls.from_spaces(spaces.values())
+
+    @classmethod
+    def from_compiled(cls, map_swm):
+        """Maps a binary map written by mapfile.write_map into a Board.
+
+        The map arrays of the board are read-only views of the mapped
+        file, shared by every process loading it."""
+
+        return cls(*mapfile.load_map(map_swm))
+
+    @classmethod
+    def load(cls, map_path):
+        """Loads a binary (.swm) or json map, chosen by file extension"""
+        if map_path.endswith(mapfile.MAP_EXTENSION):
+            return cls.from_compiled(map_path)
+        return cls.from_json(map_path)
+
+    def __len__(self):
+        return len(self.space_ids)
+
+    def index_of(self, space_id):
+        """Returns the index of the space with map id space_id"""
+        try:
+            return self._index[int(space_id)]
+        except KeyError:
+            raise sw_exceptions.InputError('No space with ID: '
+                                           '{}'.format(space_id)) from None
+
+    def neighbors(self, index):
+        """Returns the indices of the neighbors of space index"""
+        return self.neighbor_indices[self.neighbor_offsets[index]:
+                                     self.neighbor_offsets[index + 1]]
+
+    def neighbor_mask(self, index):
+        """Returns the bitset of the neighbors of space index"""
+        mask = self._neighbor_masks[index]
+        if mask is None:
+            mask = mask_from_indices(self.neighbors(index))
+            self._neighbor_masks[index] = mask
+        return mask
+
+    def owned_mask(self, owner):
+        """Returns the bitset of the spaces owned by owner"""
+        return self._owned.get(self._owner_codes.get(owner), 0)
+
+    def frontier_mask(self, owner):
+        """Returns the bitset of the spaces next to, but not owned by, owner"""
+        code = self._owner_codes.get(owner)
+        return self._reach.get(code, 0) & ~self._owned.get(code, 0)
+
+    def conquerable_mask(self, owner):
+        """Returns the bitset of the spaces owner may attack next: the
+        frontier once owner holds a space, else the edge spaces; never
+        water or spaces owner already holds"""
+
+        owned = self.owned_mask(owner)
+        reachable = self.frontier_mask(owner) if owned else self.edge_mask
+        return reachable & ~self.water_mask & ~owned
+
+    def to_spaces(self):
+        """Returns a {space_id: BoardSpace} dictionary of detached copies of
+        every space, built through the unchecked BoardSpace.from_validated"""
+
+        spaces = {}
+        for index, space_id in enumerate(self.space_ids.tolist()):
+            mask = int(self.symbols[index])
+            symbol = next((name for name, bit in SYMBOL_BITS.items()
+                           if mask & bit), None)
+            space = boardspace.BoardSpace.from_validated(
+                space_id, boardspace.TERRAIN_TYPES[self.terrain[index]],
+                bool(self.is_edge[index]), False, symbol)
+            space.tokens = self.tokens_at(index)
+            space.owner = self.owner_of(index)
+            spaces[space_id] = space
+        return spaces
+
+    def space(self, space_id):
+        """Returns a BoardSpaceView of the space with map id space_id"""
+        return BoardSpaceView(self, self.index_of(space_id))
+
+    def spaces(self):
+        """Yields a BoardSpaceView for every space in index order"""
+        for index in range(len(self)):
+            yield BoardSpaceView(self, index)
+
+    def owner_code(self, owner):
+        """Returns the integer code of owner, registering new owners"""
+        if owner is None:
+            return NO_OWNER
+
+        code = self._owner_codes.get(owner)
+        if code is None:
+            if not isinstance(owner, str):
+                raise sw_exceptions.InputError('Change_owner requires a string as input.')
+            code = len(self.owners)
+            self.owners.append(owner)
+            self._owner_codes[owner] = code
+        return code
+
+    def owner_name(self, code):
+        """Returns the owner behind code, None for NO_OWNER"""
+        return None if code == NO_OWNER else self.owners[code]
+
+    def owner_of(self, index):
+        """Returns the name of the owner of space index"""
+        return self.owner_name(self.owner.item(index))
+
+    def token_code(self, token):
+        """Returns the integer code of token, registering new token types"""
+        code = self._token_codes.get(token)
+        if code is None:
+            code = len(self.token_types)
+            self.token_types.append(token)
+            self._token_codes[token] = code
+        if code >= self.tokens.shape[1]:
+            self._grow_token_columns(code + 1)
+        return code
+
+    def _grow_token_columns(self, needed):
+        """helper function doubling the token columns until needed fit"""
+        columns = self.tokens.shape[1]
+        while columns < needed:
+            columns *= 2
+        grown = np.zeros((len(self), columns), dtype=self.tokens.dtype)
+        grown[:, :self.tokens.shape[1]] = self.tokens
+        self.tokens = grown
+
+    def token_count(self, index, token):
+        """Returns the number of tokens of type token on space index"""
+        code = self._token_codes.get(token)
+        if code is None or code >= self.tokens.shape[1]:
+            return 0
+        return self.tokens.item(index, code)
+
+    def tokens_at(self, index):
+        """Returns a {token: count} dictionary of the tokens on space index"""
+        row = self.tokens[index]
+        return {self.token_types[code]: int(row[code])
+                for code in np.flatnonzero(row)}
+
+    def add_tokens(self, index, token, token_count):
+        """Add tokens to a space.
+
+        Args:
+            index: index of the space
+            token: string token descriptor
+            token_count: integer number of tokens to add"""
+
+        _check_integer(token_count, 1)
+        code = self.token_code(token)
+        self._set_count(index, code, self.tokens.item(index, code) + token_count)
+
+    def remove_tokens(self, index, token, token_count=None):
+        """Removes tokens of type token from a space.
+
+        Args:
+            index: index of the space
+            token: string of the token name
+            token_count: None - remove all tokens
+                         int - remove that number of tokens
+
+        Returns:
+            the number of tokens removed"""
+
+        on_space = self.token_count(index, token)
+        if on_space == 0:
+            raise sw_exceptions.InputError(
+                'Token {} could not be removed, not on space.'.format(token))
+
+        if token_count is None:
+            token_count = on_space
+        else:
+            _check_integer(token_count, 1)
+        if token_count > on_space:
+            raise sw_exceptions.InputError('Cannot remove more tokens ({}) '
+                                           'than on space ({})'.format(token_count,
+                                                                       on_space))
+
+        self._set_count(index, self._token_codes[token], on_space - token_count)
+        return token_count
+
+    def change_owner(self, index, new_owner=None):
+        """Change the owner of space index, None for no owner"""
+        self._set_owner(index, self.owner_code(new_owner))
+
+    def assign_spaces(self, indices, owners, token_rows):
+        """Sets the owner and every token count of several spaces at once.
+
+        Args:
+            indices: distinct space indices
+            owners: owner code of each space
+            token_rows: token counts of each space, one row per index with
+                        as many columns as tokens
+
+        The rows are written in one vectorized assignment; only changed
+        counts are journaled and hashed."""
+
+        indices = np.asarray(indices, dtype=np.intp)
+        token_rows = np.asarray(token_rows)
+        if token_rows.shape != (len(indices), self.tokens.shape[1]):
+            raise sw_exceptions.InputError('Token rows must have shape '
+                                           '{}'.format((len(indices),
+                                                        self.tokens.shape[1])))
+        if token_rows.size and not (0 <= token_rows.min()
+                                    and token_rows.max() <= MAX_COUNT):
+            raise sw_exceptions.InputError('Token counts must be between 0 '
+                                           'and {}'.format(MAX_COUNT))
+        if self._shared:
+            self._own_state()
+
+        old = self.tokens[indices]
+        for row, code in zip(*np.nonzero(old != token_rows)):
+            index = int(indices[row])
+            before, after = int(old[row, code]), int(token_rows[row, code])
+            if self._journal is not None:
+                self._journal.append((index, int(code), after - before))
+            if before:
+                self.zobrist ^= zobrist_key(index, code, before)
+            if after:
+                self.zobrist ^= zobrist_key(index, code, after)
+        self.tokens[indices] = token_rows
+
+        for index, code in zip(indices.tolist(), np.asarray(owners).tolist()):
+            if self.owner.item(index) != code:
+                self._set_owner(index, code)
+
+    def clone(self):
+        """Returns a copy of the board for exploring a move.
+
+        The map arrays are shared for good and owner/tokens until either
+        board changes, so cloning is O(1) and a state is only copied once
+        it diverges."""
+
+        child = copy.copy(self)
+        child._shared = self._shared = True
+        child._journal = None
+        return child
+
+    def own_vocabulary(self):
+        """Gives the board owner and token type lists of its own.
+
+        Clones share the names behind the codes, so every name registered
+        on one is seen by all. After this call, names registered here
+        (and on later clones of this board) stay here. Existing codes
+        keep their meaning."""
+
+        self.owners = list(self.owners)
+        self._owner_codes = dict(self._owner_codes)
+        self.token_types = list(self.token_types)
+        self._token_codes = dict(self._token_codes)
+
+    def adopt(self, owner, tokens):
+        """Returns a clone of the board playing on the given arrays.
+
+        Changes are written into owner and tokens in place, never copied,
+        so the arrays may live in shared memory. Every token type must be
+        registered before: a new one grows the token columns, after which
+        the clone writes to its own copy.
+
+        Args:
+            owner: int16 array (spaces,) of owner codes
+            tokens: int16 array (spaces, token columns) of token counts
+
+        Returns:
+            Board sharing the map and the codes of this board"""
+
+        if (owner.shape != self.owner.shape or tokens.shape != self.tokens.shape
+                or owner.dtype != self.owner.dtype
+                or tokens.dtype != self.tokens.dtype):
+            raise sw_exceptions.InputError('Arrays must be int16 of shapes {} '
+                                           'and {}'.format(self.owner.shape,
+                                                           self.tokens.shape))
+        child = self.clone()
+        child.owner, child.tokens = owner, tokens
+        child._shared = False
+        child.zobrist = child._full_zobrist()
+        child._build_owner_index()
+        return child
+
+    def snapshot(self):
+        """Returns a BoardSnapshot of the current owner and tokens in O(1)"""
+        self._shared = True
+        return BoardSnapshot(self.owner, self.tokens, self.zobrist,
+                             (self._owned, self._reach, self._adjacent))
+
+    def restore(self, snapshot):
+        """Returns the board to the state saved by snapshot().
+
+        While journaling, the restore is journaled like any other change,
+        one entry per owner and token count it changes, so outstanding
+        marks stay valid and undo returns to the state before it."""
+
+        tokens = snapshot.tokens
+        if tokens.shape[1] < self.tokens.shape[1]:
+            # token types registered since the snapshot keep their columns
+            tokens = np.zeros_like(self.tokens)
+            tokens[:, :snapshot.tokens.shape[1]] = snapshot.tokens
+
+        if self._journal is not None:
+            for index in np.flatnonzero(snapshot.owner != self.owner).tolist():
+                self._journal.append((index, OWNER_COLUMN,
+                                      int(snapshot.owner[index])
+                                      - int(self.owner[index])))
+            current = np.zeros_like(tokens)
+            current[:, :self.tokens.shape[1]] = self.tokens
+            rows, codes = np.nonzero(tokens != current)
+            deltas = (tokens[rows, codes].astype(np.int32)
+                      - current[rows, codes])
+            self._journal.extend(zip(rows.tolist(), codes.tolist(),
+                                     deltas.tolist()))
+
+        self.owner, self.tokens = snapshot.owner, tokens
+        self.zobrist = snapshot.zobrist
+        self._owned, self._reach, self._adjacent = snapshot.owner_index
+        self._shared = True
+
+    def mark(self):
+        """Starts journaling changes if needed and returns a mark for undo"""
+        if self._journal is None:
+            self._journal = []
+        return len(self._journal)
+
+    def undo(self, mark=0):
+        """Reverts every change made since mark() returned mark.
+
+        Each change is reverted in O(1), in reverse order."""
+
+        journal = self._journal
+        if journal is None or not 0 <= mark <= len(journal):
+            raise sw_exceptions.InputError('Invalid journal mark: {}'.format(mark))
+
+        self._journal = None # reverting must not journal itself
+        try:
+            while len(journal) > mark:
+                index, column, delta = journal.pop()
+                if column == OWNER_COLUMN:
+                    self._set_owner(index, self.owner.item(index) - delta)
+                else:
+                    self._set_count(index, column,
+                                    self.tokens.item(index, column) - delta)
+        finally:
+            self._journal = journal
+
+    def changes_since(self, mark=0):
+        """Returns the journal entries recorded since mark"""
+        if self._journal is None:
+            return []
+        return self._journal[mark:]
+
+    @property
+    def journaling(self):
+        """True while changes are journaled, see mark()"""
+        return self._journal is not None
+
+    def stop_journal(self):
+        """Stops journaling; the board can no longer be undone"""
+        self._journal = None
+
+    @contextlib.contextmanager
+    def trial(self):
+        """Context manager undoing every change made inside it.
+
+        Example:
+            with board.trial():
+                board.add_tokens(index, 'ratmen', 3)
+                value = evaluate(board)"""
+
+        started = self._journal is None
+        mark = self.mark()
+        try:
+            yield self
+        finally:
+            self.undo(mark)
+            if started:
+                self.stop_journal()
+
+    def _own_state(self):
+        """helper function copying shared owner/tokens before a change"""
+        self.owner = self.owner.copy()
+        self.tokens = self.tokens.copy()
+        self._owned = dict(self._owned)
+        self._reach = dict(self._reach)
+        self._adjacent = {code: list(counts)
+                          for code, counts in self._adjacent.items()}
+        self._shared = False
+
+    # every single change to owner and tokens goes through these two
+    # writes; assign_spaces does the same bookkeeping for whole rows.
+    # Both stay on Python ints: item() reads, one scalar array write
+    def _set_count(self, index, code, count):
+        # checked before the journal and the hash see the change
+        if not 0 <= count <= MAX_COUNT:
+            raise sw_exceptions.InputError('Illegal token count: {}! Must be '
+                                           'between 0 and {} !'.format(count,
+                                                                      MAX_COUNT))
+        if self._shared:
+            self._own_state()
+        old = self.tokens.item(index, code)
+        if old == count:
+            return
+        if self._journal is not None:
+            self._journal.append((index, code, count - old))
+        zobrist = self.zobrist
+        if old:
+            zobrist ^= zobrist_key(index, code, old)
+        if count:
+            zobrist ^= zobrist_key(index, code, count)
+        self.zobrist = zobrist
+        self.tokens[index, code] = count
+
+    def _set_owner(self, index, code):
+        if self._shared:
+            self._own_state()
+        old = self.owner.item(index)
+        if old == code:
+            return
+        if self._journal is not None:
+            self._journal.append((index, OWNER_COLUMN, code - old))
+        zobrist = self.zobrist
+        if old != NO_OWNER:
+            zobrist ^= zobrist_key(index, OWNER_COLUMN, old)
+            self._update_owner_index(index, old, -1)
+        if code != NO_OWNER:
+            zobrist ^= zobrist_key(index, OWNER_COLUMN, code)
+            self._update_owner_index(index, code, 1)
+        self.zobrist = zobrist
+        self.owner[index] = code
+
+    def _update_owner_index(self, index, code, step):
+        """helper function adding (step 1) or removing (step -1) space index
+        from the owner bitsets of code in O(neighbors)"""
+
+        bit = 1 << int(index)
+        owned = self._owned.get(code, 0)
+        counts = self._adjacent.get(code)
+        if counts is None:
+            counts = self._adjacent[code] = [0] * len(self)
+        reach = self._reach.get(code, 0)
+        if step > 0:
+            self._owned[code] = owned | bit
+            reach |= self.neighbor_mask(index)
+            for neighbor in self._neighbor_lists[index]:
+                counts[neighbor] += 1
+        else:
+            self._owned[code] = owned & ~bit
+            for neighbor in self._neighbor_lists[index]:
+                counts[neighbor] -= 1
+                if not counts[neighbor]:
+                    reach &= ~(1 << neighbor)
+        self._reach[code] = reach
+
+
+class BoardSpaceView(boardspace.BoardSpace):
+    """ BoardSpace reading and writing one row of a Board
+
+    Behaves like the BoardSpace built from the same map data, but holds no
+    state of its own: every read and change goes to the board arrays.
+    tokens is a fresh dict built from the row, so change tokens through
+    add_tokens/remove_tokens.
+    """
+
+    __slots__ = ('_board', '_index')
+
+    def __init__(self, board, index):
+        # BoardSpace.__init__ is skipped: the row was validated on load
+        self._board = board
+        self._index = index
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def space_id(self):
+        return int(self._board.space_ids[self._index])
+
+    @property
+    def terrain(self):
+        return boardspace.TERRAIN_TYPES[self._board.terrain[self._index]]
+
+    @property
+    def symbols(self):
+        mask = self._board.symbols[self._index]
+        return [symbol for symbol, bit in SYMBOL_BITS.items() if mask & bit]
+
+    @property
+    def symbol(self):
+        symbols = self.symbols
+        return symbols[0] if symbols else None
+
+    @property
+    def is_edge(self):
+        return bool(self._board.is_edge[self._index])
+
+    @property
+    def neighbors(self):
+        return [int(self._board.space_ids[index])
+                for index in self._board.neighbors(self._index)]
+
+    @property
+    def owner(self):
+        return self._board.owner_of(self._index)
+
+    @owner.setter
+    def owner(self, new_owner):
+        self._board.change_owner(self._index, new_owner)
+
+    @property
+    def tokens(self):
+        return self._board.tokens_at(self._index)
+
+    def add_tokens(self, token: str, token_count: int):
+        """Add tokens to the space, see Board.add_tokens"""
+        self._board.add_tokens(self._index, token, token_count)
+
+    def remove_tokens(self, token: str, token_count=None):
+        """Removes tokens from the space, see Board.remove_tokens"""
+        return self._board.remove_tokens(self._index, token, token_count)
+
+    def change_owner(self, new_owner=None):
+        """Change the owner of the space"""
+        self._board.change_owner(self._index, new_owner)
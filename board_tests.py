@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+import board, boardspace, sw_exceptions
+import os
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestBoard_Load(unittest.TestCase):
+    """Tests loading map_2_player.json into a Board"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+
+    def test_space_count(self):
+        '''Check that every space of the map is loaded'''
+        self.assertEqual(len(self.board), 23)
+
+    def test_terrain(self):
+        '''Check terrain decoding through a view'''
+        self.assertEqual(self.board.space(1).terrain, 'water')
+        self.assertEqual(self.board.space(6).terrain, 'mountain')
+
+    def test_symbols(self):
+        '''Check that spaces keep all of their symbols'''
+        self.assertEqual(self.board.space(6).symbols, ['cavern', 'mine'])
+        self.assertIsNone(self.board.space(1).symbol)
+
+    def test_neighbors(self):
+        '''Check that the CSR adjacency holds the map neighbors'''
+        self.assertEqual(self.board.space(1).neighbors, [2, 6, 7])
+        self.assertEqual(len(self.board.neighbor_offsets), 24)
+
+    def test_edge(self):
+        '''Check the is_edge flags'''
+        self.assertTrue(self.board.space(1).is_edge)
+        self.assertFalse(self.board.space(7).is_edge)
+
+    def test_lost_tribes(self):
+        '''Check lost tribes owner and tokens like BoardSpace.__init__'''
+        space = self.board.space(4)
+        self.assertEqual(space.owner, 'lost_tribes')
+        self.assertEqual(space.tokens, {'lost_tribes': 2})
+
+    def test_mountain_token(self):
+        '''Check that mountains start with one mountain token'''
+        self.assertEqual(self.board.space(6).tokens, {'mountain': 1})
+
+    def test_to_spaces(self):
+        '''Check the detached BoardSpace copies of the board'''
+        spaces = self.board.to_spaces()
+        self.assertEqual(len(spaces), 23)
+        self.assertEqual(spaces[4].owner, 'lost_tribes')
+        self.assertEqual(spaces[4].tokens, {'lost_tribes': 2})
+        self.assertEqual(spaces[6].symbol, 'cavern')
+        spaces[4].add_tokens('ratmen', 1)
+        self.assertEqual(self.board.space(4).tokens, {'lost_tribes': 2})
+
+    def test_view_is_boardspace(self):
+        '''Check that views can be used where a BoardSpace is expected'''
+        self.assertIsInstance(self.board.space(1), boardspace.BoardSpace)
+
+
+class TestBoard_Restrictions(unittest.TestCase):
+    """Tests map validation when building a Board"""
+
+    def space(self, **kwargs):
+        space = {'id': '1', 'terrain': 'farm', 'is_edge': 'True',
+                 'lost_tribes': 'False', 'neighbors': []}
+        space.update(kwargs)
+        return space
+
+    def test_bad_terrain(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            board.Board.from_spaces([self.space(terrain='Farm')])
+
+    def test_bad_symbol(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            board.Board.from_spaces([self.space(symbols=['MagicSource'])])
+
+    def test_unknown_neighbor(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            board.Board.from_spaces([self.space(neighbors=['2'])])
+
+    def test_no_lost_tribes_on_mountain(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            board.Board.from_spaces([self.space(terrain='mountain',
+                                                lost_tribes='True')])
+
+
+class TestBoard_Tokens(unittest.TestCase):
+    """Tests token and owner changes through the board and its views"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+        self.space = self.board.space(2)
+
+    def test_add_tokens(self):
+        self.space.add_tokens('generic_tokens', 2)
+        self.space.add_tokens('generic_tokens', 3)
+        self.assertEqual(self.space.tokens['generic_tokens'], 5)
+
+    def test_add_tokens_zero_values(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            self.space.add_tokens('generic_tokens', 0)
+
+    def test_remove_some(self):
+        self.space.add_tokens('generic_tokens', 5)
+        self.assertEqual(self.space.remove_tokens('generic_tokens', 1), 1)
+        self.assertEqual(self.space.tokens['generic_tokens'], 4)
+
+    def test_remove_all(self):
+        self.space.add_tokens('generic_tokens', 5)
+        self.assertEqual(self.space.remove_tokens('generic_tokens'), 5)
+        self.assertNotIn('generic_tokens', self.space.tokens)
+
+    def test_remove_wrong_key(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            self.space.remove_tokens('generic_token')
+
+    def test_remove_invalid_count(self):
+        self.space.add_tokens('generic_tokens', 5)
+        with self.assertRaises(sw_exceptions.InputError):
+            self.space.remove_tokens('generic_tokens', -5)
+        with self.assertRaises(TypeError):
+            self.space.remove_tokens('generic_tokens', 1.5)
+        self.assertEqual(self.space.tokens['generic_tokens'], 5)
+
+    def test_token_columns_grow(self):
+        '''Check that new token types beyond the initial columns fit'''
+        for count in range(1, board.TOKEN_CAPACITY + 3):
+            self.space.add_tokens('race_{}'.format(count), count)
+        self.assertEqual(self.board.token_count(self.space.index, 'race_9'), 9)
+
+    def test_change_owner(self):
+        self.space.change_owner('ratmen')
+        self.assertEqual(self.space.owner, 'ratmen')
+        self.space.change_owner(None)
+        self.assertIsNone(self.space.owner)
+
+class TestBoard_Clone(unittest.TestCase):
+    """Tests copy on write clones and snapshots"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+        self.index = self.board.index_of(2)
+
+    def test_clone_shares_until_changed(self):
+        child = self.board.clone()
+        self.assertIs(child.owner, self.board.owner)
+        child.change_owner(self.index, 'ratmen')
+        self.assertIsNot(child.owner, self.board.owner)
+        self.assertIs(child.terrain, self.board.terrain)
+
+    def test_clone_is_independent(self):
+        child = self.board.clone()
+        child.add_tokens(self.index, 'ratmen', 3)
+        self.board.add_tokens(self.index, 'giants', 2)
+        self.assertEqual(child.tokens_at(self.index), {'ratmen': 3})
+        self.assertEqual(self.board.tokens_at(self.index), {'giants': 2})
+
+    def test_adopt_writes_in_place(self):
+        owner, tokens = self.board.owner.copy(), self.board.tokens.copy()
+        child = self.board.adopt(owner, tokens)
+        child.add_tokens(self.index, 'ratmen', 3)
+        child.change_owner(self.index, 'ratmen')
+        self.assertIs(child.owner, owner)
+        self.assertEqual(owner[self.index], child.owner_code('ratmen'))
+        self.assertEqual(self.board.owner_of(self.index), None)
+        self.assertRaises(sw_exceptions.InputError, self.board.adopt,
+                          owner[1:], tokens)
+
+    def test_snapshot_restore(self):
+        snapshot = self.board.snapshot()
+        self.board.add_tokens(self.index, 'ratmen', 3)
+        self.board.change_owner(self.index, 'ratmen')
+        self.board.restore(snapshot)
+        self.assertEqual(self.board.tokens_at(self.index), {})
+        self.assertIsNone(self.board.owner_of(self.index))
+
+
+class TestBoard_Journal(unittest.TestCase):
+    """Tests make/unmake through the move journal"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+        self.index = self.board.index_of(4) # lost tribes space
+
+    def conquer(self):
+        self.board.remove_tokens(self.index, 'lost_tribes')
+        self.board.add_tokens(self.index, 'ratmen', 4)
+        self.board.change_owner(self.index, 'ratmen')
+
+    def test_undo_conquest(self):
+        mark = self.board.mark()
+        self.conquer()
+        self.assertEqual(len(self.board.changes_since(mark)), 3)
+        self.board.undo(mark)
+        self.assertEqual(self.board.owner_of(self.index), 'lost_tribes')
+        self.assertEqual(self.board.tokens_at(self.index), {'lost_tribes': 2})
+        self.assertEqual(self.board.changes_since(mark), [])
+
+    def test_nested_marks(self):
+        self.board.mark()
+        self.conquer()
+        inner = self.board.mark()
+        self.board.remove_tokens(self.index, 'ratmen', 3)
+        self.board.undo(inner)
+        self.assertEqual(self.board.tokens_at(self.index), {'ratmen': 4})
+
+    def test_restore_keeps_marks(self):
+        '''Check that a restore is journaled and undone like other changes'''
+        mark = self.board.mark()
+        self.board.add_tokens(self.index, 'ratmen', 2)
+        snapshot = self.board.snapshot()
+        with self.board.trial():
+            self.conquer()
+            self.board.restore(snapshot)
+        self.assertEqual(self.board.tokens_at(self.index),
+                         {'lost_tribes': 2, 'ratmen': 2})
+
+        self.conquer()
+        inner = self.board.mark()
+        self.board.restore(snapshot)
+        self.assertEqual(self.board.owner_of(self.index), 'lost_tribes')
+        self.board.undo(inner)
+        self.assertEqual(self.board.tokens_at(self.index), {'ratmen': 6})
+        self.board.undo(mark)
+        self.assertEqual(self.board.tokens_at(self.index), {'lost_tribes': 2})
+        self.assertEqual(self.board.zobrist, self.board._full_zobrist())
+
+    def test_trial(self):
+        with self.board.trial():
+            self.assertTrue(self.board.journaling)
+            self.conquer()
+        self.assertEqual(self.board.owner_of(self.index), 'lost_tribes')
+        self.assertFalse(self.board.journaling)
+
+    def test_overflow_leaves_board(self):
+        '''Check that a count past int16 changes neither journal nor hash'''
+        self.board.add_tokens(self.index, 'ratmen', board.MAX_COUNT)
+        mark, start = self.board.mark(), self.board.zobrist
+        with self.assertRaises(sw_exceptions.InputError):
+            self.board.add_tokens(self.index, 'ratmen', 1)
+        self.assertEqual(self.board.token_count(self.index, 'ratmen'),
+                         board.MAX_COUNT)
+        self.assertEqual(self.board.changes_since(mark), [])
+        self.assertEqual(self.board.zobrist, start)
+        self.assertEqual(self.board.zobrist, self.board._full_zobrist())
+
+    def test_undo_without_journal(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            self.board.undo()
+
+
+class TestBoard_Zobrist(unittest.TestCase):
+    """Tests the incremental Zobrist hash"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+
+    def test_initial_hash(self):
+        '''Check that the loaded board hashes its starting tokens'''
+        self.assertNotEqual(self.board.zobrist, 0)
+        self.assertEqual(self.board.zobrist, self.board._full_zobrist())
+
+    def test_incremental_matches_full(self):
+        index = self.board.index_of(4)
+        self.board.remove_tokens(index, 'lost_tribes')
+        self.board.add_tokens(index, 'ratmen', 4)
+        self.board.change_owner(index, 'ratmen')
+        self.assertEqual(self.board.zobrist, self.board._full_zobrist())
+
+    def test_undo_restores_hash(self):
+        start = self.board.zobrist
+        with self.board.trial():
+            self.board.add_tokens(0, 'ratmen', 2)
+            self.assertNotEqual(self.board.zobrist, start)
+        self.assertEqual(self.board.zobrist, start)
+
+    def test_transposition(self):
+        '''Check that move order does not change the hash'''
+        child = self.board.clone()
+        self.board.add_tokens(1, 'ratmen', 2)
+        self.board.add_tokens(2, 'ratmen', 3)
+        child.add_tokens(2, 'ratmen', 3)
+        child.add_tokens(1, 'ratmen', 2)
+        self.assertEqual(self.board.zobrist, child.zobrist)
+
+
+class TestBoard_Masks(unittest.TestCase):
+    """Tests the bitset indexes of the map and of each owner"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+
+    def ids(self, mask):
+        return [int(self.board.space_ids[index])
+                for index in board.mask_to_indices(mask)]
+
+    def test_mask_round_trip(self):
+        mask = board.mask_from_indices([0, 3, 70])
+        self.assertEqual(board.mask_to_indices(mask).tolist(), [0, 3, 70])
+        self.assertEqual(board.mask_to_indices(0).tolist(), [])
+
+    def test_map_masks(self):
+        self.assertEqual(self.ids(self.board.water_mask), [1, 8, 23])
+        self.assertEqual(self.ids(self.board.symbol_masks['mine']),
+                         [3, 6, 16, 19])
+        self.assertEqual(self.ids(self.board.neighbor_mask(0)), [2, 6, 7])
+        self.assertNotIn(7, self.ids(self.board.edge_mask))
+
+    def test_lost_tribes_owned(self):
+        self.assertEqual(self.ids(self.board.owned_mask('lost_tribes')),
+                         [4, 7, 11, 12, 13, 14, 15, 17, 19])
+
+    def test_conquerable_without_spaces(self):
+        '''Check that a race entering the map may only attack edges'''
+        conquerable = self.ids(self.board.conquerable_mask('ratmen'))
+        self.assertNotIn(1, conquerable) # water
+        self.assertNotIn(7, conquerable) # not an edge
+        self.assertIn(2, conquerable)
+
+    def test_frontier_updates(self):
+        self.board.change_owner(self.board.index_of(2), 'ratmen')
+        self.assertEqual(self.ids(self.board.frontier_mask('ratmen')), [1, 3, 7])
+        self.board.change_owner(self.board.index_of(3), 'ratmen')
+        self.assertEqual(self.ids(self.board.frontier_mask('ratmen')),
+                         [1, 4, 7, 8, 9])
+        self.board.change_owner(self.board.index_of(2), None)
+        self.assertEqual(self.ids(self.board.frontier_mask('ratmen')),
+                         [2, 4, 7, 8, 9])
+
+    def test_frontier_undo_and_clone(self):
+        child = self.board.clone()
+        with child.trial():
+            child.change_owner(child.index_of(2), 'ratmen')
+            self.assertEqual(self.board.frontier_mask('ratmen'), 0)
+        self.assertEqual(child.frontier_mask('ratmen'), 0)
+        self.assertEqual(child.owned_mask('ratmen'), 0)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -1,6 +1,16 @@
 #!/usr/bin/env python
 """ Module implements the Class object describing the spaces of SW """
 import sw_exceptions
+
+# Ordered vocabularies; the position of each entry is its integer code
+# in the array-backed board.Board.
+TERRAIN_TYPES = ('farm', 'mesa', 'mountain', 'swamp', 'water')
+MAP_SYMBOLS = ('cavern', 'magic', 'mine')
+
+# built once for the membership checks of every BoardSpace
+_TERRAIN_SET = frozenset(TERRAIN_TYPES)
+_SYMBOL_SET = frozenset(MAP_SYMBOLS)
+
 class BoardSpace:
     """ Basic Small World Space
     ...
@@ -31,7 +41,9 @@ class BoardSpace:
 
     """
 
-    # I am not sure about the choice to make this global?
+    # no per-space __dict__; boards hold many spaces
+    __slots__ = ('tokens', 'terrain', 'symbol', 'space_id', 'is_edge', 'owner',
+                 'neighbors')
 
     def add_tokens(self, token: str, token_count: int):
         """Add tokens to a smallworld space.
@@ -71,7 +83,9 @@ class BoardSpace:
         elif token_count is None:
             return self.tokens.pop(token, None) # return tokens to user
 
-        elif token_count > self.tokens[token]:
+        self.__check_less_than_integer(token_count, 1)
+
+        if token_count > self.tokens[token]:
             # TODO: change this to a custom exception later?
             raise sw_exceptions.InputError('Cannot remove more tokens \
                                             ({}) than on space ({})\
@@ -84,14 +98,14 @@ class BoardSpace:
             return self.tokens.pop(token, None) # return tokens to user
 
         else:
-            self.tokens[token] -= 2
+            self.tokens[token] -= token_count
             return token_count
 
     def change_owner(self, new_owner=None):
         """Change the owner of the space"""
 
         # TODO: Write a restriction on input
-        if (not None) and (not isinstance(new_owner, str)):
+        if (new_owner is not None) and (not isinstance(new_owner, str)):
             raise sw_exceptions.InputError('Change_owner requires a string as input.')
 
         else: self.owner = new_owner
@@ -112,10 +126,7 @@ class BoardSpace:
                             lost_tribes, map_symbol):
         """This function raises assertions for all input errors"""
 
-        __terrain_types = set(['farm', 'mesa', 'mountain', 'swamp', 'water'])
-        __map_symbols = set(['cavern', 'magic', 'mine'])
-
-        if terrain not in __terrain_types:
+        if terrain not in _TERRAIN_SET:
             raise sw_exceptions.InputError('Invalid terrain type: \
                                            {}'.format(terrain))
 
@@ -130,7 +141,7 @@ class BoardSpace:
             raise TypeError('ID:({}) invalid!\
                             Must be an integer!'.format(space_id))
 
-        if (map_symbol is not None) and (map_symbol not in __map_symbols):
+        if (map_symbol is not None) and (map_symbol not in _SYMBOL_SET):
             raise sw_exceptions.InputError('Invalid map symbol: \
                                             {}'.format(map_symbol))
 
@@ -158,8 +169,27 @@ class BoardSpace:
 
         # check for input error
         self.__check_init_inputs(space_id, terrain, edge, lost_tribes, map_symbol)
+        self.__set_up(space_id, terrain, edge, lost_tribes, map_symbol)
+
+    @classmethod
+    def from_validated(cls, space_id, terrain, edge=True,
+                       lost_tribes=False, map_symbol=None):
+        """Builds a BoardSpace from trusted inputs without checking them.
+
+        Only for data that was already validated, e.g. a compiled map;
+        the arguments are those of __init__.
+
+        Output: object of type BoardSpace """
+
+        space = cls.__new__(cls)
+        space.__set_up(space_id, terrain, edge, lost_tribes, map_symbol)
+        return space
+
+    def __set_up(self, space_id, terrain, edge, lost_tribes, map_symbol):
+        """sets the attributes and starting tokens of checked inputs"""
 
         # intialize the neighbors and tokens lists
+        self.neighbors = [] # space_ids of the neighboring spaces
         self.tokens = {} # key = types of space tokens, value = their number
         self.terrain = terrain # initialize terrain
         self.symbol = map_symbol # initialize symbol
@@ -171,11 +201,11 @@ class BoardSpace:
             self.owner = None
         else:
             self.owner = 'lost_tribes'
-            self.add_tokens('lost_tribes', 2)
+            self.tokens['lost_tribes'] = 2
 
         # add mountain tokens
         if terrain == 'mountain':
-            self.add_tokens('mountain', 1)
+            self.tokens['mountain'] = 1
 
     def __repr__(self):
         #TODO: Have this print out useful information:
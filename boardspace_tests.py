@@ -83,6 +83,30 @@ class TestSpaceInit_Restrictions(unittest.TestCase):
             boardspace.BoardSpace(1.4,'swamp')
 
 
+class TestSpaceInit_Validated(unittest.TestCase):
+    """Tests the unchecked from_validated construction path"""
+
+    def test_matches_init(self):
+        '''Tests that from_validated builds the same space as __init__'''
+        for args in [(1,'farm'), (2,'swamp',False,True,'magic'), (3,'mountain')]:
+            checked = boardspace.BoardSpace(*args)
+            trusted = boardspace.BoardSpace.from_validated(*args)
+            for name in boardspace.BoardSpace.__slots__:
+                self.assertEqual(getattr(trusted,name), getattr(checked,name))
+
+    def test_no_instance_dict(self):
+        '''Tests that spaces are slotted'''
+        space = boardspace.BoardSpace(1,'farm')
+        self.assertFalse(hasattr(space,'__dict__'))
+        space.neighbors = [2,3]
+        self.assertEqual(space.neighbors,[2,3])
+
+    def test_init_still_checks(self):
+        '''Tests that validation stays the default'''
+        with self.assertRaises(sw_exceptions.InputError):
+            boardspace.BoardSpace(1,'Farm')
+
+
 # this code for error handling was found at https://docs.python.org/2/tutorial/errors.html
 
 class TestSpaceInit_LostTribes(unittest.TestCase):
@@ -202,6 +226,18 @@ class TestSpaceFunctions(unittest.TestCase):
         # assert that the proper # of tokens remain
         self.assertEqual(self.space.tokens['generic_tokens'],3)
 
+    def test_remove_tokens_remove_one(self):
+        '''tests that remove_tokens subtracts the requested number of tokens'''
+        self.space.add_tokens('generic_tokens',5)
+        self.assertEqual(self.space.remove_tokens('generic_tokens',1),1)
+        self.assertEqual(self.space.tokens['generic_tokens'],4)
+
+    def test_change_owner_to_none(self):
+        '''tests that change_owner accepts None to clear the owner'''
+        self.space.change_owner('ratmen')
+        self.space.change_owner(None)
+        self.assertIsNone(self.space.owner)
+
     def test_remove_tokens_remove_too_many(self):
         ''' tests that remove_tokens throws an exception
             if too many tokens are removed'''
@@ -209,6 +245,15 @@ class TestSpaceFunctions(unittest.TestCase):
         with self.assertRaises(sw_exceptions.InputError):
             self.space.remove_tokens(5)
 
+    def test_remove_tokens_invalid_count(self):
+        ''' tests that remove_tokens rejects negative and fractional counts'''
+        self.space.add_tokens('generic_tokens',5)
+        with self.assertRaises(sw_exceptions.InputError):
+            self.space.remove_tokens('generic_tokens',-5)
+        with self.assertRaises(TypeError):
+            self.space.remove_tokens('generic_tokens',1.5)
+        self.assertEqual(self.space.tokens['generic_tokens'],5)
+
     def test_remove_tokens_remove_wrong_key(self):
         ''' tests that remove_tokens throws an exception
  		if a bad key is suplied'''
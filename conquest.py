@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+""" Module implements batched conquest costs and combat resolution for SW """
+import numpy as np
+
+import board
+import sw_exceptions
+
+BASE_COST = 2 # tokens needed to conquer an empty space
+REINFORCEMENT_DIE = (0, 0, 0, 1, 2, 3)
+
+_DIE = np.array(REINFORCEMENT_DIE)
+
+
+def costs(game_board, indices):
+    """Returns the conquest cost of each space in indices: BASE_COST plus
+    one for every token on it (lost tribes, mountain, defending race)"""
+    return BASE_COST + game_board.tokens[indices].sum(axis=1)
+
+
+def conquest_costs(game_board, player):
+    """Computes the conquest cost of every space player may attack.
+
+    Args:
+        game_board: board.Board
+        player: owner name of the attacker
+
+    Returns:
+        (indices, costs) integer arrays"""
+
+    indices = board.mask_to_indices(game_board.conquerable_mask(player))
+    return indices, costs(game_board, indices)
+
+
+def reinforcement_odds(space_costs, hand):
+    """Returns the chance of conquering each space with every token in hand
+    plus one reinforcement die roll (0 with an empty hand)"""
+    needed = np.asarray(space_costs) - hand
+    odds = (_DIE >= needed[..., np.newaxis]).mean(axis=-1)
+    return odds if hand > 0 else np.zeros_like(odds)
+
+
+def roll_reinforcements(space_costs, hand, rng):
+    """Rolls one reinforcement die per space.
+
+    Args:
+        space_costs: conquest costs
+        hand: tokens in hand
+        rng: numpy.random.Generator
+
+    Returns:
+        bool array, True where hand plus the roll meets the cost"""
+
+    rolls = rng.choice(_DIE, size=np.shape(space_costs))
+    return (hand > 0) & (hand + rolls >= space_costs)
+
+
+def apply_conquest(game_board, player, indices, tokens):
+    """Conquers several spaces for player at once.
+
+    Every space is checked before the board changes, so either all
+    conquests happen or none. Each defending race loses one token per
+    space and takes the rest back; lost tribes are removed. Costs are not
+    checked, the caller decides how many tokens to move in.
+
+    Args:
+        game_board: board.Board
+        player: owner name of the attacker
+        indices: distinct indices of the spaces to conquer
+        tokens: tokens of player moving into each space
+
+    Returns:
+        {defender: tokens returned to hand} dictionary"""
+
+    indices = np.asarray(indices, dtype=np.intp).reshape(-1)
+    tokens = np.broadcast_to(np.asarray(tokens, dtype=np.int64), indices.shape)
+
+    if len(np.unique(indices)) != len(indices):
+        raise sw_exceptions.InputError('Each space can only be conquered once.')
+    if (tokens < 1).any():
+        raise sw_exceptions.InputError('Conquests need at least one token.')
+    if (game_board.terrain[indices] == board.TERRAIN_CODES['water']).any():
+        raise sw_exceptions.InputError('Water cannot be conquered.')
+
+    code = game_board.owner_code(player)
+    defenders = game_board.owner[indices]
+    if (defenders == code).any():
+        raise sw_exceptions.InputError('{} already owns a space.'.format(player))
+
+    # register every token column before copying rows
+    column = game_board.token_code(player)
+    defender_columns = {int(defender): game_board.token_code(
+                            game_board.owner_name(defender))
+                        for defender in np.unique(defenders)
+                        if defender != board.NO_OWNER}
+
+    rows = game_board.tokens[indices]
+    returned = {}
+    for defender, defender_column in defender_columns.items():
+        defending = defenders == defender
+        counts = rows[defending, defender_column]
+        returned[game_board.owner_name(defender)] = int(
+            np.maximum(counts - 1, 0).sum())
+        rows[defending, defender_column] = 0
+    rows[:, column] += tokens.astype(rows.dtype)
+
+    game_board.assign_spaces(indices, np.full(len(indices), code), rows)
+    return returned
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+import board, conquest, sw_exceptions
+import os
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestConquest_Costs(unittest.TestCase):
+    """Tests the vectorized conquest costs and odds"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+
+    def test_entry_costs(self):
+        '''Check the costs of the edge spaces a new race may enter'''
+        indices, costs = conquest.conquest_costs(self.board, 'ratmen')
+        by_id = dict(zip(self.board.space_ids[indices].tolist(), costs.tolist()))
+        self.assertEqual(by_id[2], 2) # empty
+        self.assertEqual(by_id[4], 4) # lost tribes
+        self.assertEqual(by_id[6], 3) # mountain
+        self.assertNotIn(1, by_id) # water
+        self.assertNotIn(7, by_id) # not an edge
+
+    def test_reinforcement_odds(self):
+        odds = conquest.reinforcement_odds(np.array([3, 4, 5, 6, 7]), 3)
+        np.testing.assert_allclose(odds, [1, 0.5, 2 / 6, 1 / 6, 0])
+        self.assertEqual(conquest.reinforcement_odds([2], 0).tolist(), [0])
+
+    def test_roll_reinforcements(self):
+        rng = np.random.default_rng(5)
+        success = conquest.roll_reinforcements(np.full(6000, 5), 3, rng)
+        self.assertAlmostEqual(success.mean(), 2 / 6, delta=0.03)
+
+class TestConquest_Apply(unittest.TestCase):
+    """Tests the bulk apply_conquest"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+        self.spaces = [self.board.index_of(space_id) for space_id in (2, 4, 6)]
+
+    def test_apply(self):
+        returned = conquest.apply_conquest(self.board, 'ratmen',
+                                           self.spaces, [2, 4, 3])
+        self.assertEqual(returned, {'lost_tribes': 1})
+        self.assertEqual(self.board.space(4).tokens, {'ratmen': 4})
+        self.assertEqual(self.board.space(6).tokens, {'mountain': 1, 'ratmen': 3})
+        self.assertEqual([self.board.owner_of(index) for index in self.spaces],
+                         ['ratmen'] * 3)
+        self.assertEqual(self.board.zobrist, self.board._full_zobrist())
+
+    def test_defender_returns(self):
+        conquest.apply_conquest(self.board, 'ratmen', self.spaces, 3)
+        returned = conquest.apply_conquest(self.board, 'giants',
+                                           self.spaces[:2], [5, 7])
+        self.assertEqual(returned, {'ratmen': 4})
+        self.assertEqual(self.board.frontier_mask('ratmen'),
+                         self.board.neighbor_mask(self.spaces[2])
+                         & ~(1 << self.spaces[2]))
+
+    def test_atomic(self):
+        '''Check that a bad space leaves the board untouched'''
+        start = self.board.zobrist
+        water = self.board.index_of(1)
+        with self.assertRaises(sw_exceptions.InputError):
+            conquest.apply_conquest(self.board, 'ratmen',
+                                    self.spaces + [water], 2)
+        self.assertEqual(self.board.zobrist, start)
+        self.assertEqual(self.board.owned_mask('ratmen'), 0)
+
+    def test_undo(self):
+        mark = self.board.mark()
+        conquest.apply_conquest(self.board, 'ratmen', self.spaces, 3)
+        self.board.undo(mark)
+        self.assertEqual(self.board.space(4).tokens, {'lost_tribes': 2})
+        self.assertEqual(self.board.owned_mask('ratmen'), 0)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
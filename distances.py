@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+""" Module implements memoized hop distances between the spaces of a map
+
+    A DistanceTable holds the all-pairs hop matrix of a board.Board, built
+    once per map and optionally cached on disk next to the map file under
+    a hash of the map's content. Variants that may not pass through some
+    terrain (water, say) are built on first use and kept in a small LRU:
+
+        table = distances.DistanceTable.for_map('map_2_player.swm')
+        table.hops_to(game.board, 'ratmen', game.board.symbol_masks['mine'],
+                      exclude=('water',))
+"""
+import collections
+import hashlib
+import os
+
+import numpy as np
+
+import board
+import sw_exceptions
+
+UNREACHABLE = np.iinfo(np.int16).max # hops to a space that cannot be reached
+MAX_MATRIX_SPACES = 1024 # larger maps answer queries with a fresh BFS
+
+
+def map_hash(game_board):
+    """Returns the sha256 hex digest of the map of a board.Board: ids,
+    terrain, symbols, edges, lost tribes and adjacency, not the tokens"""
+    digest = hashlib.sha256()
+    for column in (game_board.space_ids, game_board.terrain,
+                   game_board.symbols, game_board.is_edge,
+                   game_board.lost_tribes, game_board.neighbor_offsets,
+                   game_board.neighbor_indices):
+        digest.update(np.ascontiguousarray(column).tobytes())
+    return digest.hexdigest()
+
+
+def passable(game_board, exclude=()):
+    """Returns the bool array of the spaces whose terrain is not in exclude"""
+    for terrain in exclude:
+        if terrain not in board.TERRAIN_CODES:
+            raise sw_exceptions.InputError('Invalid terrain type: '
+                                           '{}'.format(terrain))
+    codes = [board.TERRAIN_CODES[terrain] for terrain in exclude]
+    return ~np.isin(game_board.terrain, codes)
+
+
+def bfs(game_board, sources, allowed=None):
+    """Multi-source breadth first search.
+
+    Args:
+        game_board: board.Board
+        sources: indices of the spaces at distance 0
+        allowed: optional bool array of the spaces paths may use;
+                 sources outside it are ignored
+
+    Returns:
+        int16 array of the hops from the nearest source to each space,
+        UNREACHABLE where no path exists"""
+
+    offsets, indices = game_board.neighbor_offsets, game_board.neighbor_indices
+    hops = np.full(len(game_board), UNREACHABLE, dtype=np.int16)
+    frontier = np.unique(np.asarray(sources, dtype=np.intp))
+    if allowed is not None:
+        frontier = frontier[allowed[frontier]]
+    hops[frontier] = 0
+    distance = 0
+    while len(frontier):
+        distance += 1
+        starts = offsets[frontier]
+        lengths = offsets[frontier + 1] - starts
+        positions = (np.arange(lengths.sum())
+                     + np.repeat(starts - np.cumsum(lengths) + lengths, lengths))
+        reached = np.unique(indices[positions])
+        reached = reached[hops[reached] == UNREACHABLE]
+        if allowed is not None:
+            reached = reached[allowed[reached]]
+        hops[reached] = distance
+        frontier = reached
+    return hops
+
+
+def hop_matrix(game_board, allowed=None):
+    """Computes the hops between every pair of spaces.
+
+    Every source is searched at once: the sources reaching each space are
+    kept as packed bits, and each step ors the bits of the neighbors of
+    every space with numpy.bitwise_or.reduceat.
+
+    Args:
+        game_board: board.Board
+        allowed: optional bool array of the spaces paths may use
+
+    Returns:
+        (spaces, spaces) int16 array, hops[source, target], UNREACHABLE
+        where no path exists"""
+
+    n_spaces = len(game_board)
+    if n_spaces > MAX_MATRIX_SPACES:
+        raise sw_exceptions.InputError('Hop matrices are limited to {} spaces, '
+                                       'not {}'.format(MAX_MATRIX_SPACES, n_spaces))
+    if allowed is None:
+        allowed = np.ones(n_spaces, dtype=bool)
+    offsets, indices = game_board.neighbor_offsets, game_board.neighbor_indices
+    linked = np.diff(offsets) > 0 # reduceat needs non-empty rows
+
+    hops = np.full((n_spaces, n_spaces), UNREACHABLE, dtype=np.int16)
+    hops[np.diag(allowed)] = 0
+    # row t holds one bit per source that reached space t
+    reached = np.packbits(np.diag(allowed), axis=1)
+    frontier = reached.copy()
+    distance = 0
+    while frontier.any():
+        distance += 1
+        stepped = np.zeros_like(frontier)
+        if linked.any():
+            stepped[linked] = np.bitwise_or.reduceat(
+                frontier[indices], offsets[:-1][linked], axis=0)
+        stepped[~allowed] = 0
+        stepped &= ~reached
+        reached |= stepped
+        hops[np.unpackbits(stepped, axis=1, count=n_spaces).T.astype(bool)] = distance
+        frontier = stepped
+    return hops
+
+
+def _variant(exclude):
+    """helper function returning the file name part of a terrain filter"""
+    return 'no-' + '-'.join(exclude) if exclude else 'all'
+
+
+class DistanceTable:
+    """ Hop distances between the spaces of one map
+    ...
+
+    Matrices are kept per terrain filter in a least recently used cache
+    of capacity entries. With a cache path they are also saved as .npy
+    files named after the map hash and memory mapped when found again.
+
+    Attributes:
+    -----------
+
+    digest: str
+        map_hash of the map
+
+    capacity: int
+        The most terrain variants kept in memory
+
+    builds: int
+        Matrices computed rather than read from memory or disk
+
+    """
+
+    def __init__(self, game_board, cache_path=None, capacity=8):
+        """Initializes the DistanceTable
+        Args: game_board - board.Board whose map is measured; only the map
+                           is read, so any board of the map will do
+
+              cache_path - optional path prefix of the cached matrices,
+                           usually the map file without its extension
+
+              capacity - positive integer number of terrain variants kept
+                         in memory
+
+        Output: object of type DistanceTable """
+
+        if not isinstance(capacity, int):
+            raise TypeError('capacity: {} invalid! Must be an integer!'.format(capacity))
+        if capacity < 1:
+            raise sw_exceptions.InputError('capacity must be positive')
+
+        self.board = game_board
+        self.digest = map_hash(game_board)
+        self.cache_path = cache_path
+        self.capacity = capacity
+        self.builds = 0
+        self._matrices = collections.OrderedDict()
+
+    @classmethod
+    def for_map(cls, map_path, capacity=8):
+        """Loads a map with board.Board.load and returns its DistanceTable,
+        caching the matrices next to the map file"""
+        return cls(board.Board.load(map_path), os.path.splitext(map_path)[0],
+                   capacity)
+
+    def cache_file(self, exclude=()):
+        """Returns the file caching a variant, None without a cache path"""
+        if self.cache_path is None:
+            return None
+        return '{}.{}.{}.hops.npy'.format(self.cache_path, self.digest[:16],
+                                          _variant(tuple(sorted(exclude))))
+
+    def hops(self, exclude=()):
+        """Returns the hop matrix of paths avoiding the terrain in exclude.
+
+        Args:
+            exclude: terrain types paths may not enter, e.g. ('water',)
+
+        Returns:
+            read-only (spaces, spaces) int16 array, see hop_matrix"""
+
+        key = tuple(sorted(set(exclude)))
+        matrix = self._matrices.get(key)
+        if matrix is not None:
+            self._matrices.move_to_end(key)
+            return matrix
+
+        path = self.cache_file(key)
+        if path is not None and os.path.exists(path):
+            matrix = np.load(path, mmap_mode='r')
+        else:
+            matrix = hop_matrix(self.board, passable(self.board, key))
+            matrix.flags.writeable = False
+            self.builds += 1
+            if path is not None:
+                # write under a temporary name so readers never see half a file
+                partial = '{}.{}.partial'.format(path, os.getpid())
+                with open(partial, 'wb') as outfile:
+                    np.save(outfile, matrix)
+                os.replace(partial, path)
+
+        self._matrices[key] = matrix
+        if len(self._matrices) > self.capacity:
+            self._matrices.popitem(last=False)
+        return matrix
+
+    def distance(self, source, target, exclude=()):
+        """Returns the hops from space index source to space index target,
+        UNREACHABLE if there is no path"""
+        return int(self.hops(exclude)[source, target])
+
+    def from_sources(self, sources, exclude=()):
+        """Multi-source search served from the hop matrix.
+
+        Args:
+            sources: indices (or a bitset) of the spaces at distance 0
+            exclude: terrain types paths may not enter
+
+        Returns:
+            int16 array of the hops from the nearest source to each space"""
+
+        if isinstance(sources, int):
+            sources = board.mask_to_indices(sources)
+        sources = np.asarray(sources, dtype=np.intp)
+        if len(self.board) > MAX_MATRIX_SPACES:
+            return bfs(self.board, sources, passable(self.board, exclude))
+        if not len(sources):
+            return np.full(len(self.board), UNREACHABLE, dtype=np.int16)
+        return self.hops(exclude)[sources].min(axis=0)
+
+    def from_player(self, game_board, player, exclude=()):
+        """Returns the hops from the territory of player on game_board to
+        each space; a player without spaces starts from the edge spaces,
+        like board.Board.conquerable_mask"""
+        sources = game_board.owned_mask(player) or game_board.edge_mask
+        return self.from_sources(sources, exclude)
+
+    def hops_to(self, game_board, player, targets, exclude=()):
+        """Returns the fewest hops from the territory of player to any space
+        in targets (indices or a bitset), UNREACHABLE if none is reachable.
+
+        e.g. hops_to(game.board, 'ratmen', game.board.symbol_masks['mine'])"""
+
+        if isinstance(targets, int):
+            targets = board.mask_to_indices(targets)
+        targets = np.asarray(targets, dtype=np.intp)
+        if not len(targets):
+            return int(UNREACHABLE)
+        return int(self.from_player(game_board, player, exclude)[targets].min())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+import board, distances, gameboard_csv_to_json, mapfile, sw_exceptions
+import os, tempfile
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestHopMatrix(unittest.TestCase):
+    """Tests all pairs hop distances"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+
+    def test_matches_bfs(self):
+        '''Check every row against a breadth first search'''
+        generated = board.Board(*gameboard_csv_to_json.generate_map(200, seed=3))
+        for game_board in (self.board, generated):
+            for exclude in ((), ('water',), ('water', 'mountain')):
+                allowed = distances.passable(game_board, exclude)
+                hops = distances.hop_matrix(game_board, allowed)
+                for source in range(len(game_board)):
+                    np.testing.assert_array_equal(
+                        hops[source], distances.bfs(game_board, [source], allowed))
+
+    def test_distances(self):
+        '''Check a symmetric matrix with neighbors one hop apart'''
+        hops = distances.hop_matrix(self.board)
+        np.testing.assert_array_equal(np.diag(hops), 0)
+        np.testing.assert_array_equal(hops, hops.T)
+        for neighbor in self.board.neighbors(0):
+            self.assertEqual(hops[0, neighbor], 1)
+
+    def test_excluded_terrain_is_unreachable(self):
+        '''Check that excluded terrain is never reached'''
+        water = ~distances.passable(self.board, ('water',))
+        hops = distances.hop_matrix(self.board, ~water)
+        self.assertTrue((hops[water] == distances.UNREACHABLE).all())
+        self.assertTrue((hops[:, water] == distances.UNREACHABLE).all())
+        self.assertRaises(sw_exceptions.InputError, distances.passable,
+                          self.board, ('lava',))
+
+    def test_map_hash(self):
+        '''Check that the hash covers the map, not the position'''
+        digest = distances.map_hash(self.board)
+        played = self.board.clone()
+        played.add_tokens(0, 'ratmen', 3)
+        self.assertEqual(distances.map_hash(played), digest)
+        generated = board.Board(*gameboard_csv_to_json.generate_map(23))
+        self.assertNotEqual(distances.map_hash(generated), digest)
+
+class TestDistanceTable(unittest.TestCase):
+    """Tests cached distance matrices of a map"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.map_path = os.path.join(self.tmp.name, 'map.swm')
+        mapfile.save_board(board.Board.from_json(MAP_JSON), self.map_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lru_variants(self):
+        '''Check that terrain variants are cached and evicted in LRU order'''
+        table = distances.DistanceTable(board.Board.from_json(MAP_JSON),
+                                        capacity=2)
+        full = table.hops()
+        self.assertIs(table.hops(), full)
+        table.hops(['water'])
+        table.hops(['water', 'mountain'])
+        self.assertEqual(table.builds, 3)
+        self.assertIs(table.hops(('mountain', 'water')),
+                      table.hops(('water', 'mountain')))
+        table.hops()
+        self.assertEqual(table.builds, 4) # evicted by the two variants
+        self.assertFalse(full.flags.writeable)
+
+    def test_disk_cache(self):
+        '''Check that matrices are reused from disk for the same map only'''
+        table = distances.DistanceTable.for_map(self.map_path)
+        hops = table.hops(('water',))
+        path = table.cache_file(('water',))
+        self.assertTrue(path.startswith(os.path.join(self.tmp.name, 'map.')))
+        self.assertTrue(os.path.exists(path))
+
+        reloaded = distances.DistanceTable.for_map(self.map_path)
+        np.testing.assert_array_equal(reloaded.hops(('water',)), hops)
+        self.assertEqual(reloaded.builds, 0)
+
+        # another map at the same path does not reuse the matrices
+        gameboard_csv_to_json.write_map_arrays(
+            self.map_path, gameboard_csv_to_json.generate_map(23))
+        other = distances.DistanceTable.for_map(self.map_path)
+        other.hops(('water',))
+        self.assertEqual(other.builds, 1)
+
+    def test_from_player(self):
+        '''Check distances from the spaces of a player, or the edges'''
+        game_board = board.Board.from_json(MAP_JSON)
+        table = distances.DistanceTable(game_board)
+        edges = board.mask_to_indices(game_board.edge_mask)
+        np.testing.assert_array_equal(table.from_player(game_board, 'ratmen'),
+                                      distances.bfs(game_board, edges))
+
+        game_board.add_tokens(5, 'ratmen', 2)
+        game_board.change_owner(5, 'ratmen')
+        hops = table.from_player(game_board, 'ratmen', ('water',))
+        np.testing.assert_array_equal(hops, distances.bfs(
+            game_board, [5], distances.passable(game_board, ('water',))))
+
+        mines = game_board.symbol_masks['mine']
+        self.assertEqual(table.hops_to(game_board, 'ratmen', mines),
+                         hops[board.mask_to_indices(mines)].min())
+        self.assertEqual(table.hops_to(game_board, 'ratmen', []),
+                         distances.UNREACHABLE)
+
+    def test_large_maps_use_bfs(self):
+        '''Check that large maps fall back to breadth first search'''
+        game_board = board.Board(*gameboard_csv_to_json.generate_map(
+            distances.MAX_MATRIX_SPACES + 1))
+        table = distances.DistanceTable(game_board)
+        np.testing.assert_array_equal(table.from_sources([0, 7]),
+                                      distances.bfs(game_board, [0, 7]))
+        self.assertRaises(sw_exceptions.InputError, table.hops)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
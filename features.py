@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+""" Module implements fixed-shape feature tensors of SW boards for
+    batched policy evaluation
+
+    A Featurizer turns boards of one map into float arrays of shape
+    (boards, spaces, features), one row per space in board index order.
+    The features of a space are, in order:
+
+        terrain_*   one-hot terrain, boardspace.TERRAIN_TYPES order
+        symbol_*    one flag per boardspace.MAP_SYMBOLS symbol
+        is_edge     edge flag
+        owner_*     one-hot owner over the featurizer owners, then
+                    owner_other for any other owner; all zero if unowned
+        tokens_*    token counts of the featurizer token types, then
+                    tokens_other for the tokens of every other type
+
+    The map columns are computed once; a position costs one owner code
+    lookup, one token column gather and a few array writes, with no
+    Python loop over spaces. Adjacency is the CSR matrix of the map,
+    shared by every position.
+"""
+import numpy as np
+
+import boardspace
+import sw_exceptions
+
+
+class Featurizer:
+    """ Converts boards of one map into feature tensors
+    ...
+
+    Attributes:
+    -----------
+
+    owners: tuple
+        Owner names with a plane each, in plane order
+
+    token_types: tuple
+        Token types with a count each, in feature order
+
+    names: list
+        Name of every feature, in feature order
+
+    dtype: numpy.dtype
+        Type of the feature arrays
+
+    """
+
+    def __init__(self, template, owners=None, token_types=None,
+                 dtype=np.float32):
+        """Prepares the map features of template
+        Args: template - board.Board of the map
+
+              owners - names of the owners with a plane each, by default
+                       the owners registered on template
+
+              token_types - names of the token types counted, by default
+                            the token types registered on template
+
+              dtype - numpy type of the feature arrays
+
+        Output: object of type Featurizer """
+
+        self.owners = tuple(template.owners if owners is None else owners)
+        self.token_types = tuple(template.token_types if token_types is None
+                                 else token_types)
+        self.dtype = np.dtype(dtype)
+        self.n_spaces = len(template)
+
+        terrain = (template.terrain[:, np.newaxis]
+                   == np.arange(len(boardspace.TERRAIN_TYPES)))
+        symbols = (template.symbols[:, np.newaxis].astype(np.int32)
+                   >> np.arange(len(boardspace.MAP_SYMBOLS))) & 1
+        self.static = np.concatenate(
+            [terrain, symbols, template.is_edge[:, np.newaxis]],
+            axis=1).astype(self.dtype)
+        self.static.flags.writeable = False
+
+        self.names = (['terrain_{}'.format(name) for name in boardspace.TERRAIN_TYPES]
+                      + ['symbol_{}'.format(name) for name in boardspace.MAP_SYMBOLS]
+                      + ['is_edge']
+                      + ['owner_{}'.format(name) for name in self.owners]
+                      + ['owner_other']
+                      + ['tokens_{}'.format(name) for name in self.token_types]
+                      + ['tokens_other'])
+
+        self._owner_start = self.static.shape[1]
+        self._token_start = self._owner_start + len(self.owners) + 1
+        # owner_other is the last plane; code lookups send NO_OWNER one
+        # past it, where no plane matches
+        self._planes = np.arange(len(self.owners) + 1)
+        self._offsets = template.neighbor_offsets
+        self._indices = template.neighbor_indices
+
+        # lookups by vocabulary; vocabularies only grow, so the length
+        # of a vocabulary is part of the key
+        self._owner_lookups = {}
+        self._token_lookups = {}
+
+    @property
+    def n_features(self):
+        """Number of features of each space"""
+        return len(self.names)
+
+    @property
+    def shape(self):
+        """Shape (spaces, features) of the features of one board"""
+        return (self.n_spaces, self.n_features)
+
+    def buffer(self, n_boards=1):
+        """Returns a preallocated output for batches of n_boards boards"""
+        return np.zeros((n_boards,) + self.shape, dtype=self.dtype)
+
+    def _owner_lookup(self, owners):
+        """helper function returning the plane of every owner code of the
+        vocabulary owners, with NO_OWNER (-1) in the last entry"""
+        key = tuple(owners)
+        lookup = self._owner_lookups.get(key)
+        if lookup is None:
+            planes = {name: plane for plane, name in enumerate(self.owners)}
+            lookup = np.array([planes.get(name, len(self.owners))
+                               for name in key] + [len(self.owners) + 1],
+                              dtype=np.intp)
+            self._owner_lookups[key] = lookup
+        return lookup
+
+    def _token_lookup(self, token_types):
+        """helper function returning the token column of every featurizer
+        token type in the vocabulary token_types, -1 where it is missing;
+        columns may lie past the token array of a board"""
+        key = tuple(token_types)
+        lookup = self._token_lookups.get(key)
+        if lookup is None:
+            columns = {name: column for column, name in enumerate(key)}
+            lookup = np.array([columns.get(name, -1) for name in self.token_types],
+                              dtype=np.intp)
+            self._token_lookups[key] = lookup
+        return lookup
+
+    def _output(self, n_boards, out):
+        """helper function checking a caller's output, or allocating one"""
+        if out is None:
+            return self.buffer(n_boards)
+        if out.shape != (n_boards,) + self.shape or out.dtype != self.dtype:
+            raise sw_exceptions.InputError('Output must be {} of shape {}'.format(
+                self.dtype, (n_boards,) + self.shape))
+        return out
+
+    def from_arrays(self, owner, tokens, owners, token_types, out=None):
+        """Featurizes positions given as owner and token arrays, like the
+        slots of a sharedbatch.BoardBatch or gamerecord.RecordReader states.
+
+        Args:
+            owner: int16 owner codes (spaces,) or (boards, spaces)
+            tokens: int16 token counts (spaces, columns) or
+                    (boards, spaces, columns)
+            owners, token_types: names behind the owner and token codes
+            out: optional preallocated output, see buffer
+
+        Returns:
+            features (spaces, features), or (boards, spaces, features)
+            for a batch; out when it is given"""
+
+        owner, tokens = np.asarray(owner), np.asarray(tokens)
+        if owner.ndim == 1:
+            single = None if out is None else out[np.newaxis]
+            return self.from_arrays(owner[np.newaxis], tokens[np.newaxis],
+                                    owners, token_types, single)[0]
+        if (owner.ndim != 2 or owner.shape[1] != self.n_spaces
+                or tokens.ndim != 3 or tokens.shape[:2] != owner.shape):
+            raise sw_exceptions.InputError('Positions must have {} spaces'.format(
+                self.n_spaces))
+
+        out = self._output(len(owner), out)
+        owner_end = self._token_start
+        out[..., :self._owner_start] = self.static
+        out[..., self._owner_start:owner_end] = (
+            self._owner_lookup(owners)[owner][..., np.newaxis] == self._planes)
+
+        columns = self._token_lookup(token_types)
+        # a board may have fewer columns than its shared vocabulary has
+        # token types; the types past its columns have no tokens on it
+        missing = (columns < 0) | (columns >= tokens.shape[-1])
+        counts = tokens[..., np.where(missing, 0, columns)]
+        if missing.any():
+            counts[..., missing] = 0
+        out[..., owner_end:-1] = counts
+        out[..., -1] = (tokens.sum(axis=-1, dtype=np.int32)
+                        - counts.sum(axis=-1, dtype=np.int32))
+        return out
+
+    def features(self, game_board, out=None):
+        """Returns the (spaces, features) array of one board, written to
+        out (of that shape) when given"""
+        return self.from_arrays(game_board.owner, game_board.tokens,
+                                game_board.owners, game_board.token_types, out)
+
+    def batch(self, boards, out=None):
+        """Featurizes a sequence of boards of the map.
+
+        Args:
+            boards: board.Board objects of the featurizer map
+            out: optional preallocated output, see buffer
+
+        Returns:
+            features of shape (boards, spaces, features)"""
+
+        boards = list(boards)
+        out = self._output(len(boards), out)
+        if not boards:
+            return out
+        first = boards[0]
+        if all(game_board.owners is first.owners
+               and game_board.token_types is first.token_types
+               and game_board.tokens.shape == first.tokens.shape
+               for game_board in boards):
+            # clones of one board share their vocabularies: stack and
+            # featurize the whole batch at once
+            return self.from_arrays(
+                np.stack([game_board.owner for game_board in boards]),
+                np.stack([game_board.tokens for game_board in boards]),
+                first.owners, first.token_types, out)
+        for position, game_board in enumerate(boards):
+            self.features(game_board, out[position])
+        return out
+
+    def adjacency(self, n_boards=1):
+        """Returns the adjacency of the map as a sparse CSR triplet.
+
+        With n_boards > 1 the matrix is block diagonal, one block per
+        board of a batch, so rows line up with the flattened
+        (boards * spaces) features.
+
+        Returns:
+            (data, indices, indptr) of the square matrix with a one where
+            space i neighbors space j"""
+
+        offsets = np.asarray(self._offsets, dtype=np.intp)
+        indices = np.asarray(self._indices, dtype=np.intp)
+        nnz = len(indices)
+        shift = np.arange(n_boards, dtype=np.intp)[:, np.newaxis]
+        batch_indices = (indices + shift * self.n_spaces).ravel()
+        batch_indptr = np.concatenate(
+            [(offsets[:-1] + shift * nnz).ravel(), [n_boards * nnz]])
+        return (np.ones(len(batch_indices), dtype=self.dtype), batch_indices,
+                batch_indptr)
+
+    def adjacency_matrix(self, n_boards=1):
+        """Returns adjacency(n_boards) as a scipy.sparse.csr_matrix; needs
+        scipy, which nothing else requires"""
+        from scipy import sparse
+        size = n_boards * self.n_spaces
+        return sparse.csr_matrix(self.adjacency(n_boards), shape=(size, size))
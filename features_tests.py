@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+import board, boardspace, features, sw_exceptions
+import importlib.util
+import os
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+def dense(triplet, size):
+    '''returns the dense matrix of a CSR triplet'''
+    data, indices, indptr = triplet
+    matrix = np.zeros((size, size))
+    for row in range(size):
+        row_slice = slice(indptr[row], indptr[row + 1])
+        matrix[row, indices[row_slice]] = data[row_slice]
+    return matrix
+
+class TestFeaturizer(unittest.TestCase):
+    """Tests feature tensors of boards"""
+
+    def setUp(self):
+        self.template = board.Board.from_json(MAP_JSON)
+        self.featurizer = features.Featurizer(
+            self.template, ['ratmen', 'giants', 'lost_tribes'],
+            ['ratmen', 'giants', 'lost_tribes'])
+        self.played = self.template.clone()
+        self.played.add_tokens(3, 'ratmen', 4)
+        self.played.change_owner(3, 'ratmen')
+        self.empty = int(np.flatnonzero(~self.template.tokens.any(axis=1))[0])
+        self.played.add_tokens(self.empty, 'trolls', 2)
+        self.played.change_owner(self.empty, 'trolls')
+
+    def column(self, name):
+        return self.featurizer.names.index(name)
+
+    def test_map_features(self):
+        '''Check terrain, symbol and edge features'''
+        values = self.featurizer.features(self.template)
+        self.assertEqual(values.shape, (len(self.template),
+                                        self.featurizer.n_features))
+        self.assertEqual(values.dtype, np.float32)
+        terrain = values[:, :len(boardspace.TERRAIN_TYPES)]
+        np.testing.assert_array_equal(terrain.sum(axis=1), 1)
+        np.testing.assert_array_equal(terrain.argmax(axis=1), self.template.terrain)
+        np.testing.assert_array_equal(values[:, self.column('is_edge')],
+                                      self.template.is_edge)
+        for symbol, bit in board.SYMBOL_BITS.items():
+            np.testing.assert_array_equal(values[:, self.column('symbol_' + symbol)],
+                                          (self.template.symbols & bit) > 0)
+
+    def test_position_features(self):
+        '''Check owner planes and token counts'''
+        values = self.featurizer.features(self.played)
+        self.assertEqual(values[3, self.column('owner_ratmen')], 1)
+        self.assertEqual(values[3, self.column('tokens_ratmen')], 4)
+        # trolls have no plane or count of their own
+        self.assertEqual(values[self.empty, self.column('owner_other')], 1)
+        self.assertEqual(values[self.empty, self.column('tokens_other')], 2)
+
+        owners = values[:, self.featurizer._owner_start:self.featurizer._token_start]
+        np.testing.assert_array_equal(owners.sum(axis=1),
+                                      self.played.owner != board.NO_OWNER)
+        lost_tribes = self.played.owner == self.played.owner_code('lost_tribes')
+        np.testing.assert_array_equal(values[:, self.column('owner_lost_tribes')],
+                                      lost_tribes)
+        np.testing.assert_array_equal(
+            values[:, self.column('tokens_lost_tribes')],
+            self.played.tokens[:, self.played.token_code('lost_tribes')])
+
+    def test_batch(self):
+        '''Check batches against single boards'''
+        boards = [self.template, self.played, self.played.clone()]
+        out = self.featurizer.buffer(3)
+        self.assertIs(self.featurizer.batch(boards, out), out)
+        for position, game_board in enumerate(boards):
+            np.testing.assert_array_equal(out[position],
+                                          self.featurizer.features(game_board))
+
+        # boards with vocabularies of their own go one by one
+        other = board.Board.from_json(MAP_JSON)
+        other.owner_code('giants')
+        other.change_owner(3, 'ratmen')
+        values = self.featurizer.batch([self.played, other])
+        self.assertEqual(values[1, 3, self.column('owner_ratmen')], 1)
+        np.testing.assert_array_equal(values[0], self.featurizer.features(self.played))
+
+        self.assertRaises(sw_exceptions.InputError, self.featurizer.batch,
+                          boards, self.featurizer.buffer(2))
+
+    def test_narrow_boards(self):
+        '''Check boards with fewer token columns than their vocabulary'''
+        names = ['race_{}'.format(number)
+                 for number in range(board.TOKEN_CAPACITY + 1)]
+        featurizer = features.Featurizer(self.template, token_types=names)
+        for name in names:
+            self.template.token_code(name)
+        self.assertLess(self.played.tokens.shape[1], len(self.played.token_types))
+        values = featurizer.batch([self.played, self.played.clone()])
+        self.assertFalse(values[:, :, featurizer._token_start:-1].any())
+        np.testing.assert_array_equal(values[0], featurizer.features(self.played))
+
+    def test_from_arrays(self):
+        '''Check featurizing raw owner and token arrays'''
+        owner = np.stack([self.template.owner, self.played.owner])
+        tokens = np.stack([self.template.tokens, self.played.tokens])
+        values = self.featurizer.from_arrays(owner, tokens, self.played.owners,
+                                             self.played.token_types)
+        np.testing.assert_array_equal(values[1], self.featurizer.features(self.played))
+        self.assertRaises(sw_exceptions.InputError, self.featurizer.from_arrays,
+                          owner[:, 1:], tokens, self.played.owners,
+                          self.played.token_types)
+
+    def test_adjacency(self):
+        '''Check the adjacency triplet, also block diagonal'''
+        size = len(self.template)
+        matrix = dense(self.featurizer.adjacency(), size)
+        for index in range(size):
+            np.testing.assert_array_equal(np.flatnonzero(matrix[index]),
+                                          sorted(self.template.neighbors(index)))
+        batched = dense(self.featurizer.adjacency(2), 2 * size)
+        np.testing.assert_array_equal(batched[:size, :size], matrix)
+        np.testing.assert_array_equal(batched[size:, size:], matrix)
+        self.assertFalse(batched[:size, size:].any())
+
+    @unittest.skipUnless(importlib.util.find_spec('scipy'), 'scipy not installed')
+    def test_adjacency_matrix(self):
+        '''Check the scipy matrix against the triplet'''
+        matrix = self.featurizer.adjacency_matrix(3)
+        np.testing.assert_array_equal(matrix.toarray(), dense(
+            self.featurizer.adjacency(3), 3 * len(self.template)))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+""" Module implements a simplified game of SW played on a board.Board """
+import random
+
+import numpy as np
+
+import board
+import conquest
+import moves
+import scoring
+import sw_exceptions
+
+START_TOKENS = 10 # race tokens each player starts with
+TURNS = 10 # turns of a 2 player game
+
+# phases of a turn: spaces are abandoned and races declined before the
+# first conquest; the reinforcement attempt or a redeploy ends the
+# conquests
+START_PHASE, CONQUER_PHASE, REDEPLOY_PHASE = 'start', 'conquer', 'redeploy'
+
+# the phases in which each kind of move (see moves.MOVE_KINDS) is legal
+MOVE_PHASES = {'conquer': (START_PHASE, CONQUER_PHASE),
+               'redeploy': (START_PHASE, CONQUER_PHASE, REDEPLOY_PHASE),
+               'abandon': (START_PHASE,),
+               'decline': (START_PHASE,)}
+
+
+class Game:
+    """ One game of Small World
+    ...
+
+    Every player plays a single race whose token type is the player name,
+    so a space owned by 'ratmen' holds 'ratmen' tokens. A race in decline
+    becomes the owner (and token type) declined_name(player), keeps one
+    token per space and still scores for the player.
+
+    Attributes:
+    -----------
+
+    board: board.Board
+        The game's own copy of the board
+
+    players: list
+        Player names in turn order
+
+    hands: dictionary
+        Tokens each player holds in hand
+
+    coins: dictionary
+        Victory coins of each player
+
+    turn: int
+        The current turn, 1 .. turns
+
+    seat: int
+        Position in players of the player to move
+
+    phase: string
+        The phase of the current turn, see MOVE_PHASES
+
+    moves: list
+        Every conquest as [turn, player, space_id, tokens]
+
+    coins_per_turn: list
+        The coins of every player (in players order) after each turn
+
+    """
+
+    def __init__(self, template, players, turns=TURNS,
+                 start_tokens=START_TOKENS, bonuses=None, seed=None):
+        """Initializes the Game
+        Args: template - board.Board with the starting position; the game
+                         plays on a copy on write clone of it
+
+              players - list of player names in turn order
+
+              turns - number of turns to play
+
+              start_tokens - tokens each player starts with
+
+              bonuses - optional list of {symbol or terrain: coins} per
+                        player, see scoring.bonus_tables
+
+              seed - seed of the game's random number generator
+
+        Output: object of type Game """
+
+        if not players:
+            raise sw_exceptions.InputError('A game needs at least one player.')
+        if len(set(players)) != len(players):
+            raise sw_exceptions.InputError('Player names must be distinct: '
+                                           '{}'.format(list(players)))
+
+        self.board = template.clone()
+        self.players = list(players)
+        self.turns = turns
+        self.turn = 1
+        self.seat = 0
+        self.phase = START_PHASE
+        self.start_tokens = start_tokens
+        self.hands = {player: start_tokens for player in self.players}
+        self.coins = {player: 0 for player in self.players}
+        self.moves = []
+        self.coins_per_turn = []
+        self.rng = random.Random(seed)
+        self._symbol_bonus, self._terrain_bonus = scoring.bonus_tables(
+            bonuses or [None] * len(self.players))
+
+    @property
+    def current_player(self):
+        """The name of the player to move"""
+        return self.players[self.seat]
+
+    @property
+    def finished(self):
+        """True once every turn was played"""
+        return self.turn > self.turns
+
+    def allows(self, kind):
+        """True if moves of kind may be played in the current phase"""
+        return self.phase in MOVE_PHASES[kind]
+
+    def _check_phase(self, kind):
+        """helper function refusing moves of kind outside their phases"""
+        if not self.allows(kind):
+            raise sw_exceptions.InputError('No {} moves in the {} phase of the '
+                                           'turn'.format(kind, self.phase))
+
+    def begin_turn(self):
+        """Starts the turn of current_player by readying the troops"""
+        self.phase = START_PHASE
+        self.ready_troops(self.current_player)
+
+    def end_turn(self):
+        """Ends the turn of current_player: redeploys the tokens left in
+        hand, scores and passes to the next player.
+
+        Returns:
+            the coins earned this turn"""
+
+        player = self.current_player
+        self.redeploy(player)
+        earned = self.score(player)
+        self.coins[player] += earned
+
+        self.phase = START_PHASE
+        self.seat += 1
+        if self.seat == len(self.players):
+            self.seat = 0
+            self.coins_per_turn.append([self.coins[name] for name in self.players])
+            self.turn += 1
+        return earned
+
+    def conquest_cost(self, index):
+        """Returns the tokens needed to conquer space index, see
+        conquest.costs"""
+        return int(conquest.costs(self.board, [index])[0])
+
+    def candidates(self, player):
+        """Returns the indices of the spaces player may attack"""
+        return board.mask_to_indices(self.board.conquerable_mask(player))
+
+    def conquer(self, player, index, tokens=None):
+        """Conquers space index for player.
+
+        Args:
+            player: name of the attacking player
+            index: index of the space
+            tokens: tokens to move in, the conquest cost by default
+
+        The defending race loses one token and takes the rest back in
+        hand; lost tribes are removed."""
+
+        self._check_phase('conquer')
+        if tokens is None:
+            tokens = self.conquest_cost(index)
+        if not 0 < tokens <= self.hands[player]:
+            raise sw_exceptions.InputError('{} cannot move {} tokens from a hand '
+                                           'of {}'.format(player, tokens,
+                                                          self.hands[player]))
+
+        returned = conquest.apply_conquest(self.board, player, [index], [tokens])
+        for defender, count in returned.items():
+            if defender in self.hands:
+                self.hands[defender] += count
+        self.hands[player] -= tokens
+        self.phase = CONQUER_PHASE
+        self.moves.append([self.turn, player,
+                           int(self.board.space_ids[index]), tokens])
+
+    def reinforce(self, player, index):
+        """Final conquest attempt of a turn with every token in hand and a
+        roll of the reinforcement die. Returns True if space index falls;
+        either way the attempt ends the conquests of the turn"""
+
+        self._check_phase('conquer')
+        fallen = False
+        hand = self.hands[player]
+        if hand >= 1:
+            roll = self.rng.choice(conquest.REINFORCEMENT_DIE)
+            if hand + roll >= self.conquest_cost(index):
+                self.conquer(player, index, hand)
+                fallen = True
+        self.phase = REDEPLOY_PHASE
+        return fallen
+
+    def abandon(self, player, index):
+        """Takes every token of player on space index back in hand; only
+        before the first conquest of the turn"""
+        self._check_phase('abandon')
+        if self.board.owner_of(index) != player:
+            raise sw_exceptions.InputError('{} does not own space '
+                                           '{}'.format(player, index))
+        self.hands[player] += self.board.remove_tokens(index, player)
+        self.board.change_owner(index, None)
+
+    def deploy(self, player, placements):
+        """Puts every token in hand on owned spaces.
+
+        Args:
+            player: name of the player
+            placements: (index, tokens) pairs using up the whole hand
+
+        Ends the conquests of the turn."""
+
+        self._check_phase('redeploy')
+        if sum(count for _, count in placements) != self.hands[player]:
+            raise sw_exceptions.InputError('Redeploy must place all {} tokens '
+                                           'in hand'.format(self.hands[player]))
+        for index, count in placements:
+            if count < 0:
+                raise sw_exceptions.InputError('Cannot place {} tokens on space '
+                                               '{}'.format(count, index))
+            if self.board.owner_of(index) != player:
+                raise sw_exceptions.InputError('{} does not own space '
+                                               '{}'.format(player, index))
+        for index, count in placements:
+            if count:
+                self.board.add_tokens(index, player, count)
+        self.hands[player] = 0
+        self.phase = REDEPLOY_PHASE
+
+    def decline(self, player):
+        """Puts the race of player in decline, hands out a new one and
+        ends the turn; only before the first conquest of the turn.
+
+        An older race in decline leaves the board; every space of the
+        declining race keeps one token.
+
+        Returns:
+            the coins earned this turn"""
+
+        if player != self.current_player:
+            raise sw_exceptions.InputError('It is not the turn of '
+                                           '{}'.format(player))
+        self._check_phase('decline')
+        if not self.board.owned_mask(player):
+            raise sw_exceptions.InputError('{} has no race on the board to '
+                                           'decline'.format(player))
+        declined = declined_name(player)
+        for index in board.mask_to_indices(self.board.owned_mask(declined)):
+            self.board.remove_tokens(index, declined)
+            self.board.change_owner(index, None)
+        for index in board.mask_to_indices(self.board.owned_mask(player)):
+            self.board.remove_tokens(index, player)
+            self.board.add_tokens(index, declined, 1)
+            self.board.change_owner(index, declined)
+        self.hands[player] = self.start_tokens
+        return self.end_turn()
+
+    def apply(self, player, move):
+        """Plays a move made by moves.generate_moves; a Decline ends the
+        turn and returns the coins earned"""
+        if isinstance(move, moves.Conquer):
+            if move.tokens < self.conquest_cost(move.space):
+                self.reinforce(player, move.space)
+            else:
+                self.conquer(player, move.space, move.tokens)
+        elif isinstance(move, moves.Redeploy):
+            self.deploy(player, move.placements)
+        elif isinstance(move, moves.Abandon):
+            self.abandon(player, move.space)
+        elif isinstance(move, moves.Decline):
+            return self.decline(player)
+        else:
+            raise sw_exceptions.InputError('Unknown move: {}'.format(move))
+
+    def ready_troops(self, player):
+        """Takes all but one token of player from each owned space in hand"""
+        for index in board.mask_to_indices(self.board.owned_mask(player)):
+            count = self.board.token_count(index, player)
+            if count > 1:
+                self.hands[player] += self.board.remove_tokens(index, player,
+                                                               count - 1)
+
+    def redeploy(self, player):
+        """Spreads the tokens in hand over the spaces player owns"""
+        owned = board.mask_to_indices(self.board.owned_mask(player))
+        if not len(owned):
+            return
+        share, extra = divmod(self.hands[player], len(owned))
+        for position, index in enumerate(owned):
+            count = share + (position < extra)
+            if count:
+                self.board.add_tokens(index, player, int(count))
+        self.hands[player] = 0
+
+    def score(self, player):
+        """Returns the coins player earns for the spaces held right now"""
+        number = self.players.index(player)
+        codes = [self.board.owner_code(player),
+                 self.board.owner_code(declined_name(player))]
+        owner = np.where(np.isin(self.board.owner, codes), 0, -1)
+        coins = scoring.score_boards(owner, self.board.terrain,
+                                     self.board.symbols, 1,
+                                     self._symbol_bonus[[number]],
+                                     self._terrain_bonus[[number]])
+        return int(coins[0, 0])
+
+    def play_turn(self, policy):
+        """Plays the whole turn of current_player.
+
+        Args:
+            policy: callable policy(game, player, candidates) returning
+                    the index of the space to attack next, or None to stop
+
+        Returns:
+            the coins earned this turn"""
+
+        player = self.current_player
+        self.begin_turn()
+        while self.hands[player]:
+            candidates = self.candidates(player)
+            if not len(candidates):
+                break
+            index = policy(self, player, candidates)
+            if index is None:
+                break
+            if self.conquest_cost(index) <= self.hands[player]:
+                self.conquer(player, index)
+            else:
+                self.reinforce(player, index)
+                break
+        return self.end_turn()
+
+    def play(self, policies):
+        """Plays every remaining turn.
+
+        Args:
+            policies: one policy per player, in players order
+
+        Returns:
+            the result() of the finished game"""
+
+        while not self.finished:
+            self.play_turn(policies[self.seat])
+        return self.result()
+
+    def result(self):
+        """Returns the winner, coins, coins per turn and moves as a dict"""
+        return {'winner': max(self.players, key=self.coins.get),
+                'coins': dict(self.coins),
+                'coins_per_turn': self.coins_per_turn,
+                'moves': self.moves}
+
+
+def declined_name(player):
+    """Returns the owner name of the declined race of player"""
+    return '{}_declined'.format(player)
+
+
+def random_policy(game, player, candidates):
+    """Attacks a random affordable space, or any space with the die"""
+    costs = conquest.costs(game.board, candidates)
+    affordable = candidates[costs <= game.hands[player]]
+    pool = affordable if len(affordable) else candidates
+    return int(pool[game.rng.randrange(len(pool))])
+
+
+def greedy_policy(game, player, candidates):
+    """Attacks the cheapest space, preferring spaces with symbols"""
+    costs = conquest.costs(game.board, candidates)
+    has_symbol = game.board.symbols[candidates] != 0
+    return int(candidates[np.lexsort((~has_symbol, costs))[0]])
+
+
+POLICIES = {'random': random_policy, 'greedy': greedy_policy}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+import board, game, selfplay, sw_exceptions
+import json, os, tempfile
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestGame_Conquest(unittest.TestCase):
+    """Tests the conquest rules"""
+
+    def setUp(self):
+        self.template = board.Board.from_json(MAP_JSON)
+        self.game = game.Game(self.template, ['ratmen', 'giants'], seed=1)
+        self.board = self.game.board
+
+    def test_template_untouched(self):
+        self.game.conquer('ratmen', self.board.index_of(2))
+        self.assertIsNone(self.template.owner_of(self.board.index_of(2)))
+
+    def test_conquest_cost(self):
+        self.assertEqual(self.game.conquest_cost(self.board.index_of(2)), 2)
+        self.assertEqual(self.game.conquest_cost(self.board.index_of(4)), 4)
+        self.assertEqual(self.game.conquest_cost(self.board.index_of(6)), 3)
+
+    def test_conquer_lost_tribes(self):
+        index = self.board.index_of(4)
+        self.game.conquer('ratmen', index)
+        self.assertEqual(self.board.tokens_at(index), {'ratmen': 4})
+        self.assertEqual(self.board.owner_of(index), 'ratmen')
+        self.assertEqual(self.game.hands['ratmen'], 6)
+
+    def test_defender_loses_one_token(self):
+        index = self.board.index_of(2)
+        self.game.conquer('ratmen', index, 3)
+        self.game.conquer('giants', index)
+        self.assertEqual(self.game.hands['ratmen'], 9)
+        self.assertEqual(self.board.tokens_at(index), {'giants': 5})
+
+    def test_conquer_beyond_hand(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.conquer('ratmen', self.board.index_of(2), 11)
+
+    def test_distinct_players(self):
+        '''Check that a player cannot take two seats'''
+        with self.assertRaises(sw_exceptions.InputError):
+            game.Game(self.template, ['ratmen', 'ratmen'])
+
+    def test_first_conquest_on_edge(self):
+        candidates = set(self.game.candidates('ratmen').tolist())
+        self.assertNotIn(self.board.index_of(7), candidates)
+
+class TestGame_Play(unittest.TestCase):
+    """Tests playing complete games"""
+
+    def play(self, seed):
+        template = board.Board.from_json(MAP_JSON)
+        played = game.Game(template, ['player_1', 'player_2'], seed=seed)
+        return played.play([game.greedy_policy, game.random_policy])
+
+    def test_complete_game(self):
+        result = self.play(7)
+        self.assertEqual(len(result['coins_per_turn']), game.TURNS)
+        self.assertIn(result['winner'], ('player_1', 'player_2'))
+        self.assertTrue(result['moves'])
+
+    def test_seeded_games_repeat(self):
+        self.assertEqual(self.play(3), self.play(3))
+
+class TestSelfPlay(unittest.TestCase):
+    """Tests the process pool runner"""
+
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out_jsonl = os.path.join(tmp, 'games.jsonl')
+            report = selfplay.run(MAP_JSON, 6, out_jsonl=out_jsonl, processes=2)
+            with open(out_jsonl) as infile:
+                results = [json.loads(line) for line in infile]
+        self.assertEqual(report['games'], 6)
+        self.assertEqual(sorted(result['game'] for result in results),
+                         list(range(6)))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            selfplay.resolve_policy('clever')
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 
+import argparse
+import array
+import collections
+import csv
 import json
-import pandas as pd
+import os
+import boardspace
 import sw_exceptions
 import sys
 
@@ -11,9 +16,31 @@ import sys
 
     This module contains functions for manipulating SW gameboard.
     It includes code for writing json gameboard from a csv input file,
-    (gameboard_csv_to_json).
+    (gameboard_csv_to_json), a streaming compiler writing the compact
+    map format (compile_map) and one writing the binary map format of
+    mapfile (compile_binary_map). generate_map makes random planar maps
+    of any size for stress tests and validate_map checks the adjacency
+    of whole maps.
 """
 
+# header of the compact map format written by compile_map
+MAP_FORMAT = 'sw-map'
+MAP_VERSION = 1
+
+_TRUE = ('True', 'true', 'TRUE', '1')
+_FALSE = ('False', 'false', 'FALSE', '0')
+
+# codes of the BoardSpace vocabularies, built once instead of searching
+# the vocabulary tuples for every space; board.py derives the same codes
+# but importing it would load numpy
+_TERRAIN_CODES = {name: code for code, name in enumerate(boardspace.TERRAIN_TYPES)}
+_SYMBOL_BITS = {name: 1 << code for code, name in enumerate(boardspace.MAP_SYMBOLS)}
+
+# positions of the gameboard csv columns, resolved once per file
+ColumnLayout = collections.namedtuple('ColumnLayout',
+                                      ['space_id', 'terrain', 'is_edge',
+                                       'lost_tribes', 'symbols', 'neighbors'])
+
 def gameboard_csv_to_json(in_csv,out_json):
     """ Reads in csv formatted SW gameboard information (in_csv)
     and writes out json formatted gameboard information (out_json).
@@ -36,11 +63,14 @@ def gameboard_csv_to_json(in_csv,out_json):
 
     """
 
+    # pandas is only needed here, compile_map does without it
+    import pandas as pd
+
     #check for correct check for correct inputs
     if not in_csv.endswith('.csv'):
         raise sw_exceptions.InputError('First file must be a csv file.')
     if not out_json.endswith('.json'):
-        raise sw_exception.InputError('Please choose output ending with .json')
+        raise sw_exceptions.InputError('Please choose output ending with .json')
 
 
     #read in board data using pandas csv reader
@@ -88,5 +118,542 @@ def gameboard_csv_to_json(in_csv,out_json):
     with open(out_json, 'w') as outfile:
         json.dump(spaces, outfile,sort_keys=True,indent=4)
 
+def column_layout(header):
+    """ Resolves the positions of the gameboard csv columns.
+
+    Input:
+
+    header: list of the column names of the csv
+
+    Output:
+
+    ColumnLayout with the position of each single column and the
+    positions of the symbol_* and neighbor_* columns
+
+    """
+
+    missing = [name for name in ('space_id', 'terrain', 'is_edge', 'lost_tribes')
+               if name not in header]
+    if missing:
+        raise sw_exceptions.InputError('Missing csv columns: {}'.format(missing))
+
+    return ColumnLayout(header.index('space_id'), header.index('terrain'),
+                        header.index('is_edge'), header.index('lost_tribes'),
+                        [col for col, name in enumerate(header)
+                         if name.startswith('symbol')],
+                        [col for col, name in enumerate(header)
+                         if name.startswith('neighbor')])
+
+def _csv_bool(value, name, line):
+    """helper function reading a boolean csv cell"""
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise sw_exceptions.InputError('Line {}: {} must be True or False, '
+                                   'not {!r}'.format(line, name, value))
+
+def _csv_int(value, name, line):
+    """helper function reading an integer csv cell"""
+    try:
+        return int(float(value))
+    except ValueError:
+        raise sw_exceptions.InputError('Line {}: {} must be an integer, '
+                                       'not {!r}'.format(line, name, value)) from None
+
+def compile_space(row, layout, line):
+    """ Converts one csv row into a compact, validated space dictionary.
+
+    Input:
+
+    row: list of the csv cells of the space
+    layout: ColumnLayout of the csv
+    line: line number used in error messages
+
+    Output:
+
+    dict with the keys id:int, terrain:string, is_edge:bool,
+    lost_tribes:bool, symbols:list of strings and neighbors:list of ints
+
+    """
+
+    required = max(layout.space_id, layout.terrain, layout.is_edge,
+                   layout.lost_tribes) + 1
+    if len(row) < required:
+        raise sw_exceptions.InputError('Line {}: expected at least {} columns, '
+                                       'found {}'.format(line, required, len(row)))
+
+    space_id = _csv_int(row[layout.space_id], 'space_id', line)
+    if space_id < 1:
+        raise sw_exceptions.InputError('Line {}: space_id must be '
+                                       'positive'.format(line))
+
+    terrain = row[layout.terrain]
+    if terrain not in _TERRAIN_CODES:
+        raise sw_exceptions.InputError('Line {}: invalid terrain type: '
+                                       '{}'.format(line, terrain))
+
+    lost_tribes = _csv_bool(row[layout.lost_tribes], 'lost_tribes', line)
+    if terrain == 'mountain' and lost_tribes:
+        raise sw_exceptions.InputError('Line {}: \'lost_tribes\' not permitted '
+                                       'on \'mountain\' terrain'.format(line))
+
+    symbols = []
+    for col in layout.symbols:
+        if col < len(row) and row[col]:
+            if row[col] not in _SYMBOL_BITS:
+                raise sw_exceptions.InputError('Line {}: invalid map symbol: '
+                                               '{}'.format(line, row[col]))
+            symbols.append(row[col])
+
+    neighbors = []
+    for col in layout.neighbors:
+        if col < len(row) and row[col]:
+            neighbor = _csv_int(row[col], 'neighbor', line)
+            if neighbor > 0:
+                neighbors.append(neighbor)
+
+    return {'id': space_id,
+            'terrain': terrain,
+            'is_edge': _csv_bool(row[layout.is_edge], 'is_edge', line),
+            'lost_tribes': lost_tribes,
+            'symbols': symbols,
+            'neighbors': neighbors}
+
+def compile_map(in_csv, out_json, validate=True):
+    """ Streams csv formatted SW gameboard information (in_csv) into the
+    compact json map format (out_json) without pandas.
+
+    The csv columns are those of gameboard_csv_to_json. Each row is
+    validated against the BoardSpace vocabularies and written as soon as
+    it is read. The output is written under a temporary name and only
+    renamed to out_json once the whole map compiled, so an invalid map
+    raises InputError and leaves no output file.
+
+    Whole map checks with validate_map need every space: unless validate
+    is False, packed integer columns (12 bytes per space plus 4 per
+    neighbor) are kept until the end. With validate=False memory
+    stays flat however large the map.
+
+    Output:
+
+    out_json: {"format": "sw-map", "version": 1, "spaces": [...]} with
+    one compile_space dictionary per space, in csv order
+
+    """
+
+    if not in_csv.endswith('.csv'):
+        raise sw_exceptions.InputError('First file must be a csv file.')
+    if not out_json.endswith('.json'):
+        raise sw_exceptions.InputError('Please choose output ending with .json')
+
+    columns = _MapColumns()
+    partial = '{}.{}.partial'.format(out_json, os.getpid())
+    try:
+        with open(in_csv, newline='') as infile, open(partial, 'w') as outfile:
+            rows = csv.reader(infile)
+            layout = column_layout(next(rows, []))
+
+            outfile.write('{{"format": "{}", "version": {}, "spaces": [\n'.format(
+                MAP_FORMAT, MAP_VERSION))
+            separator = ''
+            for line, row in enumerate(rows, start=2):
+                if not any(row):
+                    continue # blank line
+                space = compile_space(row, layout, line)
+                if validate:
+                    columns.append(space)
+                outfile.write(separator + json.dumps(space, separators=(',', ':')))
+                separator = ',\n'
+            outfile.write('\n]}\n')
+
+        if validate:
+            _check_valid(columns.arrays(in_csv), in_csv)
+        os.replace(partial, out_json)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+class _MapColumns:
+    """ helper class accumulating compiled spaces in packed integer
+    columns, so whole maps can be indexed and validated without keeping
+    the space dictionaries """
+
+    def __init__(self):
+        self.space_ids = array.array('i')
+        self.terrain, self.symbols = array.array('b'), array.array('B')
+        self.is_edge, self.lost_tribes = array.array('B'), array.array('B')
+        self.offsets, self.neighbor_ids = array.array('i', [0]), array.array('i')
+
+    def append(self, space):
+        """Adds one compile_space dictionary"""
+        self.space_ids.append(space['id'])
+        self.terrain.append(_TERRAIN_CODES[space['terrain']])
+        self.symbols.append(sum(_SYMBOL_BITS[symbol]
+                                for symbol in set(space['symbols'])))
+        self.is_edge.append(space['is_edge'])
+        self.lost_tribes.append(space['lost_tribes'])
+        self.neighbor_ids.extend(space['neighbors'])
+        self.offsets.append(len(self.neighbor_ids))
+
+    def arrays(self, source):
+        """Returns the columns in the order of mapfile.MapArrays, spaces
+        in id order and neighbors resolved to space indices"""
+
+        space_ids, terrain, symbols = self.space_ids, self.terrain, self.symbols
+        is_edge, lost_tribes = self.is_edge, self.lost_tribes
+        offsets, neighbor_ids = self.offsets, self.neighbor_ids
+
+        # spaces are indexed in id order, like board.Board.from_spaces
+        order = sorted(range(len(space_ids)), key=space_ids.__getitem__)
+        if any(position != rank for rank, position in enumerate(order)):
+            space_ids, terrain, symbols, is_edge, lost_tribes = (
+                array.array(column.typecode,
+                            (column[position] for position in order))
+                for column in (space_ids, terrain, symbols, is_edge,
+                               lost_tribes))
+            rows = [neighbor_ids[offsets[position]:offsets[position + 1]]
+                    for position in order]
+            offsets, neighbor_ids = array.array('i', [0]), array.array('i')
+            for row in rows:
+                neighbor_ids.extend(row)
+                offsets.append(len(neighbor_ids))
+
+        index = {space_id: position for position, space_id in enumerate(space_ids)}
+        if len(index) != len(space_ids):
+            raise sw_exceptions.InputError('Duplicate space IDs in {}'.format(source))
+        try:
+            neighbor_indices = array.array('i', (index[space_id]
+                                                 for space_id in neighbor_ids))
+        except KeyError as error:
+            raise sw_exceptions.InputError('Unknown neighbor: {}'.format(error)) from None
+
+        return (space_ids, terrain, symbols, is_edge, lost_tribes, offsets,
+                neighbor_indices)
+
+def _read_columns(in_csv):
+    """helper function compiling every row of a gameboard csv"""
+    columns = _MapColumns()
+    with open(in_csv, newline='') as infile:
+        rows = csv.reader(infile)
+        layout = column_layout(next(rows, []))
+        for line, row in enumerate(rows, start=2):
+            if not any(row):
+                continue # blank line
+            columns.append(compile_space(row, layout, line))
+    return columns
+
+def _check_valid(arrays, source):
+    """helper function raising InputError for a map failing validate_map"""
+    problems = validate_map(arrays)
+    if problems:
+        raise sw_exceptions.InputError('Invalid map {}: {}'.format(
+            source, '; '.join(problems)))
+
+def compile_binary_map(in_csv, out_swm, validate=True):
+    """ Compiles csv formatted SW gameboard information (in_csv) into the
+    binary map format of mapfile (out_swm).
+
+    Rows are validated like compile_map and kept in packed integer
+    columns; neighbor ids are resolved to space indices once every space
+    is known, and the whole map is checked with validate_map unless
+    validate is False.
+
+    """
+
+    # numpy is only needed to validate and write the binary file
+    import mapfile
+
+    if not in_csv.endswith('.csv'):
+        raise sw_exceptions.InputError('First file must be a csv file.')
+    if not out_swm.endswith(mapfile.MAP_EXTENSION):
+        raise sw_exceptions.InputError('Please choose output ending with '
+                                       '{}'.format(mapfile.MAP_EXTENSION))
+
+    arrays = _read_columns(in_csv).arrays(in_csv)
+    if validate:
+        _check_valid(arrays, in_csv)
+    mapfile.write_map(out_swm, arrays)
+
+# share of each terrain of boardspace.TERRAIN_TYPES on generated maps,
+# close to the bundled maps
+TERRAIN_WEIGHTS = (0.2, 0.2, 0.15, 0.3, 0.15)
+SYMBOL_RATE = 0.4 # chance of a space carrying a symbol
+LOST_TRIBES_RATE = 0.4 # chance of lost tribes on farm, mesa and swamp
+
+def _lexical_order(primary, secondary):
+    """helper function returning the order sorting non-negative integer
+    pairs, as linear passes of stable 16 bit radix sorts"""
+    import numpy as np
+
+    order = np.arange(len(primary))
+    for keys in (secondary, primary):
+        keys = np.asarray(keys, dtype=np.int64)
+        shift, top = 0, int(keys.max()) if len(keys) else 0
+        while True:
+            digits = ((keys[order] >> shift) & 0xFFFF).astype(np.uint16)
+            order = order[np.argsort(digits, kind='stable')]
+            shift += 16
+            if top >> shift == 0:
+                break
+    return order
+
+def generate_map(n_spaces, seed=0):
+    """ Generates a random planar SW map.
+
+    Spaces are laid out row by row on a square grid; each is a neighbor
+    of the spaces beside, above and below it, and every grid square gets
+    one of its two diagonals at random, so the map stays planar with at
+    most 8 neighbors per space. Spaces without 4 grid neighbors are edge
+    spaces. Terrain follows TERRAIN_WEIGHTS, symbols SYMBOL_RATE and lost
+    tribes LOST_TRIBES_RATE.
+
+    Input:
+
+    n_spaces: number of spaces, ids 1 .. n_spaces
+    seed: seed of the random number generator
+
+    Output:
+
+    mapfile.MapArrays of the map
+
+    """
+
+    import numpy as np
+    import mapfile
+
+    if n_spaces < 1:
+        raise sw_exceptions.InputError('A map needs at least one space.')
+    rng = np.random.default_rng(seed)
+    width = int(np.ceil(np.sqrt(n_spaces)))
+    cells = np.arange(n_spaces)
+    col = cells % width
+
+    right = cells[(col < width - 1) & (cells + 1 < n_spaces)]
+    down = cells[cells + width < n_spaces]
+    square = cells[(col < width - 1) & (cells + width + 1 < n_spaces)]
+    falling = rng.random(len(square)) < 0.5
+    sources = np.concatenate([right, down, square[falling],
+                              square[~falling] + 1])
+    targets = np.concatenate([right + 1, down + width,
+                              square[falling] + width + 1,
+                              square[~falling] + width])
+
+    # both directions of every edge, grouped by space in index order
+    rows = np.concatenate([sources, targets])
+    neighbors = np.concatenate([targets, sources])
+    order = _lexical_order(rows, neighbors)
+    neighbor_indices = neighbors[order]
+    offsets = np.zeros(n_spaces + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_spaces), out=offsets[1:])
+
+    grid_degree = (np.bincount(right, minlength=n_spaces)
+                   + np.bincount(right + 1, minlength=n_spaces)
+                   + np.bincount(down, minlength=n_spaces)
+                   + np.bincount(down + width, minlength=n_spaces))
+
+    terrain = rng.choice(len(boardspace.TERRAIN_TYPES), size=n_spaces,
+                         p=TERRAIN_WEIGHTS)
+    symbols = np.where(rng.random(n_spaces) < SYMBOL_RATE,
+                       1 << rng.integers(len(boardspace.MAP_SYMBOLS),
+                                         size=n_spaces), 0)
+    settled = ~np.isin(terrain, [_TERRAIN_CODES['mountain'],
+                                 _TERRAIN_CODES['water']])
+    lost_tribes = settled & (rng.random(n_spaces) < LOST_TRIBES_RATE)
+
+    return mapfile.MapArrays(cells + 1, terrain, symbols, grid_degree < 4,
+                             lost_tribes, offsets, neighbor_indices)
+
+def validate_map(arrays, limit=10):
+    """ Checks a whole map in time linear in spaces plus neighbors.
+
+    Checks that the columns agree in length, that space ids are positive
+    and increasing, that codes belong to the BoardSpace vocabularies and
+    that lost tribes are not on mountains; that neighbor lists only name
+    other existing spaces, once, and are symmetric; and that there are
+    edge spaces from which every space can be reached.
+
+    Input:
+
+    arrays: mapfile.MapArrays (or a sequence in its order) of the map
+    limit: most problems reported
+
+    Output:
+
+    list of problem descriptions, empty for a valid map
+
+    """
+
+    import numpy as np
+
+    (space_ids, terrain, symbols, is_edge, lost_tribes, offsets,
+     indices) = (np.asarray(column) for column in arrays)
+    n_spaces = len(space_ids)
+    problems = []
+
+    if any(len(column) != n_spaces
+           for column in (terrain, symbols, is_edge, lost_tribes)):
+        return ['Map columns differ in length']
+    if (len(offsets) != n_spaces + 1 or offsets[0] != 0
+            or offsets[-1] != len(indices) or (np.diff(offsets) < 0).any()):
+        return ['Neighbor offsets do not match the neighbor list']
+
+    name = lambda index: int(space_ids[index])
+    if n_spaces and (space_ids[0] < 1 or (np.diff(space_ids) <= 0).any()):
+        problems.append('Space IDs must be positive, distinct and in order')
+    if ((terrain < 0) | (terrain >= len(boardspace.TERRAIN_TYPES))).any():
+        problems.append('Invalid terrain codes')
+    if (symbols >= 1 << len(boardspace.MAP_SYMBOLS)).any():
+        problems.append('Invalid map symbol codes')
+    mountains = terrain == _TERRAIN_CODES['mountain']
+    bad = np.flatnonzero(mountains & lost_tribes.astype(bool))
+    if len(bad):
+        problems.append('\'lost_tribes\' not permitted on \'mountain\' '
+                        'terrain of space {}'.format(name(bad[0])))
+
+    if ((indices < 0) | (indices >= n_spaces)).any():
+        problems.append('Neighbor indices out of range')
+        return problems[:limit]
+
+    rows = np.repeat(np.arange(n_spaces), np.diff(offsets))
+    loops = np.flatnonzero(rows == indices)
+    if len(loops):
+        problems.append('Space {} is its own neighbor'.format(
+            name(rows[loops[0]])))
+
+    forward = _lexical_order(rows, indices)
+    pairs = np.stack([rows[forward], indices[forward]])
+    repeated = np.flatnonzero((pairs[:, 1:] == pairs[:, :-1]).all(axis=0))
+    if len(repeated):
+        problems.append('Space {} lists neighbor {} twice'.format(
+            name(pairs[0, repeated[0]]), name(pairs[1, repeated[0]])))
+    backward = _lexical_order(indices, rows)
+    reverse = np.stack([indices[backward], rows[backward]])
+    mismatched = np.flatnonzero((pairs != reverse).any(axis=0))
+    if len(mismatched):
+        # the smaller pair at the first difference is missing its twin
+        listing, listed = pairs[:, mismatched[0]]
+        other_listed, other_listing = reverse[:, mismatched[0]]
+        if (other_listed, other_listing) < (listing, listed):
+            listing, listed = other_listing, other_listed
+        problems.append('Space {} lists neighbor {} but not the '
+                        'reverse'.format(name(listing), name(listed)))
+
+    # multi-source breadth first search from the edge spaces
+    seen = np.asarray(is_edge, dtype=bool).copy()
+    if not seen.any() and n_spaces:
+        problems.append('The map has no edge spaces')
+    frontier = np.flatnonzero(seen)
+    slot = np.empty(n_spaces, dtype=np.int64)
+    while len(frontier):
+        starts, ends = offsets[frontier], offsets[frontier + 1]
+        lengths = ends - starts
+        positions = (np.arange(lengths.sum())
+                     + np.repeat(starts - np.cumsum(lengths) + lengths, lengths))
+        reached = indices[positions]
+        reached = reached[~seen[reached]]
+        # keep one entry per space: the last write to its slot wins
+        slot[reached] = np.arange(len(reached))
+        frontier = reached[slot[reached] == np.arange(len(reached))]
+        seen[frontier] = True
+    unreached = np.flatnonzero(~seen)
+    if len(unreached) and seen.any():
+        problems.append('{} spaces cannot be reached from an edge, first '
+                        'space {}'.format(len(unreached), name(unreached[0])))
+
+    return problems[:limit]
+
+def _space_records(arrays):
+    """helper function yielding the compile_space dictionary of every
+    space of map arrays"""
+    space_ids, terrain, symbols, is_edge, lost_tribes, offsets, indices = (
+        column.tolist() if hasattr(column, 'tolist') else list(column)
+        for column in arrays)
+    for position, space_id in enumerate(space_ids):
+        yield {'id': space_id,
+               'terrain': boardspace.TERRAIN_TYPES[terrain[position]],
+               'is_edge': bool(is_edge[position]),
+               'lost_tribes': bool(lost_tribes[position]),
+               'symbols': [symbol for bit, symbol in
+                           enumerate(boardspace.MAP_SYMBOLS)
+                           if symbols[position] >> bit & 1],
+               'neighbors': [space_ids[index] for index in
+                             indices[offsets[position]:offsets[position + 1]]]}
+
+def write_map_arrays(path, arrays):
+    """ Writes map arrays, e.g. of generate_map, in the format named by the
+    extension of path: a gameboard csv (.csv), the compact json map
+    format of compile_map (.json) or the binary map format (.swm).
+    Spaces are streamed one at a time to the csv and json formats.
+
+    """
+
+    import mapfile
+
+    if path.endswith(mapfile.MAP_EXTENSION):
+        mapfile.write_map(path, arrays)
+    elif path.endswith('.json'):
+        with open(path, 'w') as outfile:
+            outfile.write('{{"format": "{}", "version": {}, "spaces": [\n'.format(
+                MAP_FORMAT, MAP_VERSION))
+            separator = ''
+            for space in _space_records(arrays):
+                outfile.write(separator + json.dumps(space, separators=(',', ':')))
+                separator = ',\n'
+            outfile.write('\n]}\n')
+    elif path.endswith('.csv'):
+        n_symbols = len(boardspace.MAP_SYMBOLS)
+        offsets = arrays[5]
+        n_neighbors = max(1, max((int(offsets[k + 1]) - int(offsets[k])
+                                  for k in range(len(offsets) - 1)), default=0))
+        with open(path, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['space_id', 'terrain', 'is_edge', 'lost_tribes']
+                            + ['symbol_{}'.format(n + 1) for n in range(n_symbols)]
+                            + ['neighbor_{}'.format(n + 1)
+                               for n in range(n_neighbors)])
+            for space in _space_records(arrays):
+                writer.writerow([space['id'], space['terrain'], space['is_edge'],
+                                 space['lost_tribes']]
+                                + (space['symbols'] + [''] * n_symbols)[:n_symbols]
+                                + (space['neighbors']
+                                   + [''] * n_neighbors)[:n_neighbors])
+    else:
+        raise sw_exceptions.InputError('Please choose output ending with .csv, '
+                                       '.json or {}'.format(mapfile.MAP_EXTENSION))
+
+def read_map_arrays(path):
+    """ Reads the map arrays of a gameboard csv, a map json (indented or
+    compact) or a binary map, chosen by the extension of path, without
+    validating the adjacency.
+
+    """
+
+    if path.endswith('.csv'):
+        return _read_columns(path).arrays(path)
+    import board
+    import mapfile
+    if path.endswith(mapfile.MAP_EXTENSION):
+        return mapfile.load_map(path)
+    loaded = board.Board.from_json(path)
+    return mapfile.MapArrays(*(getattr(loaded, name)
+                               for name in mapfile.MapArrays._fields))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a SW gameboard csv.')
+    parser.add_argument('in_csv')
+    parser.add_argument('out_json', help='output map; a .swm file is written '
+                        'in the binary map format')
+    parser.add_argument('--compact', action='store_true',
+                        help='stream the compact map format without pandas')
+    args = parser.parse_args(argv)
+
+    if args.out_json.endswith('.swm'):
+        compile_binary_map(args.in_csv, args.out_json)
+    elif args.compact:
+        compile_map(args.in_csv, args.out_json)
+    else:
+        gameboard_csv_to_json(args.in_csv, args.out_json)
+
 if __name__ == '__main__':
-    gameboard_csv_to_json(sys.argv[1],sys.argv[2])
+    main(sys.argv[1:])
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+import board, gameboard_csv_to_json, sw_exceptions
+import csv, json, os, sys, tempfile
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+def write_map_csv(path, spaces):
+    '''writes space dictionaries as a gameboard csv'''
+    header = (['space_id', 'terrain', 'is_edge', 'lost_tribes']
+              + ['symbol_{}'.format(n) for n in (1, 2)]
+              + ['neighbor_{}'.format(n) for n in range(1, 8)])
+    with open(path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        for space in spaces:
+            symbols = list(space.get('symbols', []))
+            neighbors = list(space['neighbors'])
+            writer.writerow([space['id'], space['terrain'], space['is_edge'],
+                             space['lost_tribes']]
+                            + (symbols + ['', ''])[:2]
+                            + (neighbors + [''] * 7)[:7])
+
+class TestCompileMap(unittest.TestCase):
+    """Tests the streaming compact compiler"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmp.name, 'map.csv')
+        self.json = os.path.join(self.tmp.name, 'map.json')
+        with open(MAP_JSON) as infile:
+            self.spaces = list(json.load(infile).values())
+        write_map_csv(self.csv, self.spaces)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_typed_output(self):
+        gameboard_csv_to_json.compile_map(self.csv, self.json)
+        with open(self.json) as infile:
+            data = json.load(infile)
+        self.assertEqual(data['format'], gameboard_csv_to_json.MAP_FORMAT)
+        first = [space for space in data['spaces'] if space['id'] == 6][0]
+        self.assertEqual(first, {'id': 6, 'terrain': 'mountain',
+                                 'is_edge': True, 'lost_tribes': False,
+                                 'symbols': ['cavern', 'mine'],
+                                 'neighbors': [1, 7, 12]})
+
+    def test_board_matches_legacy_json(self):
+        gameboard_csv_to_json.compile_map(self.csv, self.json)
+        compact = board.Board.from_json(self.json)
+        legacy = board.Board.from_json(MAP_JSON)
+        for name in ('space_ids', 'terrain', 'symbols', 'is_edge',
+                     'lost_tribes', 'neighbor_offsets', 'neighbor_indices'):
+            np.testing.assert_array_equal(getattr(compact, name),
+                                          getattr(legacy, name))
+
+    def test_no_pandas(self):
+        gameboard_csv_to_json.compile_map(self.csv, self.json)
+        self.assertNotIn('pandas', sys.modules)
+
+    def test_bad_terrain(self):
+        self.spaces[2] = dict(self.spaces[2], terrain='Farm')
+        write_map_csv(self.csv, self.spaces)
+        with self.assertRaises(sw_exceptions.InputError):
+            gameboard_csv_to_json.compile_map(self.csv, self.json)
+        self.assertEqual(os.listdir(self.tmp.name), ['map.csv'])
+
+    def test_bad_symbol(self):
+        self.spaces[0] = dict(self.spaces[0], symbols=['gold'])
+        write_map_csv(self.csv, self.spaces)
+        with self.assertRaises(sw_exceptions.InputError):
+            gameboard_csv_to_json.compile_map(self.csv, self.json)
+
+    def test_missing_column(self):
+        with open(self.csv, 'w') as outfile:
+            outfile.write('space_id,terrain\n1,farm\n')
+        with self.assertRaises(sw_exceptions.InputError):
+            gameboard_csv_to_json.compile_map(self.csv, self.json)
+
+    def test_short_row(self):
+        '''Check that a row without the required cells names its line'''
+        with open(self.csv, 'a') as outfile:
+            outfile.write('24,farm\n')
+        with self.assertRaisesRegex(sw_exceptions.InputError, 'Line 25'):
+            gameboard_csv_to_json.compile_map(self.csv, self.json)
+
+    def test_binary_matches_legacy_json(self):
+        swm = os.path.join(self.tmp.name, 'map.swm')
+        gameboard_csv_to_json.compile_binary_map(self.csv, swm)
+        compiled = board.Board.load(swm)
+        legacy = board.Board.from_json(MAP_JSON)
+        for name in ('space_ids', 'terrain', 'symbols', 'is_edge',
+                     'lost_tribes', 'neighbor_offsets', 'neighbor_indices'):
+            np.testing.assert_array_equal(getattr(compiled, name),
+                                          getattr(legacy, name))
+
+    def test_output_extension(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            gameboard_csv_to_json.compile_map(self.csv, 'map.txt')
+
+class TestGenerateMap(unittest.TestCase):
+    """Tests the random map generator and the map validator"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_generated_maps_are_valid(self):
+        for n_spaces in (1, 2, 7, 30, 2000):
+            arrays = gameboard_csv_to_json.generate_map(n_spaces, seed=n_spaces)
+            self.assertEqual(gameboard_csv_to_json.validate_map(arrays), [])
+            self.assertEqual(len(arrays.space_ids), n_spaces)
+            self.assertLessEqual(np.diff(arrays.neighbor_offsets).max(), 8)
+        mountains = arrays.terrain == board.TERRAIN_CODES['mountain']
+        self.assertFalse((mountains & arrays.lost_tribes).any())
+        self.assertEqual(len(np.unique(arrays.terrain)), 5)
+        self.assertTrue(arrays.symbols.any())
+
+    def test_seeded(self):
+        first = gameboard_csv_to_json.generate_map(500, seed=4)
+        second = gameboard_csv_to_json.generate_map(500, seed=4)
+        for column, other in zip(first, second):
+            np.testing.assert_array_equal(column, other)
+
+    def test_formats_round_trip(self):
+        arrays = gameboard_csv_to_json.generate_map(300, seed=2)
+        for name in ('map.csv', 'map.json', 'map.swm'):
+            path = os.path.join(self.tmp.name, name)
+            gameboard_csv_to_json.write_map_arrays(path, arrays)
+            loaded = gameboard_csv_to_json.read_map_arrays(path)
+            for column, other in zip(arrays, loaded):
+                np.testing.assert_array_equal(column, other)
+        loaded = board.Board.load(os.path.join(self.tmp.name, 'map.json'))
+        self.assertEqual(len(loaded), 300)
+        with self.assertRaises(sw_exceptions.InputError):
+            gameboard_csv_to_json.write_map_arrays('map.txt', arrays)
+
+    def test_validate_bundled_map(self):
+        arrays = gameboard_csv_to_json.read_map_arrays(MAP_JSON)
+        self.assertEqual(gameboard_csv_to_json.validate_map(arrays), [])
+
+    def test_validate_problems(self):
+        arrays = gameboard_csv_to_json.read_map_arrays(MAP_JSON)
+        validate = gameboard_csv_to_json.validate_map
+
+        one_way = np.array(arrays.neighbor_indices)
+        one_way[0] = 5 # space 1 now lists space 6 twice and not space 2
+        self.assertEqual(validate(arrays._replace(neighbor_indices=one_way)),
+                         ['Space 1 lists neighbor 6 twice',
+                          'Space 2 lists neighbor 1 but not the reverse'])
+
+        no_edges = np.zeros(len(arrays.is_edge), dtype=bool)
+        self.assertEqual(validate(arrays._replace(is_edge=no_edges)),
+                         ['The map has no edge spaces'])
+
+        # only space 1 keeps its neighbors, and only space 1 is an edge
+        grid = gameboard_csv_to_json.generate_map(9)
+        offsets = np.array(grid.neighbor_offsets)
+        offsets[2:] = offsets[1]
+        problems = validate(grid._replace(
+            neighbor_indices=grid.neighbor_indices[:offsets[1]],
+            neighbor_offsets=offsets, is_edge=np.arange(9) == 0))
+        first = grid.neighbor_indices[:offsets[1]]
+        self.assertEqual(problems, [
+            'Space 1 lists neighbor 2 but not the reverse',
+            '{} spaces cannot be reached from an edge, first space '
+            '{}'.format(8 - len(first), min(set(range(1, 9)) - set(first)) + 1)])
+
+        self.assertEqual(validate(arrays._replace(neighbor_offsets=[0, 1])),
+                         ['Neighbor offsets do not match the neighbor list'])
+
+    def test_compile_rejects_asymmetric_map(self):
+        with open(MAP_JSON) as infile:
+            spaces = list(json.load(infile).values())
+        spaces[0] = dict(spaces[0], neighbors=spaces[0]['neighbors'][1:])
+        csv_path = os.path.join(self.tmp.name, 'map.csv')
+        write_map_csv(csv_path, spaces)
+        for out in ('map.json', 'map.swm'):
+            out = os.path.join(self.tmp.name, out)
+            compile = (gameboard_csv_to_json.compile_map if out.endswith('json')
+                       else gameboard_csv_to_json.compile_binary_map)
+            with self.assertRaises(sw_exceptions.InputError):
+                compile(csv_path, out)
+            self.assertFalse(os.path.exists(out))
+            compile(csv_path, out, validate=False)
+            self.assertTrue(os.path.exists(out))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,441 @@
+#!/usr/bin/env python
+""" Module implements the binary append-only SW game record format
+
+    A .swr file is a 32 byte header followed by frames, each a uint8
+    kind and a uint32 payload length ahead of the payload; little endian:
+
+        header    magic b'SWREC\\0', uint16 version, uint32 spaces,
+                  first 20 bytes of distances.map_hash of the map
+        META      json: players and anything else the writer was given
+        VOCAB     uint8 table (0 owners, 1 token types), uint16 first
+                  code, then uint16 length prefixed utf-8 names
+        TURN      uint32 turn, uint16 seat; the moves of a player turn
+                  follow until the next TURN
+        KEYFRAME  uint16 token columns, int16 owner[spaces],
+                  int16 tokens[spaces, columns]
+        DELTAS    packed DELTA_DTYPE records, the board.Board journal
+                  entries: space index, token column (OWNER_COLUMN for
+                  owner changes) and the change of the count (or code)
+        RESULT    json of game.Game.result()
+        INDEX     FRAME_DTYPE table of every frame before it, followed
+                  by the 12 byte trailer: uint64 offset of the INDEX
+                  frame, b'SWIX'
+
+    Owner and token codes are those of the recorded board; VOCAB frames
+    name each code before it is used. A KEYFRAME of the full state starts
+    the record and every keyframe_every turns, so reading turn N replays
+    at most keyframe_every turns of deltas. Deltas only ever add, so the
+    deltas of any number of turns are applied with one numpy.add.at.
+
+    Usage: python gamerecord.py map.json record.swr [--games 1]
+"""
+import argparse
+import bisect
+import collections
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+import board
+import distances
+import game
+import sw_exceptions
+
+RECORD_EXTENSION = '.swr'
+MAGIC = b'SWREC\0'
+VERSION = 1
+
+META, VOCAB, TURN, KEYFRAME, DELTAS, RESULT, INDEX = range(1, 8)
+OWNERS, TOKENS = 0, 1 # VOCAB tables
+
+DELTA_DTYPE = np.dtype([('space', '<u4'), ('column', '<i2'), ('delta', '<i2')])
+FRAME_DTYPE = np.dtype([('kind', 'u1'), ('offset', '<u8'), ('length', '<u4')])
+
+_DIGEST_SIZE = 20
+_HEADER = struct.Struct('<6sHI{}s'.format(_DIGEST_SIZE))
+_FRAME = struct.Struct('<BI')
+_TURN = struct.Struct('<IH')
+_VOCAB = struct.Struct('<BH')
+_NAME = struct.Struct('<H')
+_TRAILER = struct.Struct('<Q4s')
+_TRAILER_MAGIC = b'SWIX'
+
+# one player turn of a record; deltas is a DELTA_DTYPE array
+Turn = collections.namedtuple('Turn', ['turn', 'seat', 'deltas'])
+
+
+def _digest(game_board):
+    """helper function returning the map digest stored in the header"""
+    return bytes.fromhex(distances.map_hash(game_board))[:_DIGEST_SIZE]
+
+
+class RecordWriter:
+    """ Appends the changes of a board.Board to a game record
+    ...
+
+    The writer journals the board (board.Board.mark) and packs the
+    journal into a DELTAS frame whenever a turn begins or the record is
+    flushed, so the moves themselves never have to be described.
+
+    Attributes:
+    -----------
+
+    turns: int
+        TURN frames written
+
+    moves: int
+        Deltas written
+
+    """
+
+    def __init__(self, path, game_board, meta=None, keyframe_every=10):
+        """Initializes the RecordWriter and writes the starting position
+        Args: path - record file to create
+
+              game_board - board.Board being played
+
+              meta - optional json ready dictionary saved in the META frame
+
+              keyframe_every - turns between keyframes
+
+        Output: object of type RecordWriter """
+
+        if not isinstance(keyframe_every, int):
+            raise TypeError('keyframe_every: {} invalid! Must be an '
+                            'integer!'.format(keyframe_every))
+        if keyframe_every < 1:
+            raise sw_exceptions.InputError('keyframe_every must be positive')
+
+        self.board = game_board
+        self.keyframe_every = keyframe_every
+        self.turns = 0
+        self.moves = 0
+        self._frames = []
+        self._named = [0, 0] # owners and token types written to VOCAB
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(game_board),
+                                      _digest(game_board)))
+        self._write(META, json.dumps(meta or {}).encode())
+        self._started = not game_board.journaling
+        self._keyframe()
+
+    def _write(self, kind, payload):
+        """helper function appending one frame"""
+        offset = self._file.tell() + _FRAME.size
+        self._file.write(_FRAME.pack(kind, len(payload)))
+        self._file.write(payload)
+        self._frames.append((kind, offset, len(payload)))
+
+    def _write_vocab(self):
+        """helper function naming the codes registered since the last VOCAB"""
+        for table, names in ((OWNERS, self.board.owners),
+                             (TOKENS, self.board.token_types)):
+            first = self._named[table]
+            if len(names) > first:
+                payload = [_VOCAB.pack(table, first)]
+                for name in names[first:]:
+                    encoded = name.encode()
+                    payload += [_NAME.pack(len(encoded)), encoded]
+                self._write(VOCAB, b''.join(payload))
+                self._named[table] = len(names)
+
+    def _keyframe(self):
+        """helper function writing the full state and restarting the journal"""
+        self._write_vocab()
+        # the shared vocabulary may name more token types than this board
+        # has columns for; those columns are all zero here
+        columns = min(len(self.board.token_types), self.board.tokens.shape[1])
+        tokens = np.ascontiguousarray(self.board.tokens[:, :columns], dtype='<i2')
+        self._write(KEYFRAME, struct.pack('<H', columns)
+                    + self.board.owner.astype('<i2').tobytes()
+                    + tokens.tobytes())
+        # the keyframe holds everything journaled so far
+        if self._started:
+            self.board.stop_journal()
+        self._mark = self.board.mark()
+
+    def flush(self):
+        """Writes the changes made since the last flush as a DELTAS frame"""
+        changes = self.board.changes_since(self._mark)
+        self._mark += len(changes)
+        if changes:
+            self._write_vocab()
+            packed = np.array(changes, dtype=np.int64)
+            deltas = np.empty(len(packed), dtype=DELTA_DTYPE)
+            deltas['space'], deltas['column'], deltas['delta'] = packed.T
+            self._write(DELTAS, deltas.tobytes())
+            self.moves += len(deltas)
+        self._file.flush()
+
+    def begin_turn(self, turn, seat):
+        """Starts a player turn: flushes the previous one, writes a keyframe
+        every keyframe_every turns and the TURN frame"""
+        self.flush()
+        if self.turns and self.turns % self.keyframe_every == 0:
+            self._keyframe()
+        self._write(TURN, _TURN.pack(turn, seat))
+        self.turns += 1
+
+    def close(self, result=None):
+        """Flushes, saves the optional game result and writes the index"""
+        if self._file.closed:
+            return
+        self.flush()
+        if result is not None:
+            self._write(RESULT, json.dumps(result).encode())
+        offset = self._file.tell()
+        self._write(INDEX, np.array(self._frames, dtype=FRAME_DTYPE).tobytes())
+        self._file.write(_TRAILER.pack(offset, _TRAILER_MAGIC))
+        self._file.close()
+        if self._started:
+            self.board.stop_journal()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def record_game(played, policies, path, keyframe_every=10):
+    """Plays every remaining turn of a game.Game while recording it.
+
+    Args:
+        played: game.Game
+        policies: one policy per player, see game.Game.play
+        path: record file to create
+        keyframe_every: turns between keyframes
+
+    Returns:
+        the result() of the finished game"""
+
+    with RecordWriter(path, played.board, {'players': played.players,
+                                           'turns': played.turns},
+                      keyframe_every) as writer:
+        while not played.finished:
+            writer.begin_turn(played.turn, played.seat)
+            played.play_turn(policies[played.seat])
+        result = played.result()
+        writer.close(result)
+    return result
+
+
+class RecordReader:
+    """ Lazy reader of a game record
+    ...
+
+    The file is memory mapped (numpy.memmap); frames are located from the trailing
+    INDEX, or by walking the frame headers of a record that was never
+    closed, and payloads are only read when asked for.
+
+    Attributes:
+    -----------
+
+    n_spaces: int
+        Spaces of the recorded map
+
+    meta: dictionary
+        The META frame
+
+    owners, token_types: list
+        Names of the recorded owner and token codes
+
+    """
+
+    def __init__(self, path):
+        """Initializes the RecordReader
+        Args: path - record file written by RecordWriter
+
+        Output: object of type RecordReader """
+
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(self._map) < _HEADER.size:
+            raise sw_exceptions.InputError('{} is not a SW game record.'.format(path))
+        magic, version, self.n_spaces, self.digest = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise sw_exceptions.InputError('{} is not a SW game record.'.format(path))
+        if version != VERSION:
+            raise sw_exceptions.InputError('Unsupported SW game record version: '
+                                           '{}'.format(version))
+
+        self.frames = self._read_index()
+        kinds = self.frames['kind']
+        self._turns = np.flatnonzero(kinds == TURN)
+        self._keyframes = np.flatnonzero(kinds == KEYFRAME)
+        self.meta = json.loads(self._payload(
+            np.flatnonzero(kinds == META)[0]).tobytes())
+        self.owners, self.token_types = [], []
+        for position in np.flatnonzero(kinds == VOCAB):
+            self._read_vocab(self._payload(position))
+
+    def _read_index(self):
+        """helper function returning the FRAME_DTYPE table of the file"""
+        size = len(self._map)
+        if size >= _HEADER.size + _TRAILER.size:
+            offset, magic = _TRAILER.unpack_from(self._map, size - _TRAILER.size)
+            if magic == _TRAILER_MAGIC:
+                kind, length = _FRAME.unpack_from(self._map, offset)
+                if kind == INDEX:
+                    return np.frombuffer(self._map, dtype=FRAME_DTYPE,
+                                         count=length // FRAME_DTYPE.itemsize,
+                                         offset=offset + _FRAME.size)
+
+        # an unfinished record: walk the frame headers
+        frames, offset = [], _HEADER.size
+        while offset + _FRAME.size <= size:
+            kind, length = _FRAME.unpack_from(self._map, offset)
+            if offset + _FRAME.size + length > size:
+                break # a frame cut short by a crash
+            frames.append((kind, offset + _FRAME.size, length))
+            offset += _FRAME.size + length
+        return np.array(frames, dtype=FRAME_DTYPE)
+
+    def _payload(self, position):
+        """helper function returning the payload of a frame, a uint8 view
+        of the mapped file"""
+        _, offset, length = self.frames[position].tolist()
+        return self._map[offset:offset + length]
+
+    def _read_vocab(self, payload):
+        """helper function extending owners or token_types from a VOCAB"""
+        table, first = _VOCAB.unpack_from(payload)
+        names = self.owners if table == OWNERS else self.token_types
+        offset = _VOCAB.size
+        del names[first:]
+        while offset < len(payload):
+            length, = _NAME.unpack_from(payload, offset)
+            offset += _NAME.size
+            names.append(payload[offset:offset + length].tobytes().decode())
+            offset += length
+
+    def __len__(self):
+        """Number of recorded player turns"""
+        return len(self._turns)
+
+    @property
+    def result(self):
+        """The RESULT frame, None if the game was not finished"""
+        results = np.flatnonzero(self.frames['kind'] == RESULT)
+        if not len(results):
+            return None
+        return json.loads(self._payload(results[-1]).tobytes())
+
+    def _deltas(self, first, last):
+        """helper function returning the deltas of frames first .. last - 1"""
+        parts = [np.frombuffer(self._payload(position), dtype=DELTA_DTYPE)
+                 for position in range(first, last)
+                 if self.frames['kind'][position] == DELTAS]
+        if not parts:
+            return np.empty(0, dtype=DELTA_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def turns(self, start=0):
+        """Lazily yields a Turn for every recorded player turn from turn
+        number start (0 based)"""
+        bounds = list(self._turns[start:]) + [len(self.frames)]
+        for position, end in zip(bounds, bounds[1:]):
+            turn, seat = _TURN.unpack_from(self._payload(position))
+            yield Turn(turn, seat, self._deltas(position + 1, end))
+
+    def _keyframe(self, position):
+        """helper function returning owner and tokens of a keyframe, tokens
+        widened to every recorded token type"""
+        payload = self._payload(position)
+        columns, = struct.unpack_from('<H', payload)
+        owner = np.frombuffer(payload, dtype='<i2', count=self.n_spaces,
+                              offset=2).astype(np.int16)
+        tokens = np.zeros((self.n_spaces, len(self.token_types)), dtype=np.int16)
+        tokens[:, :columns] = np.frombuffer(
+            payload, dtype='<i2', count=self.n_spaces * columns,
+            offset=2 + 2 * self.n_spaces).reshape(self.n_spaces, columns)
+        return owner, tokens
+
+    @staticmethod
+    def apply(owner, tokens, deltas):
+        """Applies DELTA_DTYPE deltas in place to owner and token arrays"""
+        space = deltas['space'].astype(np.intp)
+        column = deltas['column'].astype(np.intp)
+        delta = deltas['delta']
+        owned = column == board.OWNER_COLUMN
+        np.add.at(owner, space[owned], delta[owned])
+        np.add.at(tokens, (space[~owned], column[~owned]), delta[~owned])
+
+    def state_at(self, number):
+        """Returns the (owner, tokens) arrays, in recorded codes, at the
+        start of player turn number (0 based; len(self) for the end).
+
+        Starts from the last keyframe before the turn, so at most
+        keyframe_every turns of deltas are applied."""
+
+        if not 0 <= number <= len(self):
+            raise sw_exceptions.InputError('Turn {} is not in a record of {} '
+                                           'turns'.format(number, len(self)))
+        position = (self._turns[number] if number < len(self)
+                    else len(self.frames))
+        keyframe = self._keyframes[bisect.bisect_right(
+            self._keyframes.tolist(), position) - 1]
+        owner, tokens = self._keyframe(keyframe)
+        self.apply(owner, tokens, self._deltas(keyframe + 1, position))
+        return owner, tokens
+
+    def states(self, start=0):
+        """Lazily yields (Turn, owner, tokens) with the state after each
+        player turn from turn number start; the arrays are updated in place"""
+        owner, tokens = self.state_at(start)
+        for turn in self.turns(start):
+            self.apply(owner, tokens, turn.deltas)
+            yield turn, owner, tokens
+
+    def board_at(self, template, number):
+        """Returns a clone of template, a board of the recorded map, holding
+        the position at the start of player turn number"""
+
+        if _digest(template) != self.digest:
+            raise sw_exceptions.InputError('The record was made on another map.')
+        owner, tokens = self.state_at(number)
+        played = template.clone()
+        # NO_OWNER (-1) picks the last entry
+        owner_codes = np.array([played.owner_code(name) for name in self.owners]
+                               + [board.NO_OWNER], dtype=np.int16)
+        token_codes = [played.token_code(name) for name in self.token_types]
+        rows = np.zeros_like(played.tokens)
+        rows[:, token_codes] = tokens
+        played.assign_spaces(np.arange(len(played)), owner_codes[owner], rows)
+        return played
+
+    def close(self):
+        """Drops the mapping; it is released once no returned array views it"""
+        self._map = self.frames = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record SW self-play games.')
+    parser.add_argument('map_path')
+    parser.add_argument('out_swr', help='record file; with several games '
+                        'each game gets its number before the extension')
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keyframe-every', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    template = board.Board.load(args.map_path)
+    stem, extension = os.path.splitext(args.out_swr)
+    for number in range(args.games):
+        path = args.out_swr if args.games == 1 else '{}_{}{}'.format(
+            stem, number, extension or RECORD_EXTENSION)
+        played = game.Game(template, ['player_1', 'player_2'],
+                           seed=args.seed + number)
+        record_game(played, [game.greedy_policy, game.random_policy], path,
+                    args.keyframe_every)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
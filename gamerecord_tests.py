@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+import board, game, gamerecord, gameboard_csv_to_json, sw_exceptions
+import os, tempfile
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+def position(game_board):
+    '''returns the owners and tokens of every space by name'''
+    return ([game_board.owner_of(index) for index in range(len(game_board))],
+            [game_board.tokens_at(index) for index in range(len(game_board))])
+
+class TestGameRecord(unittest.TestCase):
+    """Tests writing and replaying game records"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'game.swr')
+        self.template = board.Board.from_json(MAP_JSON)
+        self.game = game.Game(self.template, ['ratmen', 'giants'], seed=3)
+        self.policies = [game.greedy_policy, game.random_policy]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, keyframe_every=3):
+        '''plays the game, recording it and the position before each turn'''
+        positions = []
+        with gamerecord.RecordWriter(self.path, self.game.board,
+                                     {'players': self.game.players},
+                                     keyframe_every) as writer:
+            while not self.game.finished:
+                positions.append(position(self.game.board))
+                writer.begin_turn(self.game.turn, self.game.seat)
+                self.game.play_turn(self.policies[self.game.seat])
+            writer.close(self.game.result())
+        positions.append(position(self.game.board))
+        return positions
+
+    def test_seek_every_turn(self):
+        '''Check the position before every turn of a recorded game'''
+        positions = self.record()
+        with gamerecord.RecordReader(self.path) as reader:
+            self.assertEqual(len(reader), 2 * game.TURNS)
+            self.assertEqual(reader.meta, {'players': ['ratmen', 'giants']})
+            self.assertEqual(reader.result['coins'], self.game.coins)
+            for number in range(len(reader) + 1):
+                replayed = reader.board_at(self.template, number)
+                self.assertEqual(position(replayed), positions[number], number)
+            self.assertEqual(replayed.zobrist, self.game.board.zobrist)
+            self.assertRaises(sw_exceptions.InputError, reader.board_at,
+                              self.template, len(reader) + 1)
+
+    def test_streamed_turns(self):
+        '''Check that applying turn deltas steps through the states'''
+        self.record()
+        with gamerecord.RecordReader(self.path) as reader:
+            turns = list(reader.turns())
+            self.assertEqual([(turn.turn, turn.seat) for turn in turns[:3]],
+                             [(1, 0), (1, 1), (2, 0)])
+            self.assertTrue(any(len(turn.deltas) for turn in turns))
+            owner, tokens = reader.state_at(0)
+            for turn, after_owner, after_tokens in reader.states(0):
+                reader.apply(owner, tokens, turn.deltas)
+                np.testing.assert_array_equal(owner, after_owner)
+            np.testing.assert_array_equal(owner, reader.state_at(len(reader))[0])
+
+    def test_record_game(self):
+        '''Check the result of a recorded game'''
+        result = gamerecord.record_game(self.game, self.policies, self.path)
+        with gamerecord.RecordReader(self.path) as reader:
+            self.assertEqual(reader.result, result)
+            self.assertEqual(reader.meta['turns'], game.TURNS)
+        self.assertFalse(self.game.board.journaling)
+
+    def test_unfinished_record(self):
+        '''Check that a record cut short still reads up to the cut'''
+        writer = gamerecord.RecordWriter(self.path, self.game.board)
+        for _ in range(3):
+            writer.begin_turn(self.game.turn, self.game.seat)
+            self.game.play_turn(self.policies[self.game.seat])
+        writer.flush()
+        expected = position(self.game.board)
+        with open(self.path, 'ab') as outfile:
+            outfile.write(b'\x05\xff\x00') # a frame cut short
+        with gamerecord.RecordReader(self.path) as reader:
+            self.assertEqual(len(reader), 3)
+            self.assertIsNone(reader.result)
+            self.assertEqual(position(reader.board_at(self.template, 3)), expected)
+        writer.close()
+
+    def test_narrow_clone(self):
+        '''Check a board with fewer token columns than its vocabulary'''
+        played = self.template.clone()
+        for number in range(board.TOKEN_CAPACITY + 1):
+            self.template.token_code('race_{}'.format(number))
+        self.assertLess(played.tokens.shape[1], len(played.token_types))
+        played.add_tokens(0, 'lost_tribes', 1)
+        with gamerecord.RecordWriter(self.path, played) as writer:
+            writer.begin_turn(1, 0)
+        with gamerecord.RecordReader(self.path) as reader:
+            self.assertEqual(position(reader.board_at(self.template, 0)),
+                             position(played))
+
+    def test_other_map(self):
+        '''Check that a board of another map is refused'''
+        self.record()
+        other = board.Board(*gameboard_csv_to_json.generate_map(23))
+        with gamerecord.RecordReader(self.path) as reader:
+            self.assertRaises(sw_exceptions.InputError, reader.board_at, other, 0)
+
+    def test_not_a_record(self):
+        '''Check that other files are refused'''
+        with open(self.path, 'wb') as outfile:
+            outfile.write(b'\0' * 64)
+        self.assertRaises(sw_exceptions.InputError, gamerecord.RecordReader,
+                          self.path)
+
+    def test_keeps_outside_journal(self):
+        '''Check that a journal started outside the writer survives it'''
+        mark = self.game.board.mark()
+        with gamerecord.RecordWriter(self.path, self.game.board) as writer:
+            writer.begin_turn(1, 0)
+            self.game.board.add_tokens(0, 'ratmen', 2)
+        self.assertEqual(self.game.board.changes_since(mark),
+                         [(0, self.game.board.token_code('ratmen'), 2)])
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
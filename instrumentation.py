@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+""" Module implements opt-in counters, timing histograms and profiling
+    of the SW engine hot paths
+
+    enable() swaps the instrumented functions for timed wrappers and
+    disable() puts the originals back, so nothing is checked on the
+    calls of an engine that was never instrumented:
+
+        instrumentation.enable()
+        game.Game(template, players).play(policies)
+        print(instrumentation.export_json())
+        instrumentation.disable()
+
+    Callers reach the instrumented functions through their class or
+    module (scoring.score_boards, not a name imported from scoring), so
+    the swap is seen everywhere.
+"""
+import argparse
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+import board
+import boardspace
+import game
+import scoring
+import sw_exceptions
+
+# (owner, attribute, label) of every instrumented function
+TARGETS = (
+    (boardspace.BoardSpace, 'add_tokens', 'boardspace.add_tokens'),
+    (boardspace.BoardSpace, 'remove_tokens', 'boardspace.remove_tokens'),
+    (boardspace.BoardSpace, 'change_owner', 'boardspace.change_owner'),
+    (board.Board, 'add_tokens', 'board.add_tokens'),
+    (board.Board, 'remove_tokens', 'board.remove_tokens'),
+    (board.Board, 'change_owner', 'board.change_owner'),
+    (board.Board, 'assign_spaces', 'board.assign_spaces'),
+    (board.Board, 'from_spaces', 'board.from_spaces'),
+    (board.Board, 'from_json', 'board.from_json'),
+    (board.Board, 'from_compiled', 'board.from_compiled'),
+    (scoring, 'score_boards', 'scoring.score_boards'),
+    (scoring, 'score_batch', 'scoring.score_batch'),
+)
+
+PROFILERS = ('cprofile', 'tracemalloc')
+
+_originals = {} # label -> (owner, attribute, original)
+_histograms = {}
+
+
+class Histogram:
+    """ Call count and durations of one instrumented function
+    ...
+
+    Durations are counted in power of two nanosecond buckets, bucket b
+    holding the calls that took less than 2**b nanoseconds.
+
+    Attributes:
+    -----------
+
+    count: int
+        Calls recorded
+
+    total: int
+        Nanoseconds spent in all calls
+
+    buckets: dictionary
+        Calls per bucket
+
+    """
+
+    __slots__ = ('count', 'total', 'low', 'high', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.low = None
+        self.high = 0
+        self.buckets = {}
+
+    def record(self, nanoseconds):
+        """Adds one call that took nanoseconds"""
+        self.count += 1
+        self.total += nanoseconds
+        if self.low is None or nanoseconds < self.low:
+            self.low = nanoseconds
+        if nanoseconds > self.high:
+            self.high = nanoseconds
+        bucket = nanoseconds.bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """Returns the upper bound in seconds of the bucket holding the
+        given fraction of calls"""
+        if not self.count:
+            return None
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.count:
+                return min(2 ** bucket, self.high) / 1e9
+
+    def to_dict(self):
+        """Returns the histogram as a json ready dictionary"""
+        return {'count': self.count,
+                'total_seconds': self.total / 1e9,
+                'mean_seconds': self.total / self.count / 1e9
+                                if self.count else None,
+                'min_seconds': self.low / 1e9 if self.count else None,
+                'max_seconds': self.high / 1e9,
+                'p50_seconds': self.percentile(0.5),
+                'p99_seconds': self.percentile(0.99),
+                'buckets_ns': {str(2 ** bucket): calls for bucket, calls
+                               in sorted(self.buckets.items())}}
+
+
+def _timed(function, histogram):
+    """helper function wrapping function to record its calls"""
+    clock = time.perf_counter_ns
+    record = histogram.record
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(clock() - start)
+    return timed
+
+
+def enabled():
+    """Returns True while the engine is instrumented"""
+    return bool(_originals)
+
+
+def enable(labels=None):
+    """Instruments the engine.
+
+    Args:
+        labels: labels of the TARGETS to instrument, all by default
+
+    Histograms kept from an earlier enable() are extended, see reset()."""
+
+    if labels is not None:
+        unknown = set(labels) - {label for _, _, label in TARGETS}
+        if unknown:
+            raise sw_exceptions.InputError('Unknown instrumentation targets: '
+                                           '{}'.format(sorted(unknown)))
+    for owner, attribute, label in TARGETS:
+        if label in _originals or (labels is not None and label not in labels):
+            continue
+        histogram = _histograms.setdefault(label, Histogram())
+        # read the class dictionary so classmethods are rewrapped as such
+        original = vars(owner)[attribute]
+        if isinstance(original, classmethod):
+            wrapped = classmethod(_timed(original.__func__, histogram))
+        else:
+            wrapped = _timed(original, histogram)
+        _originals[label] = (owner, attribute, original)
+        setattr(owner, attribute, wrapped)
+
+
+def disable():
+    """Restores the original functions; the histograms are kept"""
+    for owner, attribute, original in _originals.values():
+        setattr(owner, attribute, original)
+    _originals.clear()
+
+
+def reset():
+    """Forgets every recorded call"""
+    for label in list(_histograms):
+        if label in _originals:
+            _histograms[label].__init__()
+        else:
+            del _histograms[label]
+
+
+@contextlib.contextmanager
+def instrumented(labels=None):
+    """Context manager instrumenting the engine for its body"""
+    enable(labels)
+    try:
+        yield
+    finally:
+        disable()
+
+
+def stats():
+    """Returns {label: Histogram.to_dict()} of every function called
+    while instrumented"""
+    return {label: histogram.to_dict()
+            for label, histogram in sorted(_histograms.items())
+            if histogram.count}
+
+
+def export_json(path=None):
+    """Returns the stats() as json, also written to path if given"""
+    text = json.dumps(stats(), indent=4)
+    if path is not None:
+        with open(path, 'w') as outfile:
+            outfile.write(text)
+    return text
+
+
+class Profile:
+    """ Result of a profile() block
+    ...
+
+    Attributes:
+    -----------
+
+    kind: str
+        One of PROFILERS
+
+    seconds: float
+        Wall time of the block
+
+    profiler: cProfile.Profile or None
+        The profiler of a 'cprofile' block
+
+    snapshot: tracemalloc.Snapshot or None
+        Allocations at the end of a 'tracemalloc' block
+
+    peak: int
+        Peak traced bytes of a 'tracemalloc' block; before Python 3.9, a
+        block inside already running tracing reports the peak since
+        tracing started
+
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.seconds = None
+        self.profiler = None
+        self.snapshot = None
+        self.peak = None
+
+    def top(self, limit=20):
+        """Returns the heaviest functions (cprofile) or allocation sites
+        (tracemalloc) as json ready dictionaries"""
+        if self.kind == 'tracemalloc':
+            return [{'site': str(stat.traceback), 'bytes': stat.size,
+                     'blocks': stat.count}
+                    for stat in self.snapshot.statistics('lineno')[:limit]]
+
+        profile_stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_, calls, own, total, _) in \
+                profile_stats.stats.items():
+            rows.append({'function': '{}:{}({})'.format(filename, line, name),
+                         'calls': calls, 'own_seconds': own,
+                         'total_seconds': total})
+        rows.sort(key=lambda row: row['total_seconds'], reverse=True)
+        return rows[:limit]
+
+    def to_dict(self, limit=20):
+        """Returns the profile as a json ready dictionary"""
+        return {'kind': self.kind, 'seconds': self.seconds,
+                'peak_bytes': self.peak, 'top': self.top(limit)}
+
+
+@contextlib.contextmanager
+def profile(kind='cprofile'):
+    """Context manager profiling its body with cProfile or tracemalloc.
+
+    Args:
+        kind: one of PROFILERS
+
+    Yields:
+        Profile, filled in when the block ends"""
+
+    if kind not in PROFILERS:
+        raise sw_exceptions.InputError('Invalid profiler: {}'.format(kind))
+    report = Profile(kind)
+    start = time.perf_counter()
+    if kind == 'cprofile':
+        report.profiler = cProfile.Profile()
+        report.profiler.enable()
+    else:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        if hasattr(tracemalloc, 'reset_peak'): # Python 3.9+
+            tracemalloc.reset_peak()
+    try:
+        yield report
+    finally:
+        report.seconds = time.perf_counter() - start
+        if kind == 'cprofile':
+            report.profiler.disable()
+        else:
+            report.snapshot = tracemalloc.take_snapshot()
+            report.peak = tracemalloc.get_traced_memory()[1]
+            if not tracing:
+                tracemalloc.stop()
+
+
+def profile_game(template, players=('player_1', 'player_2'),
+                 policies=('greedy', 'random'), kind='cprofile', seed=0):
+    """Plays one instrumented and profiled game.
+
+    Args:
+        template: board.Board to play on
+        players: player names
+        policies: game.POLICIES names, one per player
+        kind: one of PROFILERS
+        seed: seed of the game
+
+    Returns:
+        {'result', 'profile', 'stats'} json ready dictionary"""
+
+    played = game.Game(template, players, seed=seed)
+    chosen = [game.POLICIES[name] for name in policies]
+    reset()
+    with instrumented(), profile(kind) as report:
+        result = played.play(chosen)
+    return {'result': result, 'profile': report.to_dict(), 'stats': stats()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile one SW game.')
+    parser.add_argument('map_path')
+    parser.add_argument('--kind', choices=PROFILERS, default='cprofile')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='json file receiving the report')
+    args = parser.parse_args(argv)
+
+    report = profile_game(board.Board.load(args.map_path), kind=args.kind,
+                          seed=args.seed)
+    text = json.dumps(report, indent=4)
+    if args.out:
+        with open(args.out, 'w') as outfile:
+            outfile.write(text)
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+import board, boardspace, instrumentation, scoring
+import json, os, tempfile
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestInstrumentation(unittest.TestCase):
+    """Tests timing histograms and profiling hooks"""
+
+    def setUp(self):
+        self.template = board.Board.from_json(MAP_JSON)
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled_engine_is_untouched(self):
+        '''Check that disable() puts back the original functions'''
+        originals = (boardspace.BoardSpace.add_tokens, board.Board.add_tokens,
+                     scoring.score_boards, vars(board.Board)['from_json'])
+        instrumentation.enable()
+        self.assertTrue(instrumentation.enabled())
+        self.assertIsNot(board.Board.add_tokens, originals[1])
+        instrumentation.disable()
+        self.assertFalse(instrumentation.enabled())
+        self.assertEqual((boardspace.BoardSpace.add_tokens,
+                          board.Board.add_tokens, scoring.score_boards,
+                          vars(board.Board)['from_json']), originals)
+
+    def test_counts_calls(self):
+        '''Check one histogram entry per instrumented call'''
+        with instrumentation.instrumented():
+            played = self.template.clone()
+            played.add_tokens(0, 'ratmen', 2)
+            played.remove_tokens(0, 'ratmen', 1)
+            played.change_owner(0, 'ratmen')
+            space = boardspace.BoardSpace(1, 'farm')
+            space.add_tokens('ratmen', 1)
+            board.Board.from_json(MAP_JSON)
+            scoring.score_batch([played], ['ratmen'])
+
+        stats = instrumentation.stats()
+        for label in ('board.add_tokens', 'board.remove_tokens',
+                      'board.change_owner', 'boardspace.add_tokens',
+                      'scoring.score_batch', 'scoring.score_boards'):
+            self.assertEqual(stats[label]['count'], 1, label)
+        self.assertEqual(stats['board.from_json']['count'], 1)
+        self.assertEqual(stats['board.from_spaces']['count'], 1)
+        self.assertNotIn('board.from_compiled', stats)
+        self.assertGreater(stats['board.from_json']['total_seconds'], 0)
+
+        # calls after disable() are not recorded
+        self.template.clone().add_tokens(0, 'ratmen', 1)
+        self.assertEqual(instrumentation.stats()['board.add_tokens']['count'], 1)
+
+    def test_selected_labels(self):
+        '''Check that only the enabled labels are timed'''
+        with instrumentation.instrumented(['board.add_tokens']):
+            played = self.template.clone()
+            played.add_tokens(0, 'ratmen', 2)
+            played.remove_tokens(0, 'ratmen')
+        self.assertEqual(list(instrumentation.stats()), ['board.add_tokens'])
+        self.assertRaises(instrumentation.sw_exceptions.InputError,
+                          instrumentation.enable, ['board.nothing'])
+
+    def test_histogram(self):
+        '''Check power of two buckets and percentiles'''
+        histogram = instrumentation.Histogram()
+        for nanoseconds in (100, 120, 5000, 1000000):
+            histogram.record(nanoseconds)
+        stats = histogram.to_dict()
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(stats['buckets_ns'], {'128': 2, '8192': 1,
+                                               '1048576': 1})
+        self.assertEqual(stats['p50_seconds'], 128 / 1e9)
+        self.assertEqual(stats['max_seconds'], 1e-3)
+
+    def test_export_json(self):
+        '''Check that exported stats round trip through json'''
+        with instrumentation.instrumented():
+            self.template.clone().add_tokens(0, 'ratmen', 1)
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'stats.json')
+            text = instrumentation.export_json(path)
+            with open(path) as infile:
+                self.assertEqual(json.load(infile), json.loads(text))
+
+    def test_profile_game(self):
+        '''Check json ready reports of both profilers'''
+        for kind in instrumentation.PROFILERS:
+            report = instrumentation.profile_game(self.template, kind=kind)
+            json.dumps(report)
+            self.assertTrue(report['profile']['top'])
+            self.assertIn('scoring.score_boards', report['stats'])
+        self.assertFalse(instrumentation.enabled())
+        self.assertGreater(report['profile']['peak_bytes'], 0)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
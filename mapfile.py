@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+""" Module implements the binary precompiled SW map format
+
+    A .swm file is a 16 byte header followed by the columns of a
+    board.Board, each starting on an 8 byte boundary:
+
+        header       magic b'SWMAP\\0', uint16 version, uint32 spaces (n),
+                     uint32 neighbor entries (nnz); little endian
+        space_ids        int32[n]
+        terrain          int8[n]   codes of boardspace.TERRAIN_TYPES
+        symbols          uint8[n]  bit masks of board.SYMBOL_BITS
+        is_edge          bool[n]
+        lost_tribes      bool[n]
+        neighbor_offsets int32[n + 1]
+        neighbor_indices int32[nnz] CSR adjacency by space index
+
+    load_map maps the file read-only and returns views into it, so loading
+    copies nothing and every process mapping a file shares its pages.
+"""
+import collections
+import struct
+
+import numpy as np
+
+import sw_exceptions
+
+MAP_EXTENSION = '.swm'
+MAGIC = b'SWMAP\0'
+VERSION = 1
+
+_HEADER = struct.Struct('<6sHII')
+
+# the columns of a .swm file, in file order
+MapArrays = collections.namedtuple('MapArrays',
+                                   ['space_ids', 'terrain', 'symbols',
+                                    'is_edge', 'lost_tribes',
+                                    'neighbor_offsets', 'neighbor_indices'])
+
+_DTYPES = MapArrays(np.dtype('<i4'), np.dtype('i1'), np.dtype('u1'),
+                    np.dtype('?'), np.dtype('?'),
+                    np.dtype('<i4'), np.dtype('<i4'))
+
+
+def _layout(n_spaces, n_neighbors):
+    """helper function returning (offset, length) of every column"""
+    lengths = MapArrays(n_spaces, n_spaces, n_spaces, n_spaces, n_spaces,
+                        n_spaces + 1, n_neighbors)
+    layout, offset = [], _HEADER.size
+    for dtype, length in zip(_DTYPES, lengths):
+        offset = (offset + 7) & ~7
+        layout.append((offset, length))
+        offset += dtype.itemsize * length
+    return MapArrays(*layout), offset
+
+
+def write_map(path, arrays):
+    """Writes map columns to a .swm file.
+
+    Args:
+        path: output file, should end with MAP_EXTENSION
+        arrays: MapArrays (or any sequence in its order) of the columns"""
+
+    arrays = MapArrays(*(np.ascontiguousarray(column, dtype=dtype)
+                         for column, dtype in zip(arrays, _DTYPES)))
+    layout, size = _layout(len(arrays.space_ids), len(arrays.neighbor_indices))
+
+    with open(path, 'wb') as outfile:
+        outfile.write(_HEADER.pack(MAGIC, VERSION, len(arrays.space_ids),
+                                   len(arrays.neighbor_indices)))
+        for column, (offset, _) in zip(arrays, layout):
+            outfile.write(b'\0' * (offset - outfile.tell()))
+            outfile.write(column.tobytes())
+        outfile.write(b'\0' * (size - outfile.tell()))
+
+
+def save_board(board, path):
+    """Writes the map of a board.Board to a .swm file"""
+    write_map(path, MapArrays(*(getattr(board, name)
+                                for name in MapArrays._fields)))
+
+
+def load_map(path):
+    """Maps a .swm file read-only.
+
+    Args:
+        path: file written by write_map
+
+    Returns:
+        MapArrays of read-only arrays viewing the mapped file"""
+
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(mapped) < _HEADER.size:
+        raise sw_exceptions.InputError('{} is not a SW map file.'.format(path))
+
+    magic, version, n_spaces, n_neighbors = _HEADER.unpack(
+        mapped[:_HEADER.size].tobytes())
+    if magic != MAGIC:
+        raise sw_exceptions.InputError('{} is not a SW map file.'.format(path))
+    if version != VERSION:
+        raise sw_exceptions.InputError('Unsupported SW map version: '
+                                       '{}'.format(version))
+
+    layout, size = _layout(n_spaces, n_neighbors)
+    if len(mapped) < size:
+        raise sw_exceptions.InputError('{} is truncated.'.format(path))
+
+    return MapArrays(*(mapped[offset:offset + dtype.itemsize * length].view(dtype)
+                       for dtype, (offset, length) in zip(_DTYPES, layout)))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+import board, mapfile, sw_exceptions
+import os, tempfile
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestMapFile(unittest.TestCase):
+    """Tests writing and mapping binary maps"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.swm = os.path.join(self.tmp.name, 'map.swm')
+        self.board = board.Board.from_json(MAP_JSON)
+        mapfile.save_board(self.board, self.swm)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        arrays = mapfile.load_map(self.swm)
+        for name in mapfile.MapArrays._fields:
+            np.testing.assert_array_equal(getattr(arrays, name),
+                                          getattr(self.board, name))
+
+    def test_zero_copy(self):
+        '''Check that the loaded board views the mapped file'''
+        loaded = board.Board.from_compiled(self.swm)
+        self.assertIsInstance(loaded.neighbor_indices.base, np.memmap)
+        self.assertFalse(loaded.terrain.flags.writeable)
+
+    def test_loaded_board_plays(self):
+        loaded = board.Board.from_compiled(self.swm)
+        self.assertEqual(loaded.space(4).tokens, {'lost_tribes': 2})
+        loaded.change_owner(0, 'ratmen')
+        self.assertEqual(loaded.frontier_mask('ratmen'),
+                         self.board.neighbor_mask(0))
+
+    def test_bad_magic(self):
+        with open(self.swm, 'r+b') as outfile:
+            outfile.write(b'NOTMAP')
+        with self.assertRaises(sw_exceptions.InputError):
+            mapfile.load_map(self.swm)
+
+    def test_truncated(self):
+        with open(self.swm, 'r+b') as outfile:
+            outfile.truncate(40)
+        with self.assertRaises(sw_exceptions.InputError):
+            mapfile.load_map(self.swm)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
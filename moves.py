@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+""" Module implements lazy legal move generation for SW turns
+
+    Moves refer to spaces by board index:
+
+        Conquer(space, tokens)  attack space with tokens; fewer tokens than
+                                the conquest cost means a final attempt with
+                                the reinforcement die
+        Abandon(space)          take every token back from an owned space
+        Redeploy(placements)    put every token in hand on owned spaces,
+                                placements is a tuple of (space, tokens)
+        Decline()               put the race in decline
+
+    generate_moves yields them one at a time, so a search taking the first
+    few moves never builds the redeploy combinations, whose number grows
+    with tokens times spaces. Only the kinds the phase of the turn allows
+    are generated, see game.MOVE_PHASES.
+"""
+import collections
+
+import numpy as np
+
+import board
+import conquest
+import sw_exceptions
+
+Conquer = collections.namedtuple('Conquer', ['space', 'tokens'])
+Abandon = collections.namedtuple('Abandon', ['space'])
+Redeploy = collections.namedtuple('Redeploy', ['placements'])
+Decline = collections.namedtuple('Decline', [])
+
+MOVE_KINDS = ('conquer', 'redeploy', 'abandon', 'decline')
+
+
+def conquer_moves(game, player, heuristic=None):
+    """Yields a Conquer for every space player may attack, cheapest first
+    unless a heuristic orders them"""
+
+    hand = game.hands[player]
+    if hand < 1:
+        return
+    indices, costs = conquest.conquest_costs(game.board, player)
+    moves = [Conquer(int(indices[k]), int(min(costs[k], hand)))
+             for k in np.argsort(costs, kind='stable').tolist()]
+    if heuristic is not None:
+        moves.sort(key=lambda move: heuristic(game, player, move), reverse=True)
+    yield from moves
+
+
+def abandon_moves(game, player, heuristic=None):
+    """Yields an Abandon for every space player owns"""
+    moves = [Abandon(index) for index in
+             board.mask_to_indices(game.board.owned_mask(player)).tolist()]
+    if heuristic is not None:
+        moves.sort(key=lambda move: heuristic(game, player, move), reverse=True)
+    yield from moves
+
+
+def _placements(tokens, spaces):
+    """helper function yielding every way to put tokens on spaces, with as
+    many tokens as possible on the first spaces first"""
+    first, rest = spaces[0], spaces[1:]
+    if not rest:
+        yield ((first, tokens),)
+        return
+    for count in range(tokens, -1, -1):
+        head = ((first, count),) if count else ()
+        if count == tokens:
+            yield head
+            continue
+        for tail in _placements(tokens - count, rest):
+            yield head + tail
+
+
+def redeploy_moves(game, player, heuristic=None):
+    """Yields a Redeploy for every way to place the tokens in hand.
+
+    Spaces are filled in heuristic order of Redeploy(((space, hand),)),
+    so the first moves put the tokens where the heuristic likes them."""
+
+    hand = game.hands[player]
+    spaces = board.mask_to_indices(game.board.owned_mask(player)).tolist()
+    if hand < 1 or not spaces:
+        return
+    if heuristic is not None:
+        spaces.sort(key=lambda space: heuristic(
+            game, player, Redeploy(((space, hand),))), reverse=True)
+    for placements in _placements(hand, spaces):
+        yield Redeploy(placements)
+
+
+def decline_moves(game, player, heuristic=None):
+    """Yields Decline if player has a race on the board to decline"""
+    if game.board.owned_mask(player):
+        yield Decline()
+
+
+_GENERATORS = {'conquer': conquer_moves,
+               'redeploy': redeploy_moves,
+               'abandon': abandon_moves,
+               'decline': decline_moves}
+
+_KINDS = {Conquer: 'conquer', Redeploy: 'redeploy', Abandon: 'abandon',
+          Decline: 'decline'}
+
+
+def generate_moves(game, player, heuristic=None, prune=None, cutoff=None,
+                   kinds=MOVE_KINDS):
+    """Lazily yields the legal moves of player.
+
+    Args:
+        game: game.Game
+        player: name of the player to move
+        heuristic: optional heuristic(game, player, move) -> number;
+                   moves of each kind are yielded best first
+        prune: optional prune(game, player, move) -> bool; moves for
+               which it returns True are skipped
+        cutoff: optional cutoff(game, player, move) -> bool; checked for
+                every yielded move, True ends the enumeration
+        kinds: the move kinds to generate, in order, see MOVE_KINDS
+
+    Yields:
+        Conquer, Redeploy, Abandon and Decline moves"""
+
+    for kind in kinds:
+        if not game.allows(kind):
+            continue
+        for move in _GENERATORS[kind](game, player, heuristic):
+            if prune is not None and prune(game, player, move):
+                continue
+            yield move
+            if cutoff is not None and cutoff(game, player, move):
+                return
+
+
+def check_move(game, player, move):
+    """Raises InputError unless generate_moves would yield move for
+    player, without enumerating the moves"""
+
+    kind = _KINDS.get(type(move))
+    if kind is None:
+        raise sw_exceptions.InputError('Unknown move: {}'.format(move))
+    if not game.allows(kind):
+        raise sw_exceptions.InputError('No {} moves in the {} phase of the '
+                                       'turn'.format(kind, game.phase))
+
+    hand = game.hands[player]
+    owned = game.board.owned_mask(player)
+    space_id = lambda index: int(game.board.space_ids[index])
+    if isinstance(move, Conquer):
+        if hand < 1 or not game.board.conquerable_mask(player) >> move.space & 1:
+            raise sw_exceptions.InputError('{} cannot attack space '
+                                           '{}'.format(player, space_id(move.space)))
+        tokens = min(game.conquest_cost(move.space), hand)
+        if move.tokens != tokens:
+            raise sw_exceptions.InputError('Attacking space {} takes {} '
+                                           'tokens'.format(space_id(move.space),
+                                                           tokens))
+    elif isinstance(move, Redeploy):
+        spaces = [space for space, _ in move.placements]
+        if (hand < 1 or len(set(spaces)) != len(spaces)
+                or any(count < 1 or not owned >> space & 1
+                       for space, count in move.placements)
+                or sum(count for _, count in move.placements) != hand):
+            raise sw_exceptions.InputError('Redeploy must place all {} tokens in '
+                                           'hand on distinct spaces of '
+                                           '{}'.format(hand, player))
+    elif isinstance(move, Abandon):
+        if not owned >> move.space & 1:
+            raise sw_exceptions.InputError('{} does not own space '
+                                           '{}'.format(player, space_id(move.space)))
+    elif isinstance(move, Decline):
+        if not owned:
+            raise sw_exceptions.InputError('{} has no race on the board to '
+                                           'decline'.format(player))
+
+
+def to_dict(move, game_board):
+    """Returns move as a json ready dictionary naming spaces by map id"""
+    space_id = lambda index: int(game_board.space_ids[index])
+    if isinstance(move, Conquer):
+        return {'kind': 'conquer', 'space': space_id(move.space),
+                'tokens': move.tokens}
+    if isinstance(move, Redeploy):
+        return {'kind': 'redeploy',
+                'placements': [[space_id(index), count]
+                               for index, count in move.placements]}
+    if isinstance(move, Abandon):
+        return {'kind': 'abandon', 'space': space_id(move.space)}
+    return {'kind': 'decline'}
+
+
+def from_dict(data, game_board):
+    """Returns the move described by a to_dict dictionary; raises
+    InputError for anything else"""
+
+    if not isinstance(data, dict):
+        raise sw_exceptions.InputError('Moves must be objects, not '
+                                       '{!r}'.format(data))
+    kind = data.get('kind')
+    try:
+        if kind == 'conquer':
+            return Conquer(game_board.index_of(data['space']),
+                           int(data['tokens']))
+        if kind == 'redeploy':
+            return Redeploy(tuple((game_board.index_of(space_id), int(count))
+                                  for space_id, count in data['placements']))
+        if kind == 'abandon':
+            return Abandon(game_board.index_of(data['space']))
+    except (KeyError, TypeError, ValueError):
+        raise sw_exceptions.InputError('Invalid {} move: {!r}'.format(
+            kind, data)) from None
+    if kind == 'decline':
+        return Decline()
+    raise sw_exceptions.InputError('Unknown move kind: {}'.format(kind))
+
+
+def symbol_heuristic(game, player, move):
+    """Prefers cheap conquests of spaces with symbols and redeploying to
+    spaces on the border"""
+
+    if isinstance(move, Conquer):
+        cost = game.conquest_cost(move.space)
+        return 2 * bool(game.board.symbols[move.space]) - cost
+    if isinstance(move, Redeploy):
+        return sum(count * bin(game.board.neighbor_mask(space)
+                               & ~game.board.owned_mask(player)).count('1')
+                   for space, count in move.placements)
+    return 0
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+import board, game, moves, sw_exceptions
+import itertools, os
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestMoves_Generate(unittest.TestCase):
+    """Tests lazy move generation"""
+
+    def setUp(self):
+        self.game = game.Game(board.Board.from_json(MAP_JSON),
+                              ['ratmen', 'giants'], seed=1)
+        self.board = self.game.board
+
+    def test_entry_conquests(self):
+        '''Check that a new race may only enter on edges, cheapest first'''
+        conquests = list(moves.generate_moves(self.game, 'ratmen',
+                                              kinds=('conquer',)))
+        space_ids = [int(self.board.space_ids[move.space]) for move in conquests]
+        self.assertNotIn(7, space_ids)
+        self.assertNotIn(1, space_ids)
+        self.assertEqual(conquests[0].tokens, 2)
+        self.assertEqual(list(moves.generate_moves(self.game, 'ratmen',
+                                                   kinds=('decline',))), [])
+
+    def test_adjacent_conquests(self):
+        self.game.conquer('ratmen', self.board.index_of(2))
+        conquests = moves.generate_moves(self.game, 'ratmen', kinds=('conquer',))
+        self.assertEqual(sorted(int(self.board.space_ids[move.space])
+                                for move in conquests), [3, 7])
+
+    def test_redeploy_is_lazy(self):
+        '''Check that taking a few redeploys does not build them all'''
+        for space_id in (2, 3, 5, 9, 10):
+            self.game.conquer('ratmen', self.board.index_of(space_id), 1)
+        self.game.hands['ratmen'] = 60
+        redeploys = moves.redeploy_moves(self.game, 'ratmen')
+        first = list(itertools.islice(redeploys, 3))
+        self.assertEqual(first[0].placements, ((first[0].placements[0][0], 60),))
+        for move in first:
+            self.assertEqual(sum(count for _, count in move.placements), 60)
+
+    def test_redeploy_count(self):
+        for space_id in (2, 3, 5):
+            self.game.conquer('ratmen', self.board.index_of(space_id), 1)
+        self.game.hands['ratmen'] = 4
+        self.assertEqual(len(list(moves.redeploy_moves(self.game, 'ratmen'))),
+                         15) # 4 tokens over 3 spaces
+
+    def test_prune_and_cutoff(self):
+        prune = lambda game, player, move: move.tokens > 2
+        cutoff = lambda game, player, move: True
+        generated = list(moves.generate_moves(self.game, 'ratmen', prune=prune,
+                                              kinds=('conquer',)))
+        self.assertTrue(all(move.tokens == 2 for move in generated))
+        self.assertEqual(len(list(moves.generate_moves(self.game, 'ratmen',
+                                                       cutoff=cutoff))), 1)
+
+    def test_heuristic_order(self):
+        first = next(moves.generate_moves(self.game, 'ratmen',
+                                          heuristic=moves.symbol_heuristic))
+        self.assertTrue(self.board.symbols[first.space])
+        self.assertEqual(first.tokens, 2)
+
+    def test_check_move(self):
+        '''Check that exactly the generated moves pass check_move'''
+        for move in moves.generate_moves(self.game, 'ratmen'):
+            moves.check_move(self.game, 'ratmen', move)
+        edge = next(moves.conquer_moves(self.game, 'ratmen'))
+        for move in (moves.Conquer(self.board.index_of(7), 3),
+                     edge._replace(tokens=edge.tokens + 1),
+                     moves.Abandon(edge.space), moves.Decline(),
+                     moves.Redeploy(((edge.space, 10),))):
+            with self.assertRaises(sw_exceptions.InputError):
+                moves.check_move(self.game, 'ratmen', move)
+
+        self.game.conquer('ratmen', edge.space, edge.tokens)
+        for move in (moves.Redeploy(((edge.space, 9), (edge.space, -1))),
+                     moves.Redeploy(((edge.space, 0),)),
+                     moves.Abandon(edge.space), moves.Decline()):
+            with self.assertRaises(sw_exceptions.InputError):
+                moves.check_move(self.game, 'ratmen', move)
+        moves.check_move(self.game, 'ratmen', next(moves.redeploy_moves(
+            self.game, 'ratmen')))
+
+    def test_turn_phases(self):
+        '''Check that conquests close abandon and decline, and the
+        reinforcement attempt closes conquests'''
+        edge = next(moves.conquer_moves(self.game, 'ratmen'))
+        self.game.conquer('ratmen', edge.space, edge.tokens)
+        kinds = {type(move) for move in moves.generate_moves(self.game, 'ratmen')}
+        self.assertEqual(kinds, {moves.Conquer, moves.Redeploy})
+
+        target = next(moves.conquer_moves(self.game, 'ratmen')).space
+        self.game.reinforce('ratmen', target)
+        self.assertFalse(any(isinstance(move, moves.Conquer) for move in
+                             moves.generate_moves(self.game, 'ratmen')))
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.reinforce('ratmen', target)
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.abandon('ratmen', edge.space)
+
+        self.game.end_turn()
+        self.assertTrue(self.game.allows('decline'))
+
+    def test_from_dict(self):
+        '''Check that malformed move dictionaries raise InputError'''
+        for data in ([1], {'kind': 'abandon'}, {'kind': 'conquer', 'space': 2},
+                     {'kind': 'redeploy', 'placements': [[2]]}):
+            with self.assertRaises(sw_exceptions.InputError):
+                moves.from_dict(data, self.board)
+
+class TestMoves_Apply(unittest.TestCase):
+    """Tests playing generated moves"""
+
+    def setUp(self):
+        self.game = game.Game(board.Board.from_json(MAP_JSON),
+                              ['ratmen', 'giants'], seed=1)
+        self.board = self.game.board
+        self.game.apply('ratmen', moves.Conquer(self.board.index_of(2), 3))
+
+    def next_turn(self):
+        '''ends the turn of ratmen and of giants and begins the next one'''
+        self.game.end_turn()
+        self.game.end_turn()
+        self.game.begin_turn()
+
+    def test_abandon(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.apply('ratmen', moves.Abandon(self.board.index_of(2)))
+        self.next_turn()
+        self.game.apply('ratmen', moves.Abandon(self.board.index_of(2)))
+        self.assertEqual(self.game.hands['ratmen'], 10)
+        self.assertIsNone(self.board.owner_of(self.board.index_of(2)))
+
+    def test_redeploy(self):
+        move = next(moves.redeploy_moves(self.game, 'ratmen'))
+        self.game.apply('ratmen', move)
+        self.assertEqual(self.board.space(2).tokens, {'ratmen': 10})
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.deploy('ratmen', ((self.board.index_of(2), 1),))
+
+    def test_redeploy_counts(self):
+        '''Check that a bad placement changes nothing'''
+        before = self.board.tokens.copy()
+        hand = self.game.hands['ratmen']
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.deploy('ratmen', ((self.board.index_of(2), hand + 3),
+                                        (self.board.index_of(2), -3)))
+        self.assertTrue((self.board.tokens == before).all())
+        self.assertEqual(self.game.hands['ratmen'], hand)
+
+    def test_decline(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.apply('ratmen', moves.Decline())
+        self.next_turn()
+        self.assertEqual(self.game.apply('ratmen', moves.Decline()), 1)
+        self.assertEqual(self.game.current_player, 'giants')
+        space = self.board.space(2)
+        self.assertEqual(space.owner, 'ratmen_declined')
+        self.assertEqual(space.tokens, {'ratmen_declined': 1})
+        self.assertEqual(self.game.hands['ratmen'], game.START_TOKENS)
+        self.assertEqual(self.game.score('ratmen'), 1)
+
+    def test_decline_needs_a_race(self):
+        '''Check that only a player with spaces to decline may decline'''
+        self.game.end_turn()
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.decline('giants')
+        with self.assertRaises(sw_exceptions.InputError):
+            self.game.decline('ratmen') # not the turn of ratmen
+        self.assertEqual(self.game.hands['giants'], game.START_TOKENS)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
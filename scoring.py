@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+""" Module implements vectorized victory coin scoring of SW boards """
+import numpy as np
+
+import boardspace
+import sw_exceptions
+
+# coins a race earns per owned space of a symbol or terrain, on top of
+# the one coin every owned space is worth
+RACE_BONUSES = {
+    'dwarves': {'mine': 1},
+    'wizards': {'magic': 1},
+    'humans': {'farm': 1},
+}
+
+
+def bonus_tables(bonuses):
+    """Converts per-player bonus dictionaries to bonus arrays.
+
+    Args:
+        bonuses: list with one {symbol or terrain: coins} dictionary (or
+                 None) per player
+
+    Returns:
+        (symbol_bonus, terrain_bonus) integer arrays of shape
+        (players, len(MAP_SYMBOLS)) and (players, len(TERRAIN_TYPES))"""
+
+    symbol_bonus = np.zeros((len(bonuses), len(boardspace.MAP_SYMBOLS)),
+                            dtype=np.int32)
+    terrain_bonus = np.zeros((len(bonuses), len(boardspace.TERRAIN_TYPES)),
+                             dtype=np.int32)
+
+    for player, bonus in enumerate(bonuses):
+        for name, coins in (bonus or {}).items():
+            if name in boardspace.MAP_SYMBOLS:
+                symbol_bonus[player, boardspace.MAP_SYMBOLS.index(name)] = coins
+            elif name in boardspace.TERRAIN_TYPES:
+                terrain_bonus[player, boardspace.TERRAIN_TYPES.index(name)] = coins
+            else:
+                raise sw_exceptions.InputError('Invalid bonus: {}'.format(name))
+
+    return symbol_bonus, terrain_bonus
+
+
+def score_boards(owner, terrain, symbols, n_players,
+                 symbol_bonus=None, terrain_bonus=None):
+    """Scores a batch of boards in one vectorized pass.
+
+    Every space owned by a player is worth one coin, plus the player's
+    bonus for each symbol on it and for its terrain.
+
+    Args:
+        owner: integer array (boards, spaces) of player numbers
+               0 .. n_players - 1; any other value scores nothing
+        terrain: terrain codes, shape (spaces,) or (boards, spaces)
+        symbols: symbol bit masks, shape (spaces,) or (boards, spaces)
+        n_players: number of players
+        symbol_bonus, terrain_bonus: optional arrays from bonus_tables
+
+    Returns:
+        integer array (boards, n_players) of coins"""
+
+    owner = np.asarray(owner)
+    if owner.ndim == 1:
+        owner = owner[np.newaxis]
+    n_boards = owner.shape[0]
+
+    scoring = (owner >= 0) & (owner < n_players)
+    player = np.where(scoring, owner, 0) # safe index for the bonus gathers
+    slots = (np.arange(n_boards)[:, np.newaxis] * n_players + player)[scoring]
+
+    coins = np.ones(owner.shape, dtype=np.int64)
+    if symbol_bonus is not None:
+        bits = (np.asarray(symbols)[..., np.newaxis]
+                >> np.arange(symbol_bonus.shape[1])) & 1
+        coins = coins + (bits * symbol_bonus[player]).sum(axis=-1)
+    if terrain_bonus is not None:
+        coins = coins + terrain_bonus[player, np.broadcast_to(terrain, owner.shape)]
+
+    totals = np.bincount(slots, weights=coins[scoring],
+                         minlength=n_boards * n_players)
+    return totals.astype(np.int64).reshape(n_boards, n_players)
+
+
+def player_lookup(owners, players):
+    """Returns the player number of every owner code, for indexing with
+    owner arrays.
+
+    Args:
+        owners: names behind the owner codes of a board
+        players: list of owner names, their position is the player number
+
+    Returns:
+        int16 array of len(owners) + 1 entries, -1 for owners that are
+        not players; the extra last entry makes NO_OWNER (-1) look up -1"""
+
+    lookup = np.full(len(owners) + 1, -1, dtype=np.int16)
+    for player, name in enumerate(players):
+        if name in owners:
+            lookup[owners.index(name)] = player
+    return lookup
+
+
+def stack_boards(boards, players):
+    """Stacks the owners of boards of one map for score_boards.
+
+    Args:
+        boards: list of board.Board of the same map
+        players: list of owner names, their position is the player number
+
+    Returns:
+        (owner, terrain, symbols) with owner of shape (boards, spaces)"""
+
+    first = boards[0]
+    owner = np.empty((len(boards), len(first)), dtype=np.int16)
+
+    for row, board in enumerate(boards):
+        if board.terrain is not first.terrain and (
+                len(board) != len(first)
+                or not np.array_equal(board.terrain, first.terrain)):
+            raise sw_exceptions.InputError('Boards must share one map.')
+
+        owner[row] = player_lookup(board.owners, players)[board.owner]
+
+    return owner, first.terrain, first.symbols
+
+
+def score_batch(boards, players, bonuses=None):
+    """Scores boards of one map for players.
+
+    Args:
+        boards: list of board.Board
+        players: list of owner names
+        bonuses: optional list of {symbol or terrain: coins} per player
+
+    Returns:
+        integer array (boards, players) of coins"""
+
+    owner, terrain, symbols = stack_boards(boards, players)
+    symbol_bonus, terrain_bonus = bonus_tables(bonuses or [None] * len(players))
+    return score_boards(owner, terrain, symbols, len(players),
+                        symbol_bonus, terrain_bonus)
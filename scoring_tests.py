@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import board, scoring, sw_exceptions
+import os
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestScoring_Batch(unittest.TestCase):
+    """Tests scoring boards of map_2_player.json"""
+
+    def setUp(self):
+        self.board = board.Board.from_json(MAP_JSON)
+        # space 2: farm + magic, 3: swamp + mine, 6: mountain + cavern + mine
+        for space_id in (2, 3):
+            self.board.change_owner(self.board.index_of(space_id), 'dwarves')
+        self.board.change_owner(self.board.index_of(6), 'wizards')
+
+    def test_one_coin_per_space(self):
+        coins = scoring.score_batch([self.board], ['dwarves', 'wizards'])
+        self.assertEqual(coins.tolist(), [[2, 1]])
+
+    def test_race_bonuses(self):
+        coins = scoring.score_batch([self.board], ['dwarves', 'wizards'],
+                                    [{'mine': 1, 'farm': 2},
+                                     scoring.RACE_BONUSES['wizards']])
+        self.assertEqual(coins.tolist(), [[5, 1]])
+
+    def test_batch(self):
+        child = self.board.clone()
+        child.change_owner(child.index_of(2), 'wizards')
+        coins = scoring.score_batch([self.board, child, self.board],
+                                    ['wizards', 'dwarves'])
+        self.assertEqual(coins.tolist(), [[1, 2], [2, 1], [1, 2]])
+
+    def test_player_lookup(self):
+        '''Check the player number of every owner code, and of NO_OWNER'''
+        lookup = scoring.player_lookup(self.board.owners, ['wizards', 'elves'])
+        self.assertEqual(lookup[self.board.owner_code('wizards')], 0)
+        self.assertEqual(lookup[self.board.owner_code('dwarves')], -1)
+        self.assertEqual(lookup[board.NO_OWNER], -1)
+
+    def test_lost_tribes_do_not_score(self):
+        coins = scoring.score_batch([self.board], ['lost_tribes', 'dwarves'])
+        self.assertEqual(coins[0, 1], 2)
+
+    def test_bad_bonus(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            scoring.bonus_tables([{'gold': 1}])
+
+    def test_matches_loop(self):
+        '''Check the vectorized scores against a per-space loop'''
+        rng = np.random.default_rng(3)
+        owner = rng.integers(-1, 3, size=(50, len(self.board)))
+        bonuses = [{'mine': 1}, {'magic': 2, 'swamp': 1}, None]
+        symbol_bonus, terrain_bonus = scoring.bonus_tables(bonuses)
+        coins = scoring.score_boards(owner, self.board.terrain,
+                                     self.board.symbols, 3,
+                                     symbol_bonus, terrain_bonus)
+        for row in range(50):
+            expected = [0, 0, 0]
+            for index, player in enumerate(owner[row]):
+                if player < 0:
+                    continue
+                space = self.board.space(int(self.board.space_ids[index]))
+                expected[player] += 1 + sum((bonuses[player] or {}).get(name, 0)
+                                            for name in space.symbols + [space.terrain])
+            self.assertEqual(coins[row].tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+""" Module implements a parallel Monte Carlo self-play runner for SW
+
+    Usage: python selfplay.py map.json --games 1000 --out games.jsonl
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import board
+import game
+
+# the template board of this process; loaded once in the parent and
+# inherited by forked workers, or loaded once per worker otherwise
+_BOARD = None
+
+
+def resolve_policy(name):
+    """Returns the policy registered as name in game.POLICIES, or the
+    callable named by a 'module:function' path"""
+
+    if name in game.POLICIES:
+        return game.POLICIES[name]
+    module, _, attribute = name.partition(':')
+    if not attribute:
+        raise ValueError('Unknown policy: {}'.format(name))
+    return getattr(importlib.import_module(module), attribute)
+
+
+def pool_context():
+    """Returns the fork multiprocessing context where there is one, so
+    workers inherit the loaded template, else the default context"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _init_worker(map_json):
+    """helper function loading the board in a worker unless inherited"""
+    global _BOARD
+    if _BOARD is None:
+        _BOARD = board.Board.load(map_json)
+
+
+def _play_game(task):
+    """helper function playing one game in a worker"""
+    number, seed, players, policies, turns = task
+    played = game.Game(_BOARD, players, turns=turns, seed=seed)
+    result = played.play([resolve_policy(policy) for policy in policies])
+    result['game'] = number
+    result['seed'] = seed
+    return result
+
+
+def run(map_json, games, policies=('greedy', 'random'), out_jsonl=None,
+        processes=None, seed=0, turns=game.TURNS):
+    """Plays games of self-play on a process pool.
+
+    Args:
+        map_json: json or binary map written by gameboard_csv_to_json
+        games: number of games to play
+        policies: one policy name per player, see resolve_policy
+        out_jsonl: optional file receiving one json result per line, in
+                   the order games finish
+        processes: worker processes, every core by default
+        seed: seed of the first game; game k uses seed + k
+        turns: turns per game
+
+    Returns:
+        dictionary with games, seconds, processes, games_per_second
+        and games_per_second_per_core"""
+
+    global _BOARD
+    _BOARD = board.Board.load(map_json)
+    for policy in policies:
+        resolve_policy(policy) # fail here rather than in every worker
+
+    processes = processes or os.cpu_count()
+    players = ['player_{}'.format(number + 1) for number in range(len(policies))]
+    tasks = ((number, seed + number, players, tuple(policies), turns)
+             for number in range(games))
+
+    context = pool_context()
+    outfile = open(out_jsonl, 'w') if out_jsonl else None
+    start = time.perf_counter()
+    try:
+        with context.Pool(processes, _init_worker, (map_json,)) as pool:
+            chunksize = max(1, games // (processes * 8))
+            for result in pool.imap_unordered(_play_game, tasks, chunksize):
+                if outfile is not None:
+                    outfile.write(json.dumps(result) + '\n')
+    finally:
+        if outfile is not None:
+            outfile.close()
+    seconds = time.perf_counter() - start
+
+    return {'games': games,
+            'seconds': seconds,
+            'processes': processes,
+            'games_per_second': games / seconds,
+            'games_per_second_per_core': games / seconds / processes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parallel SW self-play.')
+    parser.add_argument('map_json')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--policies', nargs='+', default=['greedy', 'random'],
+                        help='one policy per player: ' + ', '.join(game.POLICIES)
+                        + ' or module:function')
+    parser.add_argument('--out', dest='out_jsonl')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--turns', type=int, default=game.TURNS)
+    args = parser.parse_args(argv)
+
+    report = run(args.map_json, args.games, args.policies, args.out_jsonl,
+                 args.processes, args.seed, args.turns)
+    print(json.dumps(report, indent=4))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+""" Module implements an asyncio host for many concurrent SW matches
+
+    Clients send one json request per line and receive one json response
+    per line, over TCP or stdin/stdout:
+
+        {"id": 1, "op": "new_match", "players": ["ratmen", "giants"]}
+        {"id": 1, "ok": true, "match": "1"}
+
+    Requests carry an optional "id" echoed in the response, since
+    responses are written as requests finish. Operations:
+
+        new_match   players, turns, seed      -> match
+        state       match                     -> turn, player, hands, coins,
+                                                 owners, finished
+        moves       match, limit              -> legal moves of the player
+        move        match, move               -> plays a legal moves.to_dict
+                                                 move; decline ends the turn
+        end_turn    match                     -> coins earned
+        ai_turn     match, policy             -> plays the turn with a policy
+                                                 named in game.POLICIES
+        close       match
+        stats                                 -> matches and latencies
+
+    Usage: python server.py map.json [--port 7777 | --stdio]
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import sys
+import time
+
+import board
+import game
+import moves
+import sw_exceptions
+
+
+class Match:
+    """ One hosted game and the lock ordering its requests """
+
+    def __init__(self, played):
+        self.game = played
+        self.lock = asyncio.Lock()
+        self.started = False # True once the turn of the player to move began
+
+    def begin(self):
+        """Begins the turn of the player to move, once"""
+        if not self.started and not self.game.finished:
+            self.game.begin_turn()
+            self.started = True
+
+
+class MatchHost:
+    """ Runs many matches on one event loop
+    ...
+
+    Every match plays on a copy on write clone of one template board
+    with its own owner and token vocabulary, so a match costs its owner
+    and token arrays and the names of its players. Whole AI turns run in an
+    executor; the match lock keeps other requests for that match waiting
+    while the rest of the host keeps serving.
+
+    Attributes:
+    -----------
+
+    matches: dictionary
+        Match of each match id
+
+    latencies: dictionary
+        The last seconds taken by each operation
+
+    """
+
+    def __init__(self, template, executor=None, history=1000):
+        """Initializes the MatchHost
+        Args: template - board.Board every match starts from
+
+              executor - concurrent.futures executor for AI turns, a
+                         thread pool by default
+
+              history - latencies kept per operation
+
+        Output: object of type MatchHost """
+
+        self.template = template
+        self.executor = executor or concurrent.futures.ThreadPoolExecutor()
+        self.matches = {}
+        self.latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=history))
+        self._ids = itertools.count(1)
+
+    def _match(self, request):
+        """helper function returning the match named by a request"""
+        match = self.matches.get(str(request.get('match')))
+        if match is None:
+            raise sw_exceptions.InputError('Unknown match: '
+                                           '{}'.format(request.get('match')))
+        return match
+
+    async def handle(self, request):
+        """Serves one request dictionary and returns the response"""
+        start = time.perf_counter()
+        op = request.get('op')
+        response = {'id': request.get('id')}
+        try:
+            handler = getattr(self, 'op_' + str(op), None)
+            if handler is None:
+                raise sw_exceptions.InputError('Unknown op: {}'.format(op))
+            response.update(await handler(request))
+            response['ok'] = True
+        except Exception as error: # a bad request must not end the serve loop
+            response['ok'] = False
+            response['error'] = (getattr(error, 'msg', None) or str(error)
+                                 or type(error).__name__)
+        self.latencies[op].append(time.perf_counter() - start)
+        return response
+
+    async def handle_line(self, line):
+        """Serves one json line and returns the json response line"""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return json.dumps({'ok': False, 'error': 'Invalid json'})
+        if not isinstance(request, dict):
+            return json.dumps({'ok': False, 'error': 'Requests must be objects'})
+        return json.dumps(await self.handle(request))
+
+    async def op_new_match(self, request):
+        players = request.get('players')
+        turns = request.get('turns', game.TURNS)
+        self._check_players(players)
+        if isinstance(turns, bool) or not isinstance(turns, int) or turns < 1:
+            raise sw_exceptions.InputError('turns must be a positive integer, '
+                                           'not {!r}'.format(turns))
+        played = game.Game(self.template, players, turns=turns,
+                           seed=request.get('seed'))
+        # player names are registered on the match board only, so the
+        # template vocabulary never grows and matches never register
+        # names on a shared list from executor threads
+        played.board.own_vocabulary()
+        match_id = str(next(self._ids))
+        self.matches[match_id] = Match(played)
+        return {'match': match_id}
+
+    async def op_state(self, request):
+        match = self._match(request)
+        async with match.lock:
+            played = match.game
+            owners = {int(space_id): played.board.owner_of(index)
+                      for index, space_id in enumerate(played.board.space_ids)
+                      if played.board.owner[index] != board.NO_OWNER}
+            return {'turn': played.turn,
+                    'player': None if played.finished else played.current_player,
+                    'hands': played.hands,
+                    'coins': played.coins,
+                    'owners': owners,
+                    'finished': played.finished}
+
+    async def op_moves(self, request):
+        match = self._match(request)
+        async with match.lock:
+            self._check_running(match)
+            match.begin()
+            played = match.game
+            legal = moves.generate_moves(played, played.current_player)
+            return {'moves': [moves.to_dict(move, played.board) for move in
+                              itertools.islice(legal, request.get('limit', 20))]}
+
+    async def op_move(self, request):
+        match = self._match(request)
+        async with match.lock:
+            self._check_running(match)
+            match.begin()
+            played = match.game
+            move = moves.from_dict(request['move'], played.board)
+            moves.check_move(played, played.current_player, move)
+            coins = played.apply(played.current_player, move)
+            if isinstance(move, moves.Decline):
+                match.started = False # declining ended the turn
+                return {'hands': played.hands, 'coins': coins}
+            return {'hands': played.hands}
+
+    async def op_end_turn(self, request):
+        match = self._match(request)
+        async with match.lock:
+            self._check_running(match)
+            match.begin()
+            match.started = False
+            return {'coins': match.game.end_turn()}
+
+    async def op_ai_turn(self, request):
+        match = self._match(request)
+        # only the registered policies: clients never name code to run
+        name = request.get('policy', 'greedy')
+        policy = game.POLICIES.get(name) if isinstance(name, str) else None
+        if policy is None:
+            raise sw_exceptions.InputError('Unknown policy: {!r}, choose one of '
+                                           '{}'.format(name, sorted(game.POLICIES)))
+        async with match.lock:
+            self._check_running(match)
+            if match.started:
+                raise sw_exceptions.InputError('The turn already began.')
+            loop = asyncio.get_running_loop()
+            coins = await loop.run_in_executor(self.executor,
+                                               match.game.play_turn, policy)
+            return {'coins': coins}
+
+    async def op_close(self, request):
+        self._match(request)
+        del self.matches[str(request['match'])]
+        return {}
+
+    async def op_stats(self, request):
+        stats = {}
+        for op, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            stats[op] = {'count': len(ordered),
+                         'p50': ordered[len(ordered) // 2],
+                         'p99': ordered[min(len(ordered) - 1,
+                                            len(ordered) * 99 // 100)]}
+        return {'matches': len(self.matches), 'latency': stats}
+
+    def _check_players(self, players):
+        """helper function refusing player lists a match cannot seat: the
+        names must be distinct strings, none of them an owner or token
+        type of the template or the name of a declined race"""
+
+        if (not isinstance(players, list) or not players
+                or not all(isinstance(player, str) and player
+                           for player in players)):
+            raise sw_exceptions.InputError('players must be a non-empty list '
+                                           'of names, not {!r}'.format(players))
+        if len(set(players)) != len(players):
+            raise sw_exceptions.InputError('Player names must be distinct: '
+                                           '{}'.format(players))
+        reserved = set(self.template.owners) | set(self.template.token_types)
+        for player in players:
+            if player in reserved or player.endswith(game.declined_name('')):
+                raise sw_exceptions.InputError('Reserved player name: '
+                                               '{}'.format(player))
+
+    @staticmethod
+    def _check_running(match):
+        """helper function refusing requests on finished matches"""
+        if match.game.finished:
+            raise sw_exceptions.InputError('The match is finished.')
+
+    async def serve_connection(self, reader, writer):
+        """Serves json lines from a stream until it closes.
+
+        Each request runs as its own task, so a slow AI turn does not
+        hold up other matches on the same connection."""
+
+        tasks = set()
+
+        async def respond(line):
+            writer.write((await self.handle_line(line) + '\n').encode())
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def serve_tcp(self, host='127.0.0.1', port=7777):
+        """Starts serving TCP connections; returns the asyncio server"""
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+    async def serve_stdio(self):
+        """Serves json lines from stdin, answering on stdout"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                sys.stdout.write(await self.handle_line(line) + '\n')
+                sys.stdout.flush()
+
+
+async def _main(args):
+    host = MatchHost(board.Board.load(args.map_json))
+    if args.stdio:
+        await host.serve_stdio()
+        return
+    server = await host.serve_tcp(args.host, args.port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Host SW matches.')
+    parser.add_argument('map_json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--stdio', action='store_true',
+                        help='serve stdin/stdout instead of TCP')
+    asyncio.run(_main(parser.parse_args(argv)))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+import board, server
+import asyncio, json, os
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestMatchHost(unittest.IsolatedAsyncioTestCase):
+    """Tests serving requests to the match host"""
+
+    async def asyncSetUp(self):
+        self.host = server.MatchHost(board.Board.from_json(MAP_JSON))
+        response = await self.host.handle({'op': 'new_match', 'seed': 1,
+                                           'players': ['ratmen', 'giants']})
+        self.match = response['match']
+
+    async def request(self, op, **fields):
+        return await self.host.handle(dict(fields, op=op, match=self.match))
+
+    async def test_manual_turn(self):
+        legal = await self.request('moves', limit=3)
+        self.assertTrue(legal['ok'])
+        self.assertEqual(len(legal['moves']), 3)
+        played = await self.request('move', move=legal['moves'][0])
+        self.assertTrue(played['ok'], played)
+        ended = await self.request('end_turn')
+        self.assertEqual(ended['coins'], 1)
+        state = await self.request('state')
+        self.assertEqual(state['player'], 'giants')
+        self.assertEqual(list(state['owners'].values()).count('ratmen'), 1)
+
+    async def test_ai_turn(self):
+        response = await self.request('ai_turn', policy='greedy')
+        self.assertTrue(response['ok'], response)
+        self.assertGreater(response['coins'], 0)
+
+    async def test_errors(self):
+        self.assertFalse((await self.request('fly'))['ok'])
+        self.assertFalse((await self.host.handle({'op': 'state',
+                                                  'match': 'x'}))['ok'])
+        illegal = await self.request('move', move={'kind': 'conquer',
+                                                   'space': 2, 'tokens': 99})
+        self.assertFalse(illegal['ok'])
+        self.assertIn('error', json.loads(await self.host.handle_line(b'{')))
+
+    async def test_illegal_moves(self):
+        '''Check that moves generate_moves would not make are refused'''
+        inland = await self.request('move', move={'kind': 'conquer',
+                                                  'space': 7, 'tokens': 3})
+        self.assertFalse(inland['ok'])
+        declined = await self.request('move', move={'kind': 'decline'})
+        self.assertFalse(declined['ok'])
+        legal = (await self.request('moves', limit=1))['moves'][0]
+        await self.request('move', move=legal)
+        hand = (await self.request('state'))['hands']['ratmen']
+        redeploy = await self.request('move', move={
+            'kind': 'redeploy', 'placements': [[legal['space'], hand + 3],
+                                               [legal['space'], -3]]})
+        self.assertFalse(redeploy['ok'])
+        state = await self.request('state')
+        self.assertEqual(state['hands']['ratmen'], hand)
+
+    async def test_decline_ends_turn(self):
+        '''Check that a decline hands the turn to the next player'''
+        legal = (await self.request('moves', limit=1))['moves'][0]
+        await self.request('move', move=legal)
+        await self.request('end_turn')
+        await self.request('ai_turn')
+        declined = await self.request('move', move={'kind': 'decline'})
+        self.assertTrue(declined['ok'], declined)
+        state = await self.request('state')
+        self.assertEqual((state['turn'], state['player']), (2, 'giants'))
+        self.assertIn('ratmen_declined', state['owners'].values())
+
+    async def test_registered_policies_only(self):
+        '''Check that ai_turn runs no policy outside game.POLICIES'''
+        for policy in ('os:getcwd', 'selfplay:run', ['greedy']):
+            response = await self.request('ai_turn', policy=policy)
+            self.assertFalse(response['ok'], policy)
+        state = await self.request('state')
+        self.assertEqual((state['turn'], state['player']), (1, 'ratmen'))
+
+    async def test_match_config(self):
+        '''Check that bad players and turns are refused'''
+        for config in ({}, {'players': []}, {'players': 'ratmen'},
+                       {'players': ['ratmen', 3]}, {'players': ['ratmen', '']},
+                       {'players': ['ratmen', 'ratmen']},
+                       {'players': ['ratmen', 'lost_tribes']},
+                       {'players': ['ratmen', 'mountain']},
+                       {'players': ['ratmen', 'giants_declined']},
+                       {'players': ['ratmen'], 'turns': 0},
+                       {'players': ['ratmen'], 'turns': '3'},
+                       {'players': ['ratmen'], 'turns': True}):
+            response = await self.host.handle(dict(config, op='new_match'))
+            self.assertFalse(response['ok'], config)
+        self.assertEqual(len(self.host.matches), 1)
+
+    async def test_malformed_moves(self):
+        '''Check that any malformed move gets an error response'''
+        for move in ([1], 'conquer', {'kind': 'redeploy', 'placements': [3]},
+                     {'kind': 'conquer', 'space': [2]}):
+            response = await self.request('move', move=move)
+            self.assertFalse(response['ok'], move)
+            self.assertIn('error', response)
+
+    async def test_vocabulary_per_match(self):
+        '''Check that player names stay with their match'''
+        owners = list(self.host.template.owners)
+        for number in range(20):
+            match = (await self.host.handle({
+                'op': 'new_match', 'seed': number,
+                'players': ['a{}'.format(number), 'b{}'.format(number)]}))['match']
+            await self.host.handle({'op': 'ai_turn', 'match': match})
+        self.assertEqual(self.host.template.owners, owners)
+        self.assertLessEqual(len(self.host.matches[match].game.board.owners),
+                             len(owners) + 4)
+
+    async def test_finished_match(self):
+        for _ in range(2 * 10):
+            await self.request('ai_turn')
+        state = await self.request('state')
+        self.assertTrue(state['finished'])
+        self.assertFalse((await self.request('ai_turn'))['ok'])
+
+    async def test_many_matches(self):
+        matches = [(await self.host.handle({'op': 'new_match', 'seed': seed,
+                                            'players': ['a', 'b']}))['match']
+                   for seed in range(100)]
+        responses = await asyncio.gather(*(
+            self.host.handle({'op': 'ai_turn', 'match': match})
+            for match in matches))
+        self.assertTrue(all(response['ok'] for response in responses))
+        stats = await self.host.handle({'op': 'stats'})
+        self.assertEqual(stats['matches'], 101)
+        self.assertEqual(stats['latency']['ai_turn']['count'], 100)
+
+    async def test_tcp(self):
+        tcp = await self.host.serve_tcp('127.0.0.1', 0)
+        port = tcp.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'{"id": 7, "op": "state", "match": "1"}\n')
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        self.assertEqual((response['id'], response['ok']), (7, True))
+        writer.close()
+        await writer.wait_closed()
+        tcp.close()
+        await tcp.wait_closed()
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+""" Module implements batches of SW boards in shared memory for
+    multiprocess rollouts
+
+    A BoardBatch keeps the owner and token arrays of N boards of one map
+    in a single multiprocessing.shared_memory block:
+
+        owner   int16[N, spaces]
+        tokens  int16[N, spaces, token columns]
+
+    Workers attach to the block by name and play on board.Board.adopt
+    views of their own slots, so nothing but the small game results is
+    pickled; the coordinator scores every slot straight from the block.
+
+    Owner and token codes are fixed when the batch is created: every
+    owner and token type a rollout may use is registered up front, in
+    the same order in every process.
+
+    Usage: python sharedbatch.py map.json --games 1000
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import board
+import game
+import scoring
+import selfplay
+import sw_exceptions
+
+# what a worker needs to attach to a batch
+BatchSpec = collections.namedtuple('BatchSpec', ['name', 'n_boards', 'owners',
+                                                 'token_types'])
+
+# the template board and batch of this process; the template is loaded
+# once in the parent and inherited by forked workers
+_TEMPLATE = None
+_BATCH = None
+
+
+class BoardBatch:
+    """ Owner and token arrays of n_boards boards in shared memory
+    ...
+
+    Attributes:
+    -----------
+
+    template: board.Board
+        The board every slot starts from; its owner and token codes are
+        those of the arrays
+
+    owner: numpy.ndarray
+        int16 (n_boards, spaces) view of the shared block
+
+    tokens: numpy.ndarray
+        int16 (n_boards, spaces, token columns) view of the shared block
+
+    spec: BatchSpec
+        Name and codes for attaching other processes
+
+    """
+
+    def __init__(self, template, n_boards, owners=(), token_types=(), name=None):
+        """Creates a batch, or attaches to the batch called name
+        Args: template - board.Board of the map; every owner and token
+                         type is registered on it
+
+              n_boards - positive integer number of boards
+
+              owners, token_types - names registered before the arrays are
+                                    laid out; when attaching, the owners
+                                    and token_types of the batch spec
+
+              name - shared memory name of an existing batch, None to
+                     create one with every slot holding the template state
+
+        Output: object of type BoardBatch """
+
+        if not isinstance(n_boards, int):
+            raise TypeError('n_boards: {} invalid! Must be an integer!'.format(n_boards))
+        if n_boards < 1:
+            raise sw_exceptions.InputError('n_boards must be positive')
+
+        # codes are only ever appended, so registering the names of a spec
+        # in order gives them the codes they have in the creating process
+        for code, owner in enumerate(owners):
+            if template.owner_code(owner) != code and name is not None:
+                raise sw_exceptions.InputError('Owner {} has another code in '
+                                               'this process'.format(owner))
+        for code, token in enumerate(token_types):
+            if template.token_code(token) != code and name is not None:
+                raise sw_exceptions.InputError('Token type {} has another code '
+                                               'in this process'.format(token))
+
+        self.template = template
+        self.n_boards = n_boards
+        spaces, columns = template.tokens.shape
+        owner_bytes = (n_boards * spaces * 2 + 7) & ~7
+        size = owner_bytes + n_boards * spaces * columns * 2
+
+        self._created = name is None
+        if self._created:
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+            if self._memory.size < size:
+                self._memory.close()
+                raise sw_exceptions.InputError('Batch {} is smaller than its '
+                                               'spec'.format(name))
+
+        self.owner = np.ndarray((n_boards, spaces), dtype=np.int16,
+                                buffer=self._memory.buf)
+        self.tokens = np.ndarray((n_boards, spaces, columns), dtype=np.int16,
+                                 buffer=self._memory.buf, offset=owner_bytes)
+        if self._created:
+            self.reset()
+
+    @classmethod
+    def attach(cls, template, spec):
+        """Attaches to the batch described by spec; template must be a
+        board of the same map"""
+        return cls(template, spec.n_boards, spec.owners, spec.token_types,
+                   spec.name)
+
+    @property
+    def spec(self):
+        """The BatchSpec other processes attach with"""
+        return BatchSpec(self._memory.name, self.n_boards,
+                         tuple(self.template.owners),
+                         tuple(self.template.token_types))
+
+    def __len__(self):
+        return self.n_boards
+
+    def reset(self, slots=None):
+        """Puts the template state back in slots, every slot by default"""
+        slots = slice(None) if slots is None else slots
+        self.owner[slots] = self.template.owner
+        self.tokens[slots] = self.template.tokens
+
+    def board(self, slot):
+        """Returns a board.Board writing to slot in place"""
+        return self.template.adopt(self.owner[slot], self.tokens[slot])
+
+    def check(self, game_board):
+        """Raises InputError if game_board no longer writes to the batch,
+        as happens when a token type is registered after its creation"""
+        if not (np.shares_memory(game_board.owner, self.owner)
+                and np.shares_memory(game_board.tokens, self.tokens)):
+            raise sw_exceptions.InputError('The board left the batch; register '
+                                           'every token type up front.')
+
+    def score(self, players, bonuses=None, slots=None):
+        """Scores slots (every slot by default) for players.
+
+        Args:
+            players: list of owner names, their position is the player number
+            bonuses: optional list of {symbol or terrain: coins} per player
+            slots: optional index or slice of the slots to score
+
+        Returns:
+            integer array (boards, players) of coins"""
+
+        owner = self.owner if slots is None else self.owner[slots]
+        lookup = scoring.player_lookup(self.template.owners, players)
+        symbol_bonus, terrain_bonus = scoring.bonus_tables(
+            bonuses or [None] * len(players))
+        return scoring.score_boards(lookup[owner], self.template.terrain,
+                                    self.template.symbols, len(players),
+                                    symbol_bonus, terrain_bonus)
+
+    def close(self):
+        """Detaches from the block; boards from board() must be gone"""
+        if self._memory is None:
+            return
+        self.owner = self.tokens = None
+        self._memory.close()
+        if self._created:
+            self._memory.unlink()
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def rollout_names(players):
+    """Returns every owner a game of players may put on the board, for
+    registering on a batch"""
+    return list(players) + [game.declined_name(player) for player in players]
+
+
+def _init_worker(map_path, spec):
+    """helper function attaching a worker to the batch"""
+    global _BATCH
+    template = _TEMPLATE or board.Board.load(map_path)
+    _BATCH = BoardBatch.attach(template, spec)
+
+
+def _rollout(task):
+    """helper function playing one game on its batch slot in a worker"""
+    slot, seed, players, policies, turns = task
+    played = game.Game(_BATCH.template, players, turns=turns, seed=seed)
+    played.board = _BATCH.board(slot) # play in the batch, not on a clone
+    played.play([selfplay.resolve_policy(policy) for policy in policies])
+    _BATCH.check(played.board)
+    return slot, played.coins
+
+
+def run(map_path, games, policies=('greedy', 'random'), processes=None,
+        seed=0, turns=game.TURNS):
+    """Plays games on a process pool, each on its own slot of a batch.
+
+    Args:
+        map_path: json or binary map
+        games: number of games, one batch slot each
+        policies: one policy name per player, see selfplay.resolve_policy
+        processes: worker processes, every core by default
+        seed: seed of the first game; game k uses seed + k
+        turns: turns per game
+
+    Returns:
+        dictionary with the coins of every game, the final position
+        scores read from the batch, seconds and games_per_second"""
+
+    global _TEMPLATE
+    template = _TEMPLATE = board.Board.load(map_path)
+    for policy in policies:
+        selfplay.resolve_policy(policy)
+
+    processes = processes or os.cpu_count()
+    players = ['player_{}'.format(number + 1) for number in range(len(policies))]
+    tasks = [(slot, seed + slot, players, tuple(policies), turns)
+             for slot in range(games)]
+
+    context = selfplay.pool_context()
+    start = time.perf_counter()
+    names = rollout_names(players)
+    with BoardBatch(template, games, names, names) as batch:
+        coins = [None] * games
+        with context.Pool(processes, _init_worker,
+                          (map_path, batch.spec)) as pool:
+            chunksize = max(1, games // (processes * 4))
+            for slot, result in pool.imap_unordered(_rollout, tasks, chunksize):
+                coins[slot] = [result[player] for player in players]
+        scores = batch.score(players)
+    seconds = time.perf_counter() - start
+
+    return {'games': games,
+            'coins': coins,
+            'scores': scores.tolist(),
+            'seconds': seconds,
+            'processes': processes,
+            'games_per_second': games / seconds}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run SW rollouts on a '
+                                     'shared memory board batch.')
+    parser.add_argument('map_path')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--policies', nargs='+', default=['greedy', 'random'])
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = run(args.map_path, args.games, args.policies, args.processes,
+                 args.seed)
+    print('{games} games in {seconds:.2f} s on {processes} processes: '
+          '{games_per_second:.1f} games/s'.format(**report))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
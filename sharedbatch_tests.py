@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+import board, scoring, sharedbatch, sw_exceptions
+import os
+import numpy as np
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+class TestBoardBatch(unittest.TestCase):
+    """Tests boards in a shared memory batch"""
+
+    def setUp(self):
+        self.template = board.Board.from_json(MAP_JSON)
+        self.names = sharedbatch.rollout_names(['ratmen', 'giants'])
+        self.batch = sharedbatch.BoardBatch(self.template, 4, self.names,
+                                            self.names)
+
+    def tearDown(self):
+        self.batch.close()
+
+    def test_starts_from_template(self):
+        '''Check that every slot starts as the template'''
+        for slot in range(len(self.batch)):
+            np.testing.assert_array_equal(self.batch.owner[slot],
+                                          self.template.owner)
+            np.testing.assert_array_equal(self.batch.tokens[slot],
+                                          self.template.tokens)
+
+    def test_boards_write_in_place(self):
+        '''Check that slot boards change the batch, not the template'''
+        played = self.batch.board(2)
+        self.assertEqual(played.zobrist, self.template.zobrist)
+        played.add_tokens(0, 'ratmen', 3)
+        played.change_owner(0, 'ratmen')
+        self.batch.check(played)
+
+        self.assertEqual(self.batch.owner[2, 0], played.owner_code('ratmen'))
+        self.assertEqual(self.batch.tokens[2, 0, played.token_code('ratmen')], 3)
+        self.assertEqual(self.batch.owner[1, 0], self.template.owner[0])
+        np.testing.assert_array_equal(self.template.owner,
+                                      board.Board.from_json(MAP_JSON).owner)
+        self.assertEqual(played.owned_mask('ratmen'), 1)
+
+        self.batch.reset(2)
+        np.testing.assert_array_equal(self.batch.owner[2], self.template.owner)
+
+    def test_attach(self):
+        '''Check attaching by spec, and refusing other codes'''
+        other = sharedbatch.BoardBatch.attach(board.Board.from_json(MAP_JSON),
+                                              self.batch.spec)
+        try:
+            other.board(1).add_tokens(5, 'giants', 2)
+            self.assertEqual(self.batch.tokens[1, 5,
+                                               self.template.token_code('giants')], 2)
+        finally:
+            other.close()
+
+        reordered = board.Board.from_json(MAP_JSON)
+        reordered.owner_code('giants')
+        with self.assertRaises(sw_exceptions.InputError):
+            sharedbatch.BoardBatch.attach(reordered, self.batch.spec)
+
+    def test_new_token_type_leaves_the_batch(self):
+        '''Check that check() notices a board that left the batch'''
+        played = self.batch.board(0)
+        for number in range(self.template.tokens.shape[1]):
+            played.add_tokens(1, 'extra_{}'.format(number), 1)
+        with self.assertRaises(sw_exceptions.InputError):
+            self.batch.check(played)
+
+    def test_score(self):
+        '''Check batch scores against scoring.score_batch'''
+        boards = []
+        for slot in range(len(self.batch)):
+            played = self.batch.board(slot)
+            for index in range(slot + 1):
+                if self.template.terrain[index] != board.TERRAIN_CODES['water']:
+                    played.change_owner(index, ['ratmen', 'giants'][slot % 2])
+            boards.append(played)
+        np.testing.assert_array_equal(
+            self.batch.score(['ratmen', 'giants']),
+            scoring.score_batch(boards, ['ratmen', 'giants']))
+
+    def test_run(self):
+        '''Check a small pool of rollouts'''
+        report = sharedbatch.run(MAP_JSON, 6, processes=2)
+        self.assertEqual(len(report['coins']), 6)
+        self.assertEqual(np.shape(report['scores']), (6, 2))
+        self.assertTrue(all(coins for coins in report['coins']))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
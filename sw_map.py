@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+""" Module implements the sw-map command line tool
+
+    sw-map compile in.csv out.json    compact json map (or .swm binary map)
+    sw-map validate map [map ...]     reports the problems of whole maps
+    sw-map bench [benchmark options]  runs benchmarks.py
+
+    Starting the tool only imports argparse: each subcommand imports the
+    modules it needs when it runs, so compiling a csv never loads numpy
+    and no path loads pandas.
+"""
+import argparse
+import sys
+
+# binary map extension, see mapfile.MAP_EXTENSION; repeated here so the
+# compile command can choose a compiler without importing numpy
+_BINARY_EXTENSION = '.swm'
+
+
+def compile_command(args):
+    """Compiles a gameboard csv into a compact json or binary map"""
+    import gameboard_csv_to_json
+    import sw_exceptions
+
+    try:
+        if args.out_map.endswith(_BINARY_EXTENSION):
+            gameboard_csv_to_json.compile_binary_map(args.in_csv, args.out_map,
+                                                     not args.no_validate)
+        else:
+            gameboard_csv_to_json.compile_map(args.in_csv, args.out_map,
+                                              not args.no_validate)
+    # unreadable files and broken json are reported like invalid maps
+    except (sw_exceptions.InputError, OSError, ValueError) as error:
+        print('sw-map: {}'.format(error), file=sys.stderr)
+        return 1
+    return 0
+
+
+def validate_command(args):
+    """Validates whole maps, printing each problem; fails if any has one"""
+    import gameboard_csv_to_json
+    import sw_exceptions
+
+    status = 0
+    for path in args.maps:
+        try:
+            problems = gameboard_csv_to_json.validate_map(
+                gameboard_csv_to_json.read_map_arrays(path), args.limit)
+        except (sw_exceptions.InputError, OSError, ValueError) as error:
+            problems = [str(error)]
+        for problem in problems:
+            print('{}: {}'.format(path, problem))
+        if problems:
+            status = 1
+        else:
+            print('{}: ok'.format(path))
+    return status
+
+
+def bench_command(args):
+    """Runs benchmarks.main with the options after bench"""
+    import benchmarks
+    return benchmarks.main(args.options)
+
+
+def build_parser():
+    """Returns the argparse parser of sw-map"""
+    parser = argparse.ArgumentParser(prog='sw-map',
+                                     description='Compile, validate and '
+                                     'benchmark SW maps.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = commands.add_parser('compile', help='compile a gameboard csv')
+    compile_parser.add_argument('in_csv')
+    compile_parser.add_argument('out_map', help='.json for the compact format, '
+                                '{} for the binary one'.format(_BINARY_EXTENSION))
+    compile_parser.add_argument('--no-validate', action='store_true',
+                                help='skip the whole map checks')
+    compile_parser.set_defaults(handler=compile_command)
+
+    validate_parser = commands.add_parser('validate', help='check whole maps')
+    validate_parser.add_argument('maps', nargs='+',
+                                 help='gameboard csv, map json or binary map')
+    validate_parser.add_argument('--limit', type=int, default=10,
+                                 help='most problems reported per map')
+    validate_parser.set_defaults(handler=validate_command)
+
+    # the options of benchmarks.py are passed through, see main
+    bench_parser = commands.add_parser('bench', help='run the benchmarks',
+                                       add_help=False)
+    bench_parser.set_defaults(handler=bench_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, options = parser.parse_known_args(argv)
+    if args.command == 'bench':
+        args.options = options
+    elif options:
+        parser.error('unrecognized arguments: {}'.format(' '.join(options)))
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+import board, gameboard_csv_to_json, sw_map
+import contextlib, io, os, subprocess, sys, tempfile
+import unittest
+
+MAP_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'map_2_player.json')
+
+def imported_by(statement):
+    '''returns the modules a fresh interpreter has loaded after statement'''
+    output = subprocess.check_output(
+        [sys.executable, '-c',
+         statement + '; import sys; print(" ".join(sys.modules))'],
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    return set(output.decode().split())
+
+class TestSwMap(unittest.TestCase):
+    """Tests the sw-map command line tool"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmp.name, 'map.csv')
+        gameboard_csv_to_json.write_map_arrays(
+            self.csv, gameboard_csv_to_json.generate_map(40))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def call(self, *argv):
+        '''runs sw-map with argv, returning its status and output'''
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), \
+                contextlib.redirect_stderr(output):
+            status = sw_map.main(list(argv))
+        return status, output.getvalue()
+
+    def test_compile(self):
+        '''Check compiling to both map formats'''
+        for name in ('map.json', 'map.swm'):
+            out_map = os.path.join(self.tmp.name, name)
+            self.assertEqual(self.call('compile', self.csv, out_map)[0], 0)
+            self.assertEqual(len(board.Board.load(out_map)), 40)
+
+    def test_validate(self):
+        '''Check reports of valid and invalid maps'''
+        self.assertEqual(self.call('validate', MAP_JSON, self.csv),
+                         (0, '{}: ok\n{}: ok\n'.format(MAP_JSON, self.csv)))
+
+        with open(self.csv, 'a') as outfile:
+            outfile.write('41,farm,False,False,,,,,,,\n')
+        status, output = self.call('validate', self.csv)
+        self.assertEqual(status, 1)
+        self.assertIn('cannot be reached', output)
+
+        status, output = self.call('compile', self.csv,
+                                   os.path.join(self.tmp.name, 'map.json'))
+        self.assertEqual(status, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'map.json')))
+
+    def test_unreadable_files(self):
+        '''Check that missing files and broken json are reported'''
+        broken = os.path.join(self.tmp.name, 'broken.json')
+        with open(broken, 'w') as outfile:
+            outfile.write('{')
+        missing = os.path.join(self.tmp.name, 'nope.json')
+        status, output = self.call('validate', missing, broken)
+        self.assertEqual(status, 1)
+        self.assertIn('{}: '.format(missing), output)
+        self.assertIn('{}: '.format(broken), output)
+
+        status, output = self.call('compile', os.path.join(self.tmp.name,
+                                                           'nope.csv'), missing)
+        self.assertEqual(status, 1)
+        self.assertTrue(output.startswith('sw-map: '))
+
+    def test_lazy_imports(self):
+        '''Check that startup loads neither numpy nor pandas'''
+        self.assertFalse({'numpy', 'gameboard_csv_to_json'}
+                         & imported_by('import sw_map'))
+        self.assertNotIn('numpy', imported_by('import gameboard_csv_to_json'))
+        self.assertNotIn('pandas', imported_by('import board, game, benchmarks'))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
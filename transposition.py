@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+""" Module implements a bounded transposition table for searching SW boards """
+import collections
+
+import sw_exceptions
+
+# a cached search result; depth is how deep the position was searched
+Entry = collections.namedtuple('Entry', ['key', 'value', 'depth', 'move'])
+
+POLICIES = ('lru', 'depth')
+
+
+class TranspositionTable:
+    """ Bounded cache of search results keyed by board.Board.zobrist
+    ...
+
+    Attributes:
+    -----------
+
+    capacity: int
+        The most entries the table holds
+
+    policy: string
+        How room is made for new entries.
+        allowed values: 'lru' - evict the least recently used entry
+                        'depth' - one slot per key % capacity, kept by the
+                                  entry searched to the greater depth
+
+    hits, misses: int
+        Lookup statistics
+
+    """
+
+    def __init__(self, capacity=1 << 16, policy='lru'):
+        """Initializes an empty TranspositionTable
+        Args: capacity - positive integer number of entries
+
+              policy - eviction policy, one of POLICIES
+
+        Output: object of type TranspositionTable """
+
+        if not isinstance(capacity, int):
+            raise TypeError('capacity: {} invalid! Must be an integer!'.format(capacity))
+        if capacity < 1:
+            raise sw_exceptions.InputError('capacity must be positive')
+        if policy not in POLICIES:
+            raise sw_exceptions.InputError('Invalid eviction policy: {}'.format(policy))
+
+        self.capacity = capacity
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        """Removes every entry"""
+        if self.policy == 'lru':
+            self._entries = collections.OrderedDict()
+        else:
+            self._slots = [None] * self.capacity
+            self._size = 0
+
+    def __len__(self):
+        if self.policy == 'lru':
+            return len(self._entries)
+        return self._size
+
+    def __contains__(self, key):
+        return self._get(key) is not None
+
+    def _get(self, key):
+        """helper function returning the entry stored for key or None"""
+        if self.policy == 'lru':
+            return self._entries.get(key)
+        entry = self._slots[key % self.capacity]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def lookup(self, key, depth=0):
+        """Returns the Entry for key if it was searched at least depth deep.
+
+        Args:
+            key: the board zobrist value
+            depth: minimum search depth the caller can use
+
+        Returns:
+            Entry or None"""
+
+        entry = self._get(key)
+        if entry is None or entry.depth < depth:
+            self.misses += 1
+            return None
+
+        if self.policy == 'lru':
+            self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key, value, depth=0, move=None):
+        """Stores a search result, evicting by the table policy.
+
+        Args:
+            key: the board zobrist value
+            value: the evaluation of the position
+            depth: how deep the position was searched
+            move: optional best move found
+
+        Returns:
+            True if the entry was stored"""
+
+        entry = Entry(key, value, depth, move)
+
+        if self.policy == 'lru':
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            elif len(self._entries) >= self.capacity:
+                self._entries.popitem(last=False)
+            self._entries[key] = entry
+            return True
+
+        slot = key % self.capacity
+        current = self._slots[slot]
+        if current is None:
+            self._size += 1
+        elif current.key != key and current.depth > depth:
+            return False # keep the deeper result
+        self._slots[slot] = entry
+        return True
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import transposition, sw_exceptions
+import unittest
+
+class TestTable_Restrictions(unittest.TestCase):
+    """Tests TranspositionTable input checking"""
+
+    def test_bad_policy(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            transposition.TranspositionTable(8, 'fifo')
+
+    def test_zero_capacity(self):
+        with self.assertRaises(sw_exceptions.InputError):
+            transposition.TranspositionTable(0)
+
+class TestTable_LRU(unittest.TestCase):
+    """Tests the least recently used eviction policy"""
+
+    def setUp(self):
+        self.table = transposition.TranspositionTable(2, 'lru')
+
+    def test_lookup(self):
+        self.table.store(11, 1.5, depth=2)
+        self.assertEqual(self.table.lookup(11).value, 1.5)
+        self.assertIsNone(self.table.lookup(11, depth=3))
+        self.assertEqual((self.table.hits, self.table.misses), (1, 1))
+
+    def test_evicts_least_recent(self):
+        self.table.store(1, 'a')
+        self.table.store(2, 'b')
+        self.table.lookup(1)
+        self.table.store(3, 'c')
+        self.assertIn(1, self.table)
+        self.assertNotIn(2, self.table)
+        self.assertEqual(len(self.table), 2)
+
+class TestTable_Depth(unittest.TestCase):
+    """Tests the depth preferred replacement policy"""
+
+    def setUp(self):
+        self.table = transposition.TranspositionTable(4, 'depth')
+
+    def test_keeps_deeper(self):
+        self.table.store(1, 'deep', depth=5)
+        self.assertFalse(self.table.store(5, 'shallow', depth=1))
+        self.assertEqual(self.table.lookup(1).value, 'deep')
+
+    def test_replaces_shallower(self):
+        self.table.store(1, 'shallow', depth=1)
+        self.table.store(5, 'deep', depth=5)
+        self.assertNotIn(1, self.table)
+        self.assertEqual(len(self.table), 1)
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)